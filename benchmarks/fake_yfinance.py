@@ -0,0 +1,199 @@
+"""Deterministic stand-in for ``yfinance.Ticker`` used by the offline benchmarks."""
+import re
+import time
+import zlib
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+
+SCHEMA_FILE = Path(__file__).resolve().parents[1] / 'database' / 'create_tables.sql'
+
+# Statement property -> table whose columns provide the row labels
+STATEMENT_TABLES = {
+    'financials': 'annual_income_statements',
+    'quarterly_financials': 'annual_income_statements',
+    'balance_sheet': 'annual_balance_sheet',
+    'quarterly_balance_sheet': 'annual_balance_sheet',
+    'cashflow': 'annual_cash_flow',
+    'quarterly_cashflow': 'annual_cash_flow',
+}
+
+# Labels Yahoo returns that have no matching column, exercising the drop path
+EXTRA_LABELS = ['Special Income Charges', 'Total Unusual Items Excluding Goodwill']
+
+INFO_NUMERIC_KEYS = [
+    'currentPrice', 'previousClose', 'open', 'dayLow', 'dayHigh', 'regularMarketPreviousClose',
+    'regularMarketOpen', 'regularMarketDayLow', 'regularMarketDayHigh', 'dividendRate',
+    'dividendYield', 'payoutRatio', 'fiveYearAvgDividendYield', 'beta', 'trailingPE', 'forwardPE',
+    'bid', 'ask', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh', 'priceToSalesTrailing12Months',
+    'fiftyDayAverage', 'twoHundredDayAverage', 'trailingAnnualDividendRate',
+    'trailingAnnualDividendYield', 'profitMargins', 'sharesPercentSharesOut', 'heldPercentInsiders',
+    'heldPercentInstitutions', 'shortRatio', 'shortPercentOfFloat', 'bookValue', 'priceToBook',
+    'earningsQuarterlyGrowth', 'trailingEps', 'forwardEps', 'pegRatio', 'enterpriseToRevenue',
+    'enterpriseToEbitda', 'lastDividendValue', 'targetHighPrice', 'targetLowPrice',
+    'targetMeanPrice', 'targetMedianPrice', 'recommendationMean', 'totalCashPerShare',
+    'quickRatio', 'currentRatio', 'debtToEquity', 'revenuePerShare', 'returnOnAssets',
+    'returnOnEquity', 'earningsGrowth', 'revenueGrowth', 'grossMargins', 'ebitdaMargins',
+    'operatingMargins', 'trailingPegRatio',
+]
+
+INFO_INTEGER_KEYS = [
+    'exDividendDate', 'volume', 'regularMarketVolume', 'averageVolume', 'averageVolume10days',
+    'averageDailyVolume10Day', 'bidSize', 'askSize', 'marketCap', 'enterpriseValue', 'floatShares',
+    'sharesOutstanding', 'sharesShort', 'sharesShortPriorMonth', 'sharesShortPreviousMonthDate',
+    'dateShortInterest', 'netIncomeToCommon', 'lastSplitDate', 'lastDividendDate',
+    'numberOfAnalystOpinions', 'totalCash', 'ebitda', 'totalDebt', 'freeCashflow', 'operatingCashflow',
+]
+
+
+@lru_cache(maxsize=None)
+def table_labels(table_name: str) -> List[str]:
+    """Yahoo-style row labels ('Total Revenue') for the value columns of a table."""
+    match = re.search(rf'CREATE TABLE IF NOT EXISTS {table_name} \((.*?)\n\);', SCHEMA_FILE.read_text(), re.S)
+    columns = [line.strip().split()[0] for line in match.group(1).splitlines() if line.strip()]
+    value_columns = [col for col in columns
+                     if col not in ('ticker', 'report_date', 'row_hash', 'PRIMARY', 'CONSTRAINT', 'id')]
+    return [col.replace('_', ' ').title() for col in value_columns] + EXTRA_LABELS
+
+
+class FakeTicker:
+    """Synthetic ``yf.Ticker`` whose frames are seeded by the symbol."""
+
+    def __init__(self, ticker: str, latency: float = 0.0):
+        """
+        Args:
+            ticker (str): Stock ticker symbol
+            latency (float): Seconds slept on every property access, simulating the network
+        """
+        self.ticker = ticker
+        self.latency = latency
+        self.calls = 0
+        self._seed = zlib.crc32(ticker.encode())
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _statement(self, prop: str, quarterly: bool) -> pd.DataFrame:
+        self._wait()
+        rng = np.random.default_rng(self._seed + zlib.crc32(prop.encode()))
+        labels = table_labels(STATEMENT_TABLES[prop])
+        periods = 5 if quarterly else 4
+        freq = 'Q' if quarterly else 'A'
+        dates = pd.date_range(end='2024-12-31', periods=periods, freq=freq)[::-1]
+        values = rng.normal(1e9, 4e8, size=(len(labels), periods)).round(0)
+        values[rng.random(values.shape) < 0.05] = np.nan
+        return pd.DataFrame(values, index=labels, columns=dates)
+
+    financials = property(lambda self: self._statement('financials', False))
+    quarterly_financials = property(lambda self: self._statement('quarterly_financials', True))
+    balance_sheet = property(lambda self: self._statement('balance_sheet', False))
+    quarterly_balance_sheet = property(lambda self: self._statement('quarterly_balance_sheet', True))
+    cashflow = property(lambda self: self._statement('cashflow', False))
+    quarterly_cashflow = property(lambda self: self._statement('quarterly_cashflow', True))
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        self._wait()
+        rng = np.random.default_rng(self._seed)
+        info: Dict[str, Any] = {
+            'symbol': self.ticker,
+            'longName': f"{self.ticker} Holdings Inc.",
+            'exchange': 'NMS',
+            'financialCurrency': 'USD',
+            'recommendationKey': 'buy',
+            'lastSplitFactor': '2:1',
+        }
+        info.update({key: float(rng.normal(100, 25)) for key in INFO_NUMERIC_KEYS})
+        info.update({key: int(rng.integers(1, 10 ** 9)) for key in INFO_INTEGER_KEYS})
+        return info
+
+    @property
+    def news(self) -> List[Dict[str, Any]]:
+        self._wait()
+        published = pd.Timestamp('2024-12-31 21:00', tz='UTC')
+        return [{
+            'uuid': f"{self.ticker}-{index:04d}",
+            'title': f"{self.ticker} story {index}",
+            'publisher': 'Newswire',
+            'link': f"https://news.example/{self.ticker}/{index}",
+            'providerPublishTime': int((published - pd.Timedelta(hours=5 * index)).timestamp()),
+            'type': 'STORY',
+        } for index in range(10)]
+
+    @property
+    def actions(self) -> pd.DataFrame:
+        self._wait()
+        dates = pd.date_range(end='2024-12-31', periods=8, freq='QS-FEB', tz='America/New_York', name='Date')
+        dividends = 0.2 + 0.01 * np.arange(len(dates))
+        return pd.DataFrame({'Dividends': dividends, 'Stock Splits': 0.0}, index=dates)
+
+    @property
+    def calendar(self) -> Dict[str, Any]:
+        self._wait()
+        rng = np.random.default_rng(self._seed)
+        earnings = rng.normal(1.5, 0.3)
+        return {
+            'Dividend Date': date(2025, 2, 13),
+            'Ex-Dividend Date': date(2025, 2, 10),
+            'Earnings Date': [date(2025, 1, 30), date(2025, 2, 3)],
+            'Earnings High': earnings * 1.1,
+            'Earnings Low': earnings * 0.9,
+            'Earnings Average': earnings,
+            'Revenue High': 1.1e9,
+            'Revenue Low': 0.9e9,
+            'Revenue Average': 1e9,
+        }
+
+    @property
+    def recommendations(self) -> pd.DataFrame:
+        self._wait()
+        rng = np.random.default_rng(self._seed)
+        counts = rng.integers(0, 20, size=(4, 5))
+        frame = pd.DataFrame(counts, columns=['strongBuy', 'buy', 'hold', 'sell', 'strongSell'])
+        frame.insert(0, 'period', ['0m', '-1m', '-2m', '-3m'])
+        return frame
+
+    @property
+    def upgrades_downgrades(self) -> pd.DataFrame:
+        self._wait()
+        dates = pd.DatetimeIndex(pd.date_range(end='2024-12-31', periods=6, freq='15D'), name='GradeDate')
+        return pd.DataFrame({
+            'Firm': ['Alpha Research', 'Beta Capital', 'Gamma Securities'] * 2,
+            'ToGrade': ['Buy', 'Hold', 'Outperform'] * 2,
+            'FromGrade': ['Hold', 'Buy', ''] * 2,
+            'Action': ['up', 'down', 'init'] * 2,
+        }, index=dates)
+
+
+def fake_download(tickers, start=None, latency: float = 0.0, **kwargs) -> pd.DataFrame:
+    """
+    Synthetic ``yf.download(..., group_by='ticker')``: business-day bars up to 2024-12-31
+    with (ticker, field) columns.
+    """
+    if latency:
+        time.sleep(latency)
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    dates = pd.bdate_range(start=start or '2015-01-01', end='2024-12-31', name='Date')
+    frames = {}
+    for ticker in tickers:
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        frames[ticker] = pd.DataFrame({
+            'Open': close * 0.995,
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Adj Close': close * 0.98,
+            'Volume': rng.integers(10 ** 5, 10 ** 7, len(dates)),
+        }, index=dates)
+    return pd.concat(frames, axis=1)
+
+
+def fake_universe(size: int) -> List[str]:
+    """Deterministic list of synthetic ticker symbols."""
+    return [f"T{index:05d}" for index in range(size)]
@@ -0,0 +1,72 @@
+"""SQLite stand-in for the Postgres schema in database/create_tables.sql."""
+import re
+from pathlib import Path
+from typing import Dict, List
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+SCHEMA_FILE = Path(__file__).resolve().parents[1] / 'database' / 'create_tables.sql'
+
+SQLITE_TYPES = {
+    'NUMERIC': 'REAL',
+    'DOUBLE': 'REAL',
+    'BIGINT': 'INTEGER',
+    'INTEGER': 'INTEGER',
+    'DATE': 'DATE',
+    'SERIAL': 'INTEGER',
+}
+
+
+def schema_columns() -> Dict[str, List[List[str]]]:
+    """Column (name, type) pairs per table, resolving ``LIKE ... INCLUDING ALL`` copies."""
+    tables: Dict[str, List[List[str]]] = {}
+    for name, body in re.findall(r'CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);', SCHEMA_FILE.read_text(), re.S):
+        like = re.search(r'LIKE (\w+) INCLUDING ALL', body)
+        if like:
+            tables[name] = tables[like.group(1)]
+            continue
+        tables[name] = [line.strip().rstrip(',').split()[:2] for line in body.splitlines()
+                        if line.strip() and not line.strip().startswith(('PRIMARY', 'CONSTRAINT'))]
+    return tables
+
+
+def schema_keys() -> Dict[str, List[str]]:
+    """Columns of the unique (ticker, ...) key per table, from its UNIQUE or PRIMARY KEY constraint."""
+    keys: Dict[str, List[str]] = {}
+    for name, body in re.findall(r'CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);', SCHEMA_FILE.read_text(), re.S):
+        like = re.search(r'LIKE (\w+) INCLUDING ALL', body)
+        if like:
+            keys[name] = keys[like.group(1)]
+            continue
+        constraints = re.findall(r'(?:UNIQUE|PRIMARY KEY) \(([^)]*)\)', body)
+        unique = [[col.strip() for col in cols.split(',')] for cols in constraints]
+        keys[name] = next((cols for cols in unique if 'ticker' in cols), ['ticker', 'report_date'])
+    return keys
+
+
+def create_sqlite_engine(path: str) -> Engine:
+    """Create a SQLite database with every table of the Postgres schema."""
+    engine = create_engine(f"sqlite:///{path}")
+    keys = schema_keys()
+    with engine.begin() as conn:
+        for name, columns in schema_columns().items():
+            definitions = []
+            for column_name, column_type in columns:
+                base_type = column_type.split('(')[0]
+                if column_name == 'id':
+                    definitions.append('id INTEGER PRIMARY KEY AUTOINCREMENT')
+                else:
+                    definitions.append(f"{column_name} {SQLITE_TYPES.get(base_type, 'TEXT')}")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+            conn.exec_driver_sql(
+                f"CREATE TABLE {name} ({', '.join(definitions)}, UNIQUE ({', '.join(keys[name])}))"
+            )
+    return engine
+
+
+def create_postgres_engine(url: str) -> Engine:
+    """Connect to a local Postgres and (re)create the schema from create_tables.sql."""
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(SCHEMA_FILE.read_text())
+    return engine
@@ -0,0 +1,215 @@
+"""
+Offline throughput benchmarks for the ingestion pipeline.
+
+Times YahooFinanceService.get_company_data, DataTransformer.transpose_data,
+DataProcessor.write_frames_to_db and the full main() loop against a fake
+yfinance provider and a SQLite (or local Postgres) database, and writes the
+results to a JSON file for comparison across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10,100,1000 --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / 'financial_data'))
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+import main as pipeline_main  # noqa: E402
+from fake_yfinance import FakeTicker, fake_download, fake_universe  # noqa: E402
+from local_db import create_postgres_engine, create_sqlite_engine, schema_columns  # noqa: E402
+from services.data_processor import DataProcessor  # noqa: E402
+from services.yahoo_finance import YahooFinanceService  # noqa: E402
+from utils.data_utils import DataTransformer  # noqa: E402
+from utils.db_utils import DatabaseConnection  # noqa: E402
+from utils.schema_cache import SchemaCache  # noqa: E402
+
+DEFAULT_DATA_TYPES = 'annual_income,quarterly_income,annual_balance,quarterly_cashflow,stock_metrics'
+
+
+def measure(stage: str, size: int, items: int, func: Callable[[], Any],
+            trace_memory: bool = False) -> Dict[str, Any]:
+    """
+    Run ``func`` once, recording wall time and memory.
+
+    Peak RSS is the process high-water mark so far. tracemalloc gives the peak of
+    the stage itself but slows Python code down several times, so it is opt-in.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        func()
+    elapsed = time.perf_counter() - started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        tracemalloc.stop()
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    result = {
+        'stage': stage,
+        'tickers': size,
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'items_per_second': round(items / elapsed, 2) if elapsed > 0 else None,
+        'ms_per_item': round(elapsed * 1000 / items, 4) if items else None,
+        'peak_rss_mb': round(peak_rss, 2),
+        'traced_peak_mb': traced_peak,
+    }
+    print(f"{stage:>15} n={size:<6} {result['seconds']:>9.3f}s "
+          f"{result['items_per_second'] or 0:>10.1f} items/s  peak RSS {result['peak_rss_mb']:.1f} MB")
+    return result
+
+
+def make_engine(database_url: str, workdir: str, name: str):
+    """Fresh database for one stage, so every run starts from empty tables."""
+    if database_url:
+        return create_postgres_engine(database_url)
+    return create_sqlite_engine(os.path.join(workdir, f"{name}.db"))
+
+
+def benchmark_size(size: int, data_types: List[str], args: argparse.Namespace, workdir: str) -> List[Dict[str, Any]]:
+    tickers = fake_universe(size)
+    statement_types = [dt for dt in data_types if dt != 'stock_metrics']
+    results = []
+
+    # Fetch: lazy dispatch + memoization against the fake provider
+    raw: Dict[str, Dict[str, Any]] = {dt: {} for dt in statement_types}
+    upstream_calls = []
+
+    def fetch():
+        for ticker in tickers:
+            company = FakeTicker(ticker, latency=args.latency)
+            for data_type in statement_types:
+                raw[data_type][ticker] = YahooFinanceService.get_company_data(company, data_type)
+            if 'stock_metrics' in data_types:
+                YahooFinanceService.get_company_data(company, 'stock_metrics')
+            upstream_calls.append(company.calls)
+            YahooFinanceService.clear_cache(ticker)
+
+    results.append(measure('fetch', size, size * len(data_types), fetch, args.trace_memory))
+    results[-1]['upstream_calls'] = sum(upstream_calls)
+
+    # Transform: per-ticker transpose and the batched multi-ticker transform
+    table_columns = {dt: DatabaseConnection.get_table_columns(None, YahooFinanceService.get_table_name(dt))
+                     for dt in statement_types}
+    transformed: Dict[str, List[Any]] = {dt: [] for dt in statement_types}
+
+    def transform():
+        for data_type in statement_types:
+            for ticker, data in raw[data_type].items():
+                transformed[data_type].append(DataTransformer.transpose_data(ticker, data, table_columns[data_type]))
+
+    def transform_batch():
+        for data_type in statement_types:
+            DataTransformer.transpose_many(raw[data_type], table_columns[data_type])
+
+    results.append(measure('transform', size, size * len(statement_types), transform, args.trace_memory))
+    results.append(measure('transform_batch', size, size * len(statement_types), transform_batch, args.trace_memory))
+
+    # Write: batched upserts into empty tables
+    engine = make_engine(args.database_url, workdir, f"write_{size}")
+    rows = sum(len(df) for frames in transformed.values() for df in frames)
+
+    def write():
+        for data_type, frames in transformed.items():
+            table_name = YahooFinanceService.get_table_name(data_type)
+            batch, batch_rows = [], 0
+            for df in frames:
+                batch.append(df)
+                batch_rows += len(df)
+                if batch_rows >= args.batch_rows:
+                    DataProcessor.write_frames_to_db(batch, engine, table_name)
+                    batch, batch_rows = [], 0
+            DataProcessor.write_frames_to_db(batch, engine, table_name)
+
+    results.append(measure('write', size, rows, write, args.trace_memory))
+    engine.dispose()
+    del raw, transformed
+
+    # Full main() loop with the fake provider and the stand-in database
+    DatabaseConnection._engine = make_engine(args.database_url, workdir, f"main_{size}")
+    argv = ['main.py', '--tickers', ','.join(tickers), '--data-types', ','.join(data_types),
+            '--workers', str(args.workers), '--batch-rows', str(args.batch_rows), '--no-cache',
+            '--max-rps', '0', '--max-concurrency', str(args.workers)]
+
+    def run_main():
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch('yfinance.Ticker', lambda symbol: FakeTicker(symbol, latency=args.latency)), \
+                mock.patch('yfinance.download', lambda *a, **kw: fake_download(*a, latency=args.latency, **kw)):
+            pipeline_main.main()
+
+    results.append(measure('main', size, size, run_main, args.trace_memory))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the financial data pipeline')
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma-separated ticker counts')
+    parser.add_argument('--data-types', default=DEFAULT_DATA_TYPES, help='Comma-separated data types')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per upstream call')
+    parser.add_argument('--workers', type=int, default=1, help='Workers for the main() stage')
+    parser.add_argument('--batch-rows', type=int, default=5000, help='Rows per write batch')
+    parser.add_argument('--database-url', default='',
+                        help='Local Postgres URL; the schema is recreated. Defaults to SQLite in a temp dir')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Also record per-stage peak allocations with tracemalloc (slow)')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'), help='JSON results file')
+    args = parser.parse_args()
+
+    # Keep the pipeline's own logging out of the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    data_types = [dt.strip() for dt in args.data_types.split(',')]
+
+    if not args.database_url:
+        # SQLite has no information_schema; serve column names from the schema cache
+        SchemaCache.update({name: [col for col, _ in columns] for name, columns in schema_columns().items()})
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            results.extend(benchmark_size(size, data_types, args, workdir))
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': 'postgresql' if args.database_url else 'sqlite',
+        'latency_seconds': args.latency,
+        'workers': args.workers,
+        'data_types': data_types,
+        'results': results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
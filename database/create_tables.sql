@@ -43,6 +43,7 @@ CREATE TABLE IF NOT EXISTS annual_income_statements (
     cost_of_revenue NUMERIC,
     total_revenue NUMERIC,
     operating_revenue NUMERIC,
+    row_hash VARCHAR(16),
     PRIMARY KEY (ticker, report_date)
 );
 
@@ -149,6 +150,7 @@ CREATE TABLE IF NOT EXISTS annual_balance_sheet (
     cash_and_cash_equivalents NUMERIC,
     cash_equivalents NUMERIC,
     cash_financial NUMERIC,
+    row_hash VARCHAR(16),
     PRIMARY KEY (ticker, report_date)
 );
 
@@ -231,6 +233,7 @@ CREATE TABLE IF NOT EXISTS annual_cash_flow (
     net_foreign_currency_exchange_gain_loss NUMERIC,
     gain_loss_on_sale_of_ppe NUMERIC,
     net_income_from_continuing_operations NUMERIC,
+    row_hash VARCHAR(16),
     PRIMARY KEY (ticker, report_date)
 );
 
@@ -348,3 +351,135 @@ CREATE TABLE IF NOT EXISTS stock_metrics (
 
 CREATE INDEX idx_stock_metrics_ticker ON stock_metrics(ticker);
 CREATE INDEX idx_stock_metrics_date ON stock_metrics(report_date);
+
+-- Daily Price History
+DROP TABLE IF EXISTS price_history;
+
+CREATE TABLE IF NOT EXISTS price_history (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    open DOUBLE PRECISION,
+    high DOUBLE PRECISION,
+    low DOUBLE PRECISION,
+    close DOUBLE PRECISION,
+    adj_close DOUBLE PRECISION,
+    volume BIGINT,
+    PRIMARY KEY (ticker, report_date)
+);
+
+-- Bars arrive in date order, so a BRIN index covers date range scans at a fraction of a B-tree's size
+CREATE INDEX idx_price_history_date ON price_history USING BRIN (report_date);
+
+-- Derived Quarterly Metrics, recomputed from the statement tables after ingest
+DROP TABLE IF EXISTS derived_quarterly_metrics;
+
+CREATE TABLE IF NOT EXISTS derived_quarterly_metrics (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    gross_margin DOUBLE PRECISION,
+    operating_margin DOUBLE PRECISION,
+    net_margin DOUBLE PRECISION,
+    revenue_qoq DOUBLE PRECISION,
+    revenue_yoy DOUBLE PRECISION,
+    net_income_qoq DOUBLE PRECISION,
+    net_income_yoy DOUBLE PRECISION,
+    revenue_ttm NUMERIC,
+    net_income_ttm NUMERIC,
+    ebitda_ttm NUMERIC,
+    operating_cash_flow_ttm NUMERIC,
+    free_cash_flow_ttm NUMERIC,
+    free_cash_flow_margin_ttm DOUBLE PRECISION,
+    debt_to_equity DOUBLE PRECISION,
+    debt_to_assets DOUBLE PRECISION,
+    net_debt_to_ebitda_ttm DOUBLE PRECISION,
+    balance_sheet_date DATE,
+    PRIMARY KEY (ticker, report_date)
+);
+
+CREATE INDEX idx_derived_quarterly_metrics_date ON derived_quarterly_metrics(report_date);
+
+-- Event feeds: one row per event, identified by a natural key rather than (ticker, report_date) alone
+
+-- Dividends, splits and capital gains distributions
+DROP TABLE IF EXISTS stock_actions;
+
+CREATE TABLE IF NOT EXISTS stock_actions (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    dividends NUMERIC,
+    stock_splits NUMERIC,
+    capital_gains NUMERIC,
+    PRIMARY KEY (ticker, report_date)
+);
+
+CREATE INDEX idx_stock_actions_date ON stock_actions(report_date);
+
+-- Upcoming earnings date and estimates, revised until the report
+DROP TABLE IF EXISTS earnings_calendar;
+
+CREATE TABLE IF NOT EXISTS earnings_calendar (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    earnings_date_end DATE,
+    earnings_high NUMERIC,
+    earnings_low NUMERIC,
+    earnings_average NUMERIC,
+    revenue_high NUMERIC,
+    revenue_low NUMERIC,
+    revenue_average NUMERIC,
+    ex_dividend_date DATE,
+    dividend_date DATE,
+    PRIMARY KEY (ticker, report_date)
+);
+
+CREATE INDEX idx_earnings_calendar_date ON earnings_calendar(report_date);
+
+-- Monthly analyst recommendation counts; report_date is the first day of the month
+DROP TABLE IF EXISTS analyst_recommendations;
+
+CREATE TABLE IF NOT EXISTS analyst_recommendations (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    strong_buy INTEGER,
+    buy INTEGER,
+    hold INTEGER,
+    sell INTEGER,
+    strong_sell INTEGER,
+    PRIMARY KEY (ticker, report_date)
+);
+
+-- Analyst rating changes
+DROP TABLE IF EXISTS upgrades_downgrades;
+
+CREATE TABLE IF NOT EXISTS upgrades_downgrades (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    firm VARCHAR(100) NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    graded_at TIMESTAMP,
+    to_grade VARCHAR(50),
+    from_grade VARCHAR(50),
+    price_target_action VARCHAR(20),
+    current_price_target NUMERIC,
+    prior_price_target NUMERIC,
+    PRIMARY KEY (ticker, report_date, firm, action)
+);
+
+CREATE INDEX idx_upgrades_downgrades_date ON upgrades_downgrades(report_date);
+
+-- News articles per ticker; report_date is the publication date
+DROP TABLE IF EXISTS company_news;
+
+CREATE TABLE IF NOT EXISTS company_news (
+    ticker VARCHAR(20) NOT NULL,
+    report_date DATE NOT NULL,
+    uuid VARCHAR(64) NOT NULL,
+    published_at TIMESTAMP,
+    title TEXT,
+    publisher VARCHAR(200),
+    link TEXT,
+    content_type VARCHAR(50),
+    PRIMARY KEY (ticker, uuid)
+);
+
+CREATE INDEX idx_company_news_ticker_date ON company_news(ticker, report_date);
@@ -0,0 +1,125 @@
+-- Range partitioning by report_date for stock_metrics (monthly) and the statement tables (yearly)
+--
+-- Run after create_tables.sql, on a new or an existing database:
+--   psql -d financial_data -f database/partitioned_tables.sql
+-- Each table is renamed to <table>_unpartitioned, recreated as a partitioned table with the
+-- same columns, and its rows are copied over. The old tables are kept until dropped by hand.
+-- Tables that are already partitioned are left alone, so the script can be run again.
+--
+-- Partitions are named <table>_pYYYY or <table>_pYYYYMM. The writer creates missing ones
+-- ahead of time with ensure_report_date_partitions; rows outside every partition land in
+-- <table>_default and are moved into their partition once it is created. An old partition
+-- can be archived without rewriting the table:
+--   ALTER TABLE stock_metrics DETACH PARTITION stock_metrics_p202301;
+-- DETACH ... CONCURRENTLY cannot be used, as Postgres rejects it while a default partition exists.
+
+-- Create the partitions of ``parent`` covering from_date..to_date, one per ``step``
+-- ('month' or 'year'); returns the number of partitions created
+CREATE OR REPLACE FUNCTION ensure_report_date_partitions(parent TEXT, step TEXT, from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    bound DATE := date_trunc(step, from_date)::DATE;
+    next_bound DATE;
+    partition_name TEXT;
+    default_name TEXT := parent || '_default';
+    created INTEGER := 0;
+BEGIN
+    -- Serializes concurrent writers creating partitions of the same table
+    PERFORM pg_advisory_xact_lock(hashtext('partitions:' || parent));
+    WHILE bound <= to_date LOOP
+        next_bound := (bound + ('1 ' || step)::INTERVAL)::DATE;
+        partition_name := parent || '_p' || to_char(bound, CASE step WHEN 'month' THEN 'YYYYMM' ELSE 'YYYY' END);
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            NULL;
+        ELSIF to_regclass(default_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, parent, bound, next_bound);
+            created := created + 1;
+        ELSE
+            -- CREATE TABLE ... PARTITION OF fails once rows of the range sit in the default
+            -- partition, so they are moved into a plain table that is then attached. The lock
+            -- keeps writers from routing new rows of the range to the default meanwhile.
+            EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', default_name);
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition_name, parent);
+            EXECUTE format('WITH moved AS (DELETE FROM %I WHERE report_date >= %L AND report_date < %L RETURNING *) '
+                           'INSERT INTO %I SELECT * FROM moved',
+                           default_name, bound, next_bound, partition_name);
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           parent, partition_name, bound, next_bound);
+            created := created + 1;
+        END IF;
+        bound := next_bound;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replace ``tbl`` with a table partitioned by report_date, keyed by ``primary_key``
+CREATE OR REPLACE PROCEDURE partition_by_report_date(tbl TEXT, step TEXT, primary_key TEXT)
+AS $$
+DECLARE
+    old_table TEXT := tbl || '_unpartitioned';
+    first_date DATE;
+    last_date DATE;
+    item RECORD;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(tbl)) THEN
+        RAISE NOTICE '% is already partitioned', tbl;
+        RETURN;
+    END IF;
+
+    -- Free the constraint and index names for the new table
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, old_table);
+    FOR item IN SELECT conname FROM pg_constraint WHERE conrelid = old_table::REGCLASS LOOP
+        EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I',
+                       old_table, item.conname, left('old_' || item.conname, 63));
+    END LOOP;
+    FOR item IN
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = old_table::REGCLASS
+        AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', item.relname, left('old_' || item.relname, 63));
+    END LOOP;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS, PRIMARY KEY (%s)) PARTITION BY RANGE (report_date)',
+                   tbl, old_table, primary_key);
+    -- Partitions inherit the index; BRIN stays small as rows arrive roughly in date order
+    EXECUTE format('CREATE INDEX %I ON %I USING BRIN (report_date)', 'idx_' || tbl || '_date', tbl);
+    EXECUTE format('CREATE INDEX %I ON %I (ticker)', 'idx_' || tbl || '_ticker', tbl);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+
+    EXECUTE format('SELECT MIN(report_date), MAX(report_date) FROM %I', old_table) INTO first_date, last_date;
+    PERFORM ensure_report_date_partitions(tbl, step, COALESCE(first_date, CURRENT_DATE),
+                                          GREATEST(COALESCE(last_date, CURRENT_DATE), CURRENT_DATE));
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, old_table);
+END;
+$$ LANGUAGE plpgsql;
+
+BEGIN;
+
+CALL partition_by_report_date('annual_income_statements', 'year', 'ticker, report_date');
+CALL partition_by_report_date('quarterly_income_statements', 'year', 'ticker, report_date');
+CALL partition_by_report_date('annual_balance_sheet', 'year', 'ticker, report_date');
+CALL partition_by_report_date('quarterly_balance_sheet', 'year', 'ticker, report_date');
+CALL partition_by_report_date('annual_cash_flow', 'year', 'ticker, report_date');
+CALL partition_by_report_date('quarterly_cash_flow', 'year', 'ticker, report_date');
+
+-- Unique constraints of a partitioned table must contain report_date, so the surrogate
+-- id moves into a composite key; the writer's conflict target keeps its name
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('stock_metrics')) THEN
+        CALL partition_by_report_date('stock_metrics', 'month', 'id, report_date');
+        ALTER TABLE stock_metrics ADD CONSTRAINT stock_metrics_unique_record UNIQUE (ticker, report_date);
+        -- The id sequence would otherwise be dropped with the old table
+        ALTER SEQUENCE stock_metrics_id_seq OWNED BY stock_metrics.id;
+    END IF;
+END $$;
+
+COMMIT;
+
+-- Once the copies are checked:
+-- DROP TABLE annual_income_statements_unpartitioned, quarterly_income_statements_unpartitioned,
+--     annual_balance_sheet_unpartitioned, quarterly_balance_sheet_unpartitioned,
+--     annual_cash_flow_unpartitioned, quarterly_cash_flow_unpartitioned, stock_metrics_unpartitioned;
@@ -0,0 +1,57 @@
+-- Content hashes for restatement detection on the statement tables
+--
+-- Adds the row_hash column to databases created before it was part of create_tables.sql:
+--   psql -d financial_data -f database/row_hash.sql
+-- Rows written before the column existed have no hash; the next refresh of their ticker
+-- stores one, rewriting them once.
+
+ALTER TABLE annual_income_statements ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+ALTER TABLE quarterly_income_statements ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+ALTER TABLE annual_balance_sheet ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+ALTER TABLE quarterly_balance_sheet ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+ALTER TABLE annual_cash_flow ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+ALTER TABLE quarterly_cash_flow ADD COLUMN IF NOT EXISTS row_hash VARCHAR(16);
+
+-- Optional: prior versions of restated rows. The writer copies a row here before
+-- overwriting it whenever <table>_history exists; leave out the tables you do not need.
+CREATE TABLE IF NOT EXISTS annual_income_statements_history (
+    LIKE annual_income_statements INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_annual_income_statements_history_key
+    ON annual_income_statements_history(ticker, report_date);
+
+CREATE TABLE IF NOT EXISTS quarterly_income_statements_history (
+    LIKE quarterly_income_statements INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quarterly_income_statements_history_key
+    ON quarterly_income_statements_history(ticker, report_date);
+
+CREATE TABLE IF NOT EXISTS annual_balance_sheet_history (
+    LIKE annual_balance_sheet INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_annual_balance_sheet_history_key
+    ON annual_balance_sheet_history(ticker, report_date);
+
+CREATE TABLE IF NOT EXISTS quarterly_balance_sheet_history (
+    LIKE quarterly_balance_sheet INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quarterly_balance_sheet_history_key
+    ON quarterly_balance_sheet_history(ticker, report_date);
+
+CREATE TABLE IF NOT EXISTS annual_cash_flow_history (
+    LIKE annual_cash_flow INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_annual_cash_flow_history_key
+    ON annual_cash_flow_history(ticker, report_date);
+
+CREATE TABLE IF NOT EXISTS quarterly_cash_flow_history (
+    LIKE quarterly_cash_flow INCLUDING DEFAULTS,
+    superseded_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quarterly_cash_flow_history_key
+    ON quarterly_cash_flow_history(ticker, report_date);
@@ -17,6 +17,28 @@ class DatabaseConfig:
             'port': os.getenv('DB_PORT', '5432')
         }
 
+    @staticmethod
+    def get_pool_params():
+        """Get connection pool settings from environment variables."""
+        return {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+        }
+
+    @staticmethod
+    def get_schema_cache_path():
+        """Get the optional file used to persist table column metadata between runs."""
+        path = os.getenv('DB_SCHEMA_CACHE')
+        return Path(path) if path else None
+
+    @staticmethod
+    def get_schema_file():
+        """Get the DDL file describing the expected database schema."""
+        return Path(__file__).resolve().parents[2] / 'database' / 'create_tables.sql'
+
     @staticmethod
     def create_connection_string(db_params):
         """Create database connection string."""
@@ -1,5 +1,10 @@
 import argparse
-from typing import Tuple, List
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, List
+from utils.ticker_source import TickerSource
+from services.sharding import Shard
 
 class DataArgs:
     """Command-line interface handler."""
@@ -9,25 +14,366 @@ class DataArgs:
         """Parse command line arguments."""
         parser = argparse.ArgumentParser(description='Fetch and store financial data from Yahoo Finance')
         
-        parser.add_argument(
+        ticker_group = parser.add_mutually_exclusive_group()
+        ticker_group.add_argument(
             '--tickers',
             type=str,
-            required=True,
             help='Comma-separated list of stock tickers (e.g., TSLA,AAPL,MSFT)'
         )
+
+        ticker_group.add_argument(
+            '--tickers-file',
+            type=str,
+            help="File with one ticker per line or a CSV with tickers in the first column; "
+                 "'-' reads stdin. Read lazily, for universes too large for --tickers"
+        )
         
         parser.add_argument(
             '--data-types',
             type=str,
-            required=True,
             help='Comma-separated list of data types to fetch'
         )
+
+        parser.add_argument(
+            '--sink',
+            choices=['postgres', 'parquet', 'both'],
+            default='postgres',
+            help='Where rows are written (default: postgres)'
+        )
+
+        parser.add_argument(
+            '--parquet-dir',
+            type=Path,
+            default=Path('data') / 'parquet',
+            help='Root of the Parquet dataset for --sink parquet|both (default: data/parquet)'
+        )
+
+        parser.add_argument(
+            '--parquet-buckets',
+            type=DataArgs._positive_int,
+            default=8,
+            help='Ticker hash buckets per table in the Parquet dataset (default: 8)'
+        )
+
+        parser.add_argument(
+            '--journal',
+            type=str,
+            metavar='PATH|db',
+            help="Checkpoint the run in a journal: a local SQLite file, or 'db' for tables in the "
+                 "target database (default: no journal)"
+        )
+
+        parser.add_argument(
+            '--resume',
+            type=str,
+            metavar='RUN_ID',
+            help='Continue a journaled run, skipping finished units. Tickers and data types '
+                 'default to those of the original run'
+        )
+
+        parser.add_argument(
+            '--max-attempts',
+            type=DataArgs._positive_int,
+            default=3,
+            help='Attempts after which a failed unit is no longer retried on --resume (default: 3)'
+        )
+
+        parser.add_argument(
+            '--shard',
+            type=DataArgs._shard,
+            metavar='I/N',
+            help='Only process tickers hashed to shard I of N (0-based), e.g. 0/4 on the first of four hosts'
+        )
+
+        parser.add_argument(
+            '--leases',
+            type=str,
+            metavar='GROUP',
+            help='Claim (ticker, data type) units through the ingest_leases table of the target '
+                 'database, shared by every process started with the same GROUP'
+        )
+
+        parser.add_argument(
+            '--lease-ttl',
+            type=DataArgs._positive_int,
+            default=900,
+            help='Seconds a claimed unit is held before other processes may take it over (default: 900)'
+        )
+
+        parser.add_argument(
+            '--steal',
+            action='store_true',
+            help='After finishing its own shard, claim units left over in the other shards (needs --leases)'
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=DataArgs._positive_int,
+            default=1,
+            help='Number of tickers fetched concurrently (default: 1)'
+        )
+
+        parser.add_argument(
+            '--batch-rows',
+            type=DataArgs._positive_int,
+            default=5000,
+            help='Rows buffered per table before they are written to the database (default: 5000)'
+        )
+
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only fetch and write periods newer than those already in the database'
+        )
+
+        parser.add_argument(
+            '--derived',
+            action='store_true',
+            help='Recompute derived_quarterly_metrics for the tickers and quarters written by this run'
+        )
+
+        parser.add_argument(
+            '--serve',
+            action='store_true',
+            help='Keep running and refresh every ticker and data type on its own cadence'
+        )
+
+        parser.add_argument(
+            '--cadence',
+            type=DataArgs._cadence,
+            action='append',
+            default=[],
+            metavar='DATA_TYPE=DURATION',
+            help='Refresh cadence of a data type with --serve, e.g. stock_metrics=15m; repeatable. '
+                 'Durations take s, m, h or d'
+        )
+
+        parser.add_argument(
+            '--serve-batch',
+            type=DataArgs._positive_int,
+            default=500,
+            help='Most tickers refreshed per --serve cycle (default: 500)'
+        )
+
+        parser.add_argument(
+            '--status-file',
+            type=Path,
+            default=Path.home() / '.cache' / 'financial_data' / 'status.json',
+            help='JSON file with the queue depth and latest cycle of --serve '
+                 '(default: ~/.cache/financial_data/status.json)'
+        )
+
+        parser.add_argument(
+            '--raw-dir',
+            type=Path,
+            help='Keep every raw Yahoo response under this directory as gzip-compressed JSON Lines, '
+                 'so it can be transformed again with --replay'
+        )
+
+        parser.add_argument(
+            '--replay',
+            action='store_true',
+            help='Transform and write the responses kept in --raw-dir instead of fetching; '
+                 '--tickers/--tickers-file and --data-types narrow what is replayed'
+        )
+
+        parser.add_argument(
+            '--replay-since',
+            type=date.fromisoformat,
+            help='First fetch date replayed with --replay'
+        )
+
+        parser.add_argument(
+            '--replay-until',
+            type=date.fromisoformat,
+            help='Last fetch date replayed with --replay'
+        )
+
+        parser.add_argument(
+            '--processes',
+            type=DataArgs._positive_int,
+            help='Worker processes of --replay (default: CPU count)'
+        )
+
+        parser.add_argument(
+            '--max-rps',
+            type=DataArgs._non_negative_float,
+            default=5.0,
+            help='Upper bound of Yahoo requests per second; the rate adapts below it when '
+                 'throttled (default: 5, 0 disables rate limiting)'
+        )
+
+        parser.add_argument(
+            '--max-concurrency',
+            type=DataArgs._positive_int,
+            default=4,
+            help='Yahoo requests in flight at once (default: 4)'
+        )
+
+        parser.add_argument(
+            '--max-retries',
+            type=DataArgs._non_negative_int,
+            default=4,
+            help='Retries of a throttled or failed Yahoo request, with exponential backoff (default: 4)'
+        )
+
+        parser.add_argument(
+            '--history-start',
+            type=date.fromisoformat,
+            help='First date of price_history for tickers without stored bars (default: 10 years ago)'
+        )
+
+        parser.add_argument(
+            '--history-chunk',
+            type=DataArgs._positive_int,
+            default=100,
+            help='Tickers per price_history download request (default: 100)'
+        )
+
+        parser.add_argument(
+            '--log-level',
+            type=str.upper,
+            choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+            default='INFO',
+            help='Logging level (default: INFO)'
+        )
+
+        parser.add_argument(
+            '-v', '--verbose',
+            action='store_true',
+            help='Shortcut for --log-level DEBUG'
+        )
+
+        parser.add_argument(
+            '--metrics-file',
+            type=Path,
+            help='Write per-stage timings and counters to this file at the end of the run'
+        )
+
+        parser.add_argument(
+            '--metrics-format',
+            choices=['json', 'prometheus'],
+            default='json',
+            help='Format of --metrics-file (default: json)'
+        )
+
+        parser.add_argument(
+            '--cache-dir',
+            type=Path,
+            default=Path.home() / '.cache' / 'financial_data',
+            help='Directory for cached Yahoo Finance responses (default: ~/.cache/financial_data)'
+        )
+
+        parser.add_argument(
+            '--cache-max-mb',
+            type=DataArgs._positive_int,
+            default=1024,
+            help='Size cap of the response cache in megabytes (default: 1024)'
+        )
+
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Always fetch from Yahoo Finance and do not store responses'
+        )
+
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='Ignore cached responses but store the freshly fetched ones'
+        )
         
-        return parser.parse_args()
+        args = parser.parse_args()
+        if args.replay:
+            if args.raw_dir is None:
+                parser.error('--replay needs --raw-dir')
+            if args.serve or args.resume is not None or args.leases is not None:
+                parser.error('--replay cannot be combined with --serve, --resume or --leases')
+        elif args.resume is None and (args.data_types is None or (args.tickers is None and args.tickers_file is None)):
+            parser.error('--data-types and one of --tickers or --tickers-file are required unless resuming')
+        if args.resume is not None and args.journal is None:
+            parser.error('--resume needs --journal')
+        if args.steal and (args.leases is None or args.shard is None):
+            parser.error('--steal needs --shard and --leases')
+        if args.serve and (args.resume is not None or args.leases is not None):
+            parser.error('--serve cannot be combined with --resume or --leases')
+        return args
     
     @staticmethod
-    def process_args(args: argparse.Namespace) -> Tuple[List[str], List[str]]:
-        """Process and validate command line arguments."""
-        tickers = [ticker.strip() for ticker in args.tickers.split(',')]
-        data_types = [dtype.strip() for dtype in args.data_types.split(',')]
+    def process_args(args: argparse.Namespace) -> Tuple[Optional[Iterable[str]], Optional[List[str]]]:
+        """
+        Process and validate command line arguments.
+
+        Tickers from --tickers-file come back as a lazy, re-iterable TickerSource.
+        Tickers or data types left out with --replay come back as None, meaning all.
+        """
+        if args.tickers_file is not None:
+            tickers = TickerSource(args.tickers_file)
+        elif args.tickers is not None:
+            tickers = [ticker.strip() for ticker in args.tickers.split(',')]
+        else:
+            tickers = None
+        data_types = [dtype.strip() for dtype in args.data_types.split(',')] if args.data_types else None
         return tickers, data_types
+
+    @staticmethod
+    def assigned_tickers(args: argparse.Namespace, tickers: Iterable[str]) -> Iterable[str]:
+        """Tickers of this process's --shard, followed by the other shards' with --steal."""
+        if args.shard is None:
+            return tickers
+        return args.shard.assigned(tickers, steal=args.steal)
+
+    @staticmethod
+    def apply_resumed(args: argparse.Namespace, arguments: Dict[str, Any]) -> None:
+        """Fill ticker and data type arguments not given on the command line from a resumed run."""
+        if args.tickers is None and args.tickers_file is None:
+            if arguments.get('tickers_file') == '-':
+                raise ValueError("The resumed run read tickers from stdin; pass them again with --tickers-file -")
+            args.tickers = arguments.get('tickers')
+            args.tickers_file = arguments.get('tickers_file')
+        if args.data_types is None:
+            args.data_types = arguments.get('data_types')
+        if args.shard is None and arguments.get('shard'):
+            args.shard = Shard.parse(arguments['shard'])
+
+    @staticmethod
+    def _positive_int(value: str) -> int:
+        """Argparse type for integers greater than zero."""
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+        return number
+
+    @staticmethod
+    def _non_negative_int(value: str) -> int:
+        """Argparse type for integers of zero or more."""
+        number = int(value)
+        if number < 0:
+            raise argparse.ArgumentTypeError(f"expected a non-negative integer, got {value}")
+        return number
+
+    @staticmethod
+    def _shard(value: str) -> Shard:
+        """Argparse type for 'i/N' shards."""
+        try:
+            return Shard.parse(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+
+    @staticmethod
+    def _cadence(value: str) -> Tuple[str, timedelta]:
+        """Argparse type for DATA_TYPE=DURATION cadences such as stock_metrics=15m."""
+        match = re.fullmatch(r'(\w+)=(\d+(?:\.\d+)?)([smhd])', value.strip())
+        if not match:
+            raise argparse.ArgumentTypeError(f"expected DATA_TYPE=DURATION like stock_metrics=15m, got {value}")
+        data_type, amount, unit = match.groups()
+        units = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+        return data_type, timedelta(**{units[unit]: float(amount)})
+
+    @staticmethod
+    def _non_negative_float(value: str) -> float:
+        """Argparse type for floats of zero or more."""
+        number = float(value)
+        if number < 0:
+            raise argparse.ArgumentTypeError(f"expected a non-negative number, got {value}")
+        return number
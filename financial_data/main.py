@@ -1,39 +1,217 @@
 # main.py
+import logging
+import signal
 from utils.db_utils import DatabaseConnection
-from services.data_processor import DataProcessor
+from services.ingest_pipeline import IngestPipeline
+from services.yahoo_finance import YahooFinanceService
+from services.response_cache import ResponseCache
+from services.request_scheduler import RequestScheduler
+from services.incremental import IncrementalPlanner
+from services.price_history import PriceHistoryService
+from services.run_journal import RunJournal
+from services.parquet_sink import ParquetSink
+from services.derived_metrics import DerivedMetricsService
+from services.sharding import WorkLeases
+from services.ingest_daemon import IngestDaemon
+from services.raw_store import RawStore
+from services.replay import ReplayService
+from utils.metrics import Metrics
+from utils.partitions import PartitionManager
+from utils.ticker_source import TickerSource
 from data_args import DataArgs
 
+logger = logging.getLogger('financial_data')
+
 def main():
     """Main execution function."""
     args = DataArgs.parse_arguments()
-    tickers, data_types = DataArgs.process_args(args)
 
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else args.log_level,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+
+    if not args.no_cache:
+        YahooFinanceService.configure_cache(ResponseCache(
+            args.cache_dir,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            # Cadences decide when data is refetched in serve mode, not cache expiry
+            refresh=args.refresh or args.serve
+        ))
+
+    scheduler = RequestScheduler(
+        max_rps=args.max_rps,
+        max_concurrency=args.max_concurrency,
+        max_retries=args.max_retries
+    )
+    YahooFinanceService.configure_scheduler(scheduler)
+
+    raw_store = None
+    if args.raw_dir is not None and not args.replay:
+        raw_store = RawStore(args.raw_dir)
+        YahooFinanceService.configure_raw_store(raw_store)
+
+    engine = None
+    tickers = None
+    journal = None
+    leases = None
     try:
-        engine = DatabaseConnection.connect_to_db()
+        engine = DatabaseConnection.get_engine()
         if not engine:
             raise ValueError("Could not connect to database")
 
-        for ticker in tickers:
-            # Split processing between stock_metrics and other data types
-            if 'stock_metrics' in data_types:
-                # Process stock metrics directly without transformation
-                DataProcessor.process_stock_metrics(ticker, engine)
-                
-                # Get other data types (excluding stock_metrics)
-                other_types = [dt for dt in data_types if dt != 'stock_metrics']
-                
-                # Process other data types if any exist
-                if other_types:
-                    DataProcessor.process_ticker(ticker, other_types, engine)
+        if args.journal is not None and not args.serve and not args.replay:
+            journal_engine = RunJournal.open(args.journal, engine)
+            if args.resume is not None:
+                journal, arguments = RunJournal.resume(journal_engine, args.resume, max_attempts=args.max_attempts)
+                DataArgs.apply_resumed(args, arguments)
+                logger.info("Resuming run %s", journal.run_id)
             else:
-                # If no stock_metrics, use regular processing
-                DataProcessor.process_ticker(ticker, data_types, engine)
+                journal = RunJournal.start(journal_engine, {
+                    'tickers': args.tickers,
+                    'tickers_file': args.tickers_file,
+                    'data_types': args.data_types,
+                    'shard': str(args.shard) if args.shard is not None else None,
+                }, max_attempts=args.max_attempts)
+                logger.info("Run id %s; continue an interrupted run with --resume %s", journal.run_id, journal.run_id)
+
+        tickers, data_types = DataArgs.process_args(args)
+
+        parquet = None
+        if args.sink in ('parquet', 'both'):
+            parquet = ParquetSink(args.parquet_dir, buckets=args.parquet_buckets)
+        write_db = args.sink in ('postgres', 'both')
+        if args.tickers_file is not None or args.serve:
+            # Streamed universes and daemons grow without bound; keep metrics per stage and data type only
+            Metrics.configure(per_ticker=False)
+
+        if args.shard is not None:
+            logger.info("Shard %s%s", args.shard, ", stealing from other shards when done" if args.steal else "")
+        if args.leases is not None:
+            leases = WorkLeases.open(engine, args.leases, ttl=args.lease_ttl)
+            logger.info("Claiming units in lease group %s as %s", leases.group, leases.owner)
+
+        # Warm the column cache for every target table with one catalog query
+        table_names = [YahooFinanceService.get_table_name(dt) for dt in data_types or YahooFinanceService.TABLE_NAMES]
+        DatabaseConnection.load_table_columns(engine, [name for name in table_names if name])
+        if write_db:
+            PartitionManager.prepare(engine, [name for name in table_names if name])
+
+        if args.replay:
+            replayed = ReplayService.run(args.raw_dir, data_types=data_types,
+                                         tickers=set(tickers) if tickers is not None else None,
+                                         since=args.replay_since, until=args.replay_until,
+                                         processes=args.processes, write_db=write_db,
+                                         parquet_dir=args.parquet_dir if parquet is not None else None,
+                                         parquet_buckets=args.parquet_buckets)
+            logger.info("Replayed %d responses from %d files in %d partitions (%d unreadable files), %d rows",
+                        replayed.get('responses', 0), replayed.get('files', 0), replayed.get('partitions', 0),
+                        replayed.get('failed_files', 0), replayed.get('rows', 0))
+            logger.info("Rows added: %d, updated: %d, skipped: %d, failed writes: %d",
+                        replayed.get('inserted', 0), replayed.get('updated', 0), replayed.get('skipped', 0),
+                        replayed.get('failed_writes', 0))
+            if args.derived and write_db:
+                derived = DerivedMetricsService.run(engine)
+                logger.info("Derived metrics: %d tickers, %d quarters added, %d updated, %d failed chunks",
+                            derived['tickers'], derived['inserted'], derived['updated'], derived['failed_chunks'])
+            return
+
+        if args.serve:
+            daemon = IngestDaemon(engine, DataArgs.assigned_tickers(args, tickers), data_types,
+                                  cadences=dict(args.cadence), workers=args.workers,
+                                  batch_rows=args.batch_rows, max_batch=args.serve_batch,
+                                  status_file=args.status_file, parquet=parquet, write_db=write_db,
+                                  derived=args.derived, history_chunk=args.history_chunk,
+                                  history_start=args.history_start, scheduler=scheduler)
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: daemon.stop())
+            daemon.run()
+            return
+
+        planner = None
+        if args.incremental:
+            planner = IncrementalPlanner.load(engine, data_types)
+            if planner is None:
+                raise ValueError("Could not load latest report dates for incremental run")
+
+        # Price history is downloaded for many tickers per request rather than per ticker
+        ticker_data_types = [dt for dt in data_types if dt != PriceHistoryService.DATA_TYPE]
+
+        if ticker_data_types:
+            # Tickers are fetched by a pool of workers; writes are batched by a single writer
+            pipeline = IngestPipeline(engine, workers=args.workers, batch_rows=args.batch_rows,
+                                      planner=planner, journal=journal, parquet=parquet, write_db=write_db,
+                                      track_tables=DerivedMetricsService.SOURCE_TABLES if args.derived else (),
+                                      leases=leases)
+            work = ((ticker, ticker_data_types) for ticker in DataArgs.assigned_tickers(args, tickers))
+            if args.resume is not None:
+                work = journal.remaining(work)
+            if leases is not None:
+                work = leases.claimed(work)
+            stats = pipeline.run(work)
+
+            logger.info("Processed %d tickers (%d failed) in %ss, %s tickers/sec",
+                        stats['tickers'], stats['failed_tickers'], stats['elapsed_seconds'], stats['tickers_per_second'])
+            logger.info("Rows added: %d, updated: %d, skipped: %d, failed batches: %d",
+                        stats['inserted'], stats['updated'], stats['skipped'], stats['failed_batches'])
+            if parquet is not None:
+                logger.info("Parquet rows written: %d", stats['parquet_rows'])
+            if planner is not None:
+                logger.info("Incremental: %d tickers up to date, %d fetches and %d stored rows skipped",
+                            stats['up_to_date_tickers'], stats['skipped_fetches'], stats['skipped_rows'])
+
+            if args.derived and write_db:
+                derived = DerivedMetricsService.run(engine, pipeline.touched)
+                logger.info("Derived metrics: %d tickers, %d quarters added, %d updated, %d failed chunks",
+                            derived['tickers'], derived['inserted'], derived['updated'], derived['failed_chunks'])
+
+        if PriceHistoryService.DATA_TYPE in data_types:
+            latest = planner.latest.get(PriceHistoryService.TABLE_NAME) if planner is not None else None
+            history_work = ((ticker, [PriceHistoryService.DATA_TYPE])
+                            for ticker in DataArgs.assigned_tickers(args, tickers))
+            if args.resume is not None:
+                history_work = journal.remaining(history_work)
+            if leases is not None:
+                history_work = leases.claimed(history_work, chunk_size=args.history_chunk)
+            history = PriceHistoryService.ingest(engine, (ticker for ticker, _ in history_work),
+                                                 chunk_size=args.history_chunk, start=args.history_start,
+                                                 latest=latest, journal=journal, parquet=parquet,
+                                                 write_db=write_db, leases=leases)
+            logger.info("Price history: %d tickers in %d requests (%d failed), %d bars added, %d skipped, "
+                        "%d tickers up to date, %d without bars", history['tickers'], history['requests'],
+                        history['failed_requests'], history['inserted'], history['skipped'],
+                        history['up_to_date_tickers'], history['failed_tickers'])
+            if parquet is not None:
+                logger.info("Price history Parquet rows written: %d", history['parquet_rows'])
 
     except Exception as e:
-        print(f"Error in main execution: {e}")
+        logger.error("Error in main execution: %s", e)
     finally:
+        requests = scheduler.summary()
+        logger.info("Yahoo requests: %d, throttled: %d, server errors: %d, empty: %d, retries: %d, "
+                    "failed: %d, final rate: %s/s", requests['requests'], requests['throttled'],
+                    requests['server_errors'], requests['empty_responses'], requests['retries'],
+                    requests['failures'], requests['rate'])
+        if raw_store is not None:
+            raw_store.close()
+            logger.info("Raw responses kept: %d in %d files, %d bytes",
+                        raw_store.stats['responses'], raw_store.stats['files'], raw_store.stats['bytes'])
+        if leases is not None:
+            leases.close()
+            logger.info("Leases: %d units claimed, %d held by other processes",
+                        leases.stats['claimed'], leases.stats['contended'])
+        if journal is not None:
+            units = journal.counts()
+            logger.info("Run %s: %d units done, %d failed, %d pending",
+                        journal.run_id, units['done'], units['failed'], units['pending'])
         if engine:
-            engine.dispose()
+            logger.info("Database connections opened: %d", DatabaseConnection.connections_opened())
+            DatabaseConnection.dispose_engine()
+        if isinstance(tickers, TickerSource):
+            tickers.close()
+        if args.metrics_file:
+            Metrics.write(args.metrics_file, args.metrics_format)
+            logger.info("Wrote run metrics to %s", args.metrics_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
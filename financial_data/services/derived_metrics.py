@@ -0,0 +1,231 @@
+import logging
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from services.data_processor import DataProcessor
+from utils.data_reader import DataReader
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DerivedMetricsService:
+    """
+    Quarterly ratios computed from stored statements for many tickers at once.
+
+    Margins, QoQ/YoY growth and trailing-twelve-month sums come from
+    quarterly_income_statements and quarterly_cash_flow; leverage comes from the
+    latest annual_balance_sheet at or before each quarter. Quarters are matched by
+    calendar quarter rather than by row position, so a missing quarter yields a
+    missing growth or TTM value instead of a wrong one.
+    """
+
+    TABLE_NAME = 'derived_quarterly_metrics'
+    DATA_TYPE = 'derived'
+
+    INCOME_TABLE = 'quarterly_income_statements'
+    CASH_FLOW_TABLE = 'quarterly_cash_flow'
+    BALANCE_TABLE = 'annual_balance_sheet'
+    SOURCE_TABLES = [INCOME_TABLE, CASH_FLOW_TABLE, BALANCE_TABLE]
+
+    INCOME_COLUMNS = ['total_revenue', 'gross_profit', 'operating_income', 'net_income', 'ebitda']
+    CASH_FLOW_COLUMNS = ['operating_cash_flow', 'free_cash_flow']
+    BALANCE_COLUMNS = ['total_debt', 'stockholders_equity', 'total_assets', 'cash_and_cash_equivalents']
+
+    COLUMNS = [
+        'ticker', 'report_date',
+        'gross_margin', 'operating_margin', 'net_margin',
+        'revenue_qoq', 'revenue_yoy', 'net_income_qoq', 'net_income_yoy',
+        'revenue_ttm', 'net_income_ttm', 'ebitda_ttm', 'operating_cash_flow_ttm', 'free_cash_flow_ttm',
+        'free_cash_flow_margin_ttm',
+        'debt_to_equity', 'debt_to_assets', 'net_debt_to_ebitda_ttm', 'balance_sheet_date',
+    ]
+
+    # History read before the first touched quarter: four quarters for YoY and TTM
+    LOOKBACK = timedelta(days=400)
+    # Oldest annual balance sheet used for a quarter's leverage
+    BALANCE_MAX_AGE = timedelta(days=550)
+
+    @staticmethod
+    def run(engine: Engine, touched: Optional[Dict[str, date]] = None,
+            chunk_size: int = 500) -> Dict[str, int]:
+        """
+        Recompute derived metrics for the quarters touched by an ingest run.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            touched (Optional[Dict[str, date]]): Earliest written report date per ticker;
+                every stored ticker and quarter when None
+            chunk_size (int): Tickers read and computed together
+
+        Returns:
+            Dict[str, int]: Ticker, row and write counts
+        """
+        stats = {'tickers': 0, 'rows': 0, 'inserted': 0, 'updated': 0, 'failed_chunks': 0}
+        if touched is None:
+            touched = DerivedMetricsService._all_tickers(engine)
+        if not touched:
+            return stats
+
+        for tickers in DerivedMetricsService._chunks(sorted(touched), chunk_size):
+            since = {ticker: touched[ticker] for ticker in tickers}
+            with Metrics.timer('derive', data_type=DerivedMetricsService.DATA_TYPE):
+                df = DerivedMetricsService.compute_for(engine, since)
+            stats['tickers'] += len(tickers)
+            if df is None:
+                stats['failed_chunks'] += 1
+                continue
+            if df.empty:
+                continue
+
+            counts = DataProcessor.write_to_db(df, engine, DerivedMetricsService.TABLE_NAME, update=True)
+            if counts is None:
+                stats['failed_chunks'] += 1
+                continue
+            stats['rows'] += len(df)
+            stats['inserted'] += counts['inserted']
+            stats['updated'] += counts['updated']
+        return stats
+
+    @staticmethod
+    def compute_for(engine: Engine, since: Dict[str, Optional[date]]) -> Optional[pd.DataFrame]:
+        """
+        Read the source rows of some tickers and compute their derived metrics.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            since (Dict[str, Optional[date]]): First quarter to return per ticker,
+                None for all of a ticker's quarters
+
+        Returns:
+            Optional[pd.DataFrame]: Rows for the derived table, or None on a read error
+        """
+        tickers = list(since)
+        firsts = [first for first in since.values() if first is not None]
+        start = min(firsts) - DerivedMetricsService.LOOKBACK if len(firsts) == len(tickers) else None
+
+        # Sources were just written, so cached reads would be stale or unused
+        income = DataReader.read(engine, DerivedMetricsService.INCOME_TABLE, tickers, start=start,
+                                 columns=DerivedMetricsService.INCOME_COLUMNS, use_cache=False)
+        cash_flow = DataReader.read(engine, DerivedMetricsService.CASH_FLOW_TABLE, tickers, start=start,
+                                    columns=DerivedMetricsService.CASH_FLOW_COLUMNS, use_cache=False)
+        balance = DataReader.read(engine, DerivedMetricsService.BALANCE_TABLE, tickers,
+                                  start=start - DerivedMetricsService.BALANCE_MAX_AGE if start else None,
+                                  columns=DerivedMetricsService.BALANCE_COLUMNS, use_cache=False)
+        if income is None or cash_flow is None or balance is None:
+            return None
+
+        df = DerivedMetricsService.compute(income, cash_flow, balance)
+        first = df['ticker'].map(since)
+        return df[first.isna() | (df['report_date'] >= first)].reset_index(drop=True)
+
+    @staticmethod
+    def compute(income: pd.DataFrame, cash_flow: pd.DataFrame, balance: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute derived metrics for every quarter of the income rows.
+
+        Args:
+            income (pd.DataFrame): quarterly_income_statements rows
+            cash_flow (pd.DataFrame): quarterly_cash_flow rows
+            balance (pd.DataFrame): annual_balance_sheet rows
+
+        Returns:
+            pd.DataFrame: One row per ticker and quarter with the derived columns
+        """
+        if income.empty:
+            return pd.DataFrame(columns=DerivedMetricsService.COLUMNS)
+
+        df = income.merge(cash_flow, on=['ticker', 'report_date'], how='left')
+        for col in DerivedMetricsService.INCOME_COLUMNS + DerivedMetricsService.CASH_FLOW_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        dates = pd.to_datetime(df['report_date'])
+        df['_quarter'] = dates.dt.year * 4 + dates.dt.quarter
+        df['_date'] = dates
+
+        lag = DerivedMetricsService._lagged
+        ratio = DerivedMetricsService._ratio
+        growth = DerivedMetricsService._growth
+        revenue = df['total_revenue']
+
+        df['gross_margin'] = ratio(df['gross_profit'], revenue)
+        df['operating_margin'] = ratio(df['operating_income'], revenue)
+        df['net_margin'] = ratio(df['net_income'], revenue)
+
+        df['revenue_qoq'] = growth(revenue, lag(df, 'total_revenue', 1))
+        df['revenue_yoy'] = growth(revenue, lag(df, 'total_revenue', 4))
+        df['net_income_qoq'] = growth(df['net_income'], lag(df, 'net_income', 1))
+        df['net_income_yoy'] = growth(df['net_income'], lag(df, 'net_income', 4))
+
+        for source, target in (('total_revenue', 'revenue_ttm'), ('net_income', 'net_income_ttm'),
+                               ('ebitda', 'ebitda_ttm'), ('operating_cash_flow', 'operating_cash_flow_ttm'),
+                               ('free_cash_flow', 'free_cash_flow_ttm')):
+            # NaN in any of the four quarters leaves the sum NaN
+            df[target] = sum(lag(df, source, k) for k in range(4))
+        df['free_cash_flow_margin_ttm'] = ratio(df['free_cash_flow_ttm'], df['revenue_ttm'])
+
+        df = DerivedMetricsService._with_balance_sheet(df, balance)
+        df['debt_to_equity'] = ratio(df['total_debt'], df['stockholders_equity'])
+        df['debt_to_assets'] = ratio(df['total_debt'], df['total_assets'])
+        df['net_debt_to_ebitda_ttm'] = ratio(df['total_debt'] - df['cash_and_cash_equivalents'].fillna(0),
+                                             df['ebitda_ttm'])
+
+        return (df.sort_values(['ticker', 'report_date'])
+                  .reindex(columns=DerivedMetricsService.COLUMNS)
+                  .reset_index(drop=True))
+
+    @staticmethod
+    def _lagged(df: pd.DataFrame, col: str, quarters: int) -> pd.Series:
+        """Value of ``col`` for the same ticker ``quarters`` calendar quarters earlier."""
+        if quarters == 0:
+            return df[col]
+        values = (df.drop_duplicates(['ticker', '_quarter'], keep='last')
+                    .set_index(['ticker', '_quarter'])[col])
+        wanted = pd.MultiIndex.from_arrays([df['ticker'], df['_quarter'] - quarters])
+        return pd.Series(values.reindex(wanted).to_numpy(), index=df.index)
+
+    @staticmethod
+    def _with_balance_sheet(df: pd.DataFrame, balance: pd.DataFrame) -> pd.DataFrame:
+        """Attach the latest annual balance sheet at or before each quarter."""
+        balance = balance.rename(columns={'report_date': 'balance_sheet_date'})
+        for col in DerivedMetricsService.BALANCE_COLUMNS:
+            balance[col] = pd.to_numeric(balance[col], errors='coerce').astype('float64')
+        balance['_date'] = pd.to_datetime(balance['balance_sheet_date'])
+
+        return pd.merge_asof(
+            df.sort_values('_date'), balance.sort_values('_date'),
+            on='_date', by='ticker', direction='backward',
+            tolerance=pd.Timedelta(DerivedMetricsService.BALANCE_MAX_AGE)
+        )
+
+    @staticmethod
+    def _ratio(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+        return (numerator / denominator).replace([np.inf, -np.inf], np.nan)
+
+    @staticmethod
+    def _growth(current: pd.Series, previous: pd.Series) -> pd.Series:
+        return ((current - previous) / previous.abs()).replace([np.inf, -np.inf], np.nan)
+
+    @staticmethod
+    def _all_tickers(engine: Engine) -> Dict[str, Optional[date]]:
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    text(f"SELECT DISTINCT ticker FROM {DerivedMetricsService.INCOME_TABLE}")).scalars()
+                return {ticker: None for ticker in rows}
+        except SQLAlchemyError as e:
+            logger.error("Error listing tickers for derived metrics: %s", e)
+            return {}
+
+    @staticmethod
+    def _chunks(tickers: List[str], size: int) -> Iterator[List[str]]:
+        iterator = iter(tickers)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
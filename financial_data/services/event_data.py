@@ -0,0 +1,271 @@
+import logging
+from datetime import date
+from numbers import Real
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from utils.db_utils import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+
+class EventData:
+    """
+    Row-oriented transforms of yfinance event feeds into their tables.
+
+    Statements have one column per period and are transposed; event feeds
+    (actions, calendar, recommendations, upgrades/downgrades and news) already
+    have one row, or one record, per event and are only renamed and typed.
+    Every event table has a report_date, the day the event belongs to, and is
+    identified by the natural key in DatabaseConnection.key_columns.
+    """
+
+    # Event table -> (column, dtype) layout after ticker and report_date.
+    # float64 backs NUMERIC columns, Int64 INTEGER columns, datetime64 TIMESTAMP
+    # columns (naive UTC), date DATE columns (datetime.date objects) and object text.
+    TABLES: Dict[str, List[Tuple[str, str]]] = {
+        'stock_actions': [
+            ('dividends', 'float64'),
+            ('stock_splits', 'float64'),
+            ('capital_gains', 'float64'),
+        ],
+        'earnings_calendar': [
+            ('earnings_date_end', 'date'),
+            ('earnings_high', 'float64'),
+            ('earnings_low', 'float64'),
+            ('earnings_average', 'float64'),
+            ('revenue_high', 'float64'),
+            ('revenue_low', 'float64'),
+            ('revenue_average', 'float64'),
+            ('ex_dividend_date', 'date'),
+            ('dividend_date', 'date'),
+        ],
+        'analyst_recommendations': [
+            ('strong_buy', 'Int64'),
+            ('buy', 'Int64'),
+            ('hold', 'Int64'),
+            ('sell', 'Int64'),
+            ('strong_sell', 'Int64'),
+        ],
+        'upgrades_downgrades': [
+            ('firm', 'object'),
+            ('action', 'object'),
+            ('graded_at', 'datetime64[ns]'),
+            ('to_grade', 'object'),
+            ('from_grade', 'object'),
+            ('price_target_action', 'object'),
+            ('current_price_target', 'float64'),
+            ('prior_price_target', 'float64'),
+        ],
+        'company_news': [
+            ('uuid', 'object'),
+            ('published_at', 'datetime64[ns]'),
+            ('title', 'object'),
+            ('publisher', 'object'),
+            ('link', 'object'),
+            ('content_type', 'object'),
+        ],
+    }
+
+    # Snapshot tables whose stored rows are revised by later fetches; rows of the
+    # other tables never change once written
+    REVISED = {'earnings_calendar', 'analyst_recommendations'}
+
+    # yfinance frame column -> table column, per table
+    ACTION_FIELDS = {
+        'Dividends': 'dividends',
+        'Stock Splits': 'stock_splits',
+        'Capital Gains': 'capital_gains',
+    }
+    CALENDAR_FIELDS = {
+        'Earnings High': 'earnings_high',
+        'Earnings Low': 'earnings_low',
+        'Earnings Average': 'earnings_average',
+        'Revenue High': 'revenue_high',
+        'Revenue Low': 'revenue_low',
+        'Revenue Average': 'revenue_average',
+        'Ex-Dividend Date': 'ex_dividend_date',
+        'Dividend Date': 'dividend_date',
+    }
+    RECOMMENDATION_FIELDS = {
+        'strongBuy': 'strong_buy',
+        'buy': 'buy',
+        'hold': 'hold',
+        'sell': 'sell',
+        'strongSell': 'strong_sell',
+    }
+    GRADE_FIELDS = {
+        'Firm': 'firm',
+        'Action': 'action',
+        'ToGrade': 'to_grade',
+        'To Grade': 'to_grade',
+        'FromGrade': 'from_grade',
+        'From Grade': 'from_grade',
+        'priceTargetAction': 'price_target_action',
+        'currentPriceTarget': 'current_price_target',
+        'priorPriceTarget': 'prior_price_target',
+    }
+
+    @staticmethod
+    def is_event_table(table_name: str) -> bool:
+        """Whether a table holds an event feed rather than statements or snapshots."""
+        return table_name in EventData.TABLES
+
+    @staticmethod
+    def columns(table_name: str) -> List[str]:
+        """Columns of an event table, in table order."""
+        return ['ticker', 'report_date'] + [name for name, _ in EventData.TABLES[table_name]]
+
+    @staticmethod
+    def to_frame(table_name: str, raw: Dict[str, Any], as_of: Optional[date] = None) -> pd.DataFrame:
+        """
+        Build the rows of an event table from the raw feeds of many tickers.
+
+        Args:
+            table_name (str): Event table
+            raw (Dict[str, Any]): Raw yfinance value per ticker: a frame, or the
+                ``.calendar`` dict
+            as_of (Optional[date]): Fetch date the relative recommendation periods
+                are counted from, defaults to today
+
+        Returns:
+            pd.DataFrame: One row per event, typed per TABLES, without rows missing a key
+        """
+        builders = {
+            'stock_actions': EventData._actions,
+            'earnings_calendar': EventData._calendar,
+            'analyst_recommendations': lambda frames: EventData._recommendations(frames, as_of or date.today()),
+            'upgrades_downgrades': EventData._grades,
+            'company_news': EventData._news,
+        }
+        frames = {ticker: value for ticker, value in raw.items() if value is not None and len(value)}
+        df = builders[table_name](frames) if frames else pd.DataFrame()
+
+        columns = EventData.columns(table_name)
+        df = df.reindex(columns=columns)
+        for name, dtype in EventData.TABLES[table_name]:
+            if dtype.startswith('datetime64'):
+                df[name] = pd.to_datetime(df[name], utc=True, errors='coerce').dt.tz_localize(None)
+            elif dtype == 'Int64':
+                df[name] = pd.to_numeric(df[name], errors='coerce').round().astype('Int64')
+            elif dtype == 'float64':
+                df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+            elif dtype == 'date':
+                df[name] = EventData._dates(df[name])
+            else:
+                df[name] = df[name].astype(object).where(df[name].notna(), None)
+
+        key = DatabaseConnection.key_columns(table_name)
+        df = df.dropna(subset=['report_date'] + key)
+        return df.drop_duplicates(subset=key, keep='last').reset_index(drop=True)
+
+    @staticmethod
+    def _dates(values: Iterable[Any]) -> pd.Series:
+        """Calendar dates of timestamps, dates or epoch seconds; tz-aware values by their UTC date."""
+        series = pd.Series(values) if not isinstance(values, pd.Series) else values
+        if pd.api.types.is_numeric_dtype(series):
+            parsed = pd.to_datetime(series, unit='s', utc=True, errors='coerce')
+        else:
+            parsed = pd.to_datetime(series, utc=True, errors='coerce')
+        return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+    @staticmethod
+    def _indexed(frames: Dict[str, pd.DataFrame], fields: Dict[str, str], date_column: str) -> pd.DataFrame:
+        """Stack frames indexed by event time into rows with ticker and report_date."""
+        local = []
+        for df in frames.values():
+            index = pd.DatetimeIndex(pd.to_datetime(df.index, errors='coerce'))
+            # report_date is the exchange-local date; the timestamp is stored as naive UTC
+            report_dates = EventData._dates(index.tz_localize(None) if index.tz is not None else index)
+            if index.tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            frame = df.rename(columns=fields).set_axis(index.rename(date_column)).reset_index()
+            frame['report_date'] = report_dates.to_numpy()
+            local.append(frame)
+        return pd.concat(local, keys=list(frames), names=['ticker', None], sort=False
+                         ).reset_index(level='ticker').reset_index(drop=True)
+
+    @staticmethod
+    def _actions(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        return EventData._indexed(frames, EventData.ACTION_FIELDS, 'event_at')
+
+    @staticmethod
+    def _grades(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        return EventData._indexed(frames, EventData.GRADE_FIELDS, 'graded_at')
+
+    @staticmethod
+    def _recommendations(frames: Dict[str, pd.DataFrame], as_of: date) -> pd.DataFrame:
+        stacked = pd.concat([df.rename(columns=EventData.RECOMMENDATION_FIELDS) for df in frames.values()],
+                            keys=list(frames), names=['ticker', None], sort=False).reset_index(level='ticker')
+        if 'period' not in stacked.columns:
+            logger.debug("Dropping recommendations without a period column")
+            return pd.DataFrame()
+        # Periods are months relative to the fetch: '0m', '-1m', ...
+        offsets = pd.to_numeric(stacked['period'].astype(str).str.extract(r'^(-?\d+)m$')[0], errors='coerce')
+        month = pd.Period(as_of, freq='M')
+        stacked['report_date'] = [(month + int(offset)).start_time.date() if pd.notna(offset) else None
+                                  for offset in offsets]
+        return stacked.reset_index(drop=True)
+
+    @staticmethod
+    def _calendar(frames: Dict[str, Any]) -> pd.DataFrame:
+        rows = []
+        for ticker, calendar in frames.items():
+            if isinstance(calendar, pd.DataFrame):
+                # Older yfinance versions return a frame with one row per field
+                calendar = {label: list(row.dropna()) for label, row in calendar.iterrows()}
+            if not isinstance(calendar, dict):
+                continue
+            earnings = calendar.get('Earnings Date')
+            earnings = list(earnings) if isinstance(earnings, (list, tuple)) else [earnings]
+            dates = sorted(d for d in EventData._dates(earnings) if d is not None)
+            if not dates:
+                continue
+            row = {'ticker': ticker, 'report_date': dates[0], 'earnings_date_end': dates[-1]}
+            for field, name in EventData.CALENDAR_FIELDS.items():
+                value = calendar.get(field)
+                row[name] = value[0] if isinstance(value, (list, tuple)) and value else value
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def _news(frames: Dict[str, Any]) -> pd.DataFrame:
+        rows = []
+        for ticker, items in frames.items():
+            records = items.to_dict('records') if isinstance(items, pd.DataFrame) else items
+            for item in records:
+                # Newer yfinance versions nest the article under 'content'
+                content = item.get('content')
+                if isinstance(content, dict):
+                    provider = content.get('provider') or {}
+                    url = content.get('canonicalUrl') or content.get('clickThroughUrl') or {}
+                    rows.append({
+                        'ticker': ticker,
+                        'uuid': content.get('id') or item.get('id'),
+                        'published_at': content.get('pubDate'),
+                        'title': content.get('title'),
+                        'publisher': provider.get('displayName'),
+                        'link': url.get('url'),
+                        'content_type': content.get('contentType'),
+                    })
+                else:
+                    rows.append({
+                        'ticker': ticker,
+                        'uuid': item.get('uuid'),
+                        'published_at': EventData._epoch(item.get('providerPublishTime')),
+                        'title': item.get('title'),
+                        'publisher': item.get('publisher'),
+                        'link': item.get('link'),
+                        'content_type': item.get('type'),
+                    })
+        news = pd.DataFrame(rows)
+        if not news.empty:
+            news['published_at'] = pd.to_datetime(news['published_at'], utc=True, errors='coerce', format='ISO8601')
+            news['report_date'] = EventData._dates(news['published_at'])
+        return news
+
+    @staticmethod
+    def _epoch(value: Any) -> Any:
+        """Older yfinance versions publish epoch seconds, newer ones ISO timestamps."""
+        if isinstance(value, Real) and pd.notna(value):
+            return pd.Timestamp(value, unit='s', tz='UTC')
+        return value
@@ -0,0 +1,77 @@
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import pandas as pd
+from sqlalchemy.engine import Engine
+from utils.db_utils import DatabaseConnection
+from services.yahoo_finance import YahooFinanceService
+from services.event_data import EventData
+
+
+class IncrementalPlanner:
+    """Skip fetches and rows for periods that are already stored in the database."""
+
+    # Days after the latest stored report date before a newer period can exist.
+    # Data types not listed here are always fetched.
+    MIN_PERIOD_DAYS = {
+        'annual_income': 365,
+        'annual_balance': 365,
+        'annual_cashflow': 365,
+        'quarterly_income': 91,
+        'quarterly_balance': 91,
+        'quarterly_cashflow': 91,
+        'stock_metrics': 1,
+    }
+
+    def __init__(self, latest: Dict[str, Dict[str, date]], today: Optional[date] = None):
+        """
+        Args:
+            latest (Dict[str, Dict[str, date]]): Latest report date per ticker for each table
+            today (Optional[date]): Reference date, defaults to the current date
+        """
+        self.latest = latest
+        self.today = today or date.today()
+        self.stats = {'skipped_fetches': 0, 'skipped_rows': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(engine: Engine, data_types: List[str]) -> Optional['IncrementalPlanner']:
+        """Build a planner from the latest report dates of the tables behind ``data_types``."""
+        table_names = [YahooFinanceService.get_table_name(dt) for dt in data_types]
+        latest = DatabaseConnection.get_latest_report_dates(engine, [name for name in table_names if name])
+        if latest is None:
+            return None
+        return IncrementalPlanner(latest)
+
+    def plan(self, ticker: str, data_types: List[str]) -> List[str]:
+        """Return the data types of a ticker that may have periods newer than the stored ones."""
+        planned = []
+        for data_type in data_types:
+            min_days = self.MIN_PERIOD_DAYS.get(data_type)
+            last = self.latest.get(YahooFinanceService.get_table_name(data_type), {}).get(ticker)
+            if min_days is not None and last is not None and self.today < last + timedelta(days=min_days):
+                self.stats['skipped_fetches'] += 1
+                continue
+            planned.append(data_type)
+        return planned
+
+    def filter_new_rows(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop rows at or before the latest stored report date of their ticker.
+
+        Events on the latest stored date are kept, as several can share a day and
+        their keys deduplicate them; revised snapshot tables are never filtered.
+        """
+        latest = self.latest.get(table_name)
+        if not latest or df.empty or 'report_date' not in df.columns or table_name in EventData.REVISED:
+            return df
+
+        last = pd.to_datetime(df['ticker'].map(latest))
+        report_dates = pd.to_datetime(df['report_date'])
+        if EventData.is_event_table(table_name):
+            new_rows = last.isna() | (report_dates >= last)
+        else:
+            new_rows = last.isna() | (report_dates > last)
+        with self._lock:
+            self.stats['skipped_rows'] += int((~new_rows).sum())
+        return df[new_rows]
@@ -0,0 +1,311 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import yfinance as yf
+from sqlalchemy.engine import Engine
+from utils.db_utils import DatabaseConnection
+from services.yahoo_finance import YahooFinanceService
+from services.ingest_pipeline import IngestPipeline
+from services.price_history import PriceHistoryService
+from services.parquet_sink import ParquetSink
+from services.derived_metrics import DerivedMetricsService
+from services.request_scheduler import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class _UnitOutcomes:
+    """Collects failed units of a batch through the RunJournal marking interface."""
+
+    def __init__(self):
+        self.failed: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def mark_pending(self, ticker: str, data_types: List[str]) -> None:
+        pass
+
+    def mark_done(self, tickers: Iterable[str], data_type: str) -> None:
+        pass
+
+    def mark_failed(self, tickers: Iterable[str], data_type: str, error: str = '') -> None:
+        with self._lock:
+            self.failed.update((ticker, data_type) for ticker in tickers)
+
+    def flush(self) -> None:
+        pass
+
+
+class IngestDaemon:
+    """
+    Long-running ingest that refreshes every (ticker, data_type) on its own cadence.
+
+    Units wait in a heap ordered by their next due time. Each cycle takes the due
+    units, runs them through one IngestPipeline batch with the process-wide engine,
+    column cache and request scheduler, and puts them back with their next due time.
+    Statements are refreshed daily from the day before an earnings date until
+    EARNINGS_WINDOW after it, and at their base cadence otherwise. Earnings dates
+    come from each ticker's Yahoo calendar, itself refreshed every CALENDAR_CADENCE.
+    """
+
+    CADENCES = {
+        'stock_metrics': timedelta(minutes=30),
+        'price_history': timedelta(days=1),
+        'quarterly_income': timedelta(days=7),
+        'quarterly_balance': timedelta(days=7),
+        'quarterly_cashflow': timedelta(days=7),
+        'annual_income': timedelta(days=30),
+        'annual_balance': timedelta(days=30),
+        'annual_cashflow': timedelta(days=30),
+        'news': timedelta(minutes=15),
+        'upgrades_downgrades': timedelta(hours=1),
+        'recommendations': timedelta(days=1),
+        'actions': timedelta(days=1),
+    }
+    DEFAULT_CADENCE = timedelta(days=1)
+
+    # Statement types whose refreshes follow earnings dates
+    EARNINGS_TYPES = {'quarterly_income', 'quarterly_balance', 'quarterly_cashflow',
+                      'annual_income', 'annual_balance', 'annual_cashflow'}
+    EARNINGS_CADENCE = timedelta(days=1)
+    EARNINGS_WINDOW = timedelta(days=21)
+
+    # Data type of the calendar refreshes feeding the earnings dates; refreshed
+    # on its own when the calendar is not stored
+    CALENDAR = 'calendar'
+    CALENDAR_CADENCE = timedelta(days=7)
+
+    # Delay before a failed unit is tried again, if shorter than its cadence
+    RETRY_DELAY = timedelta(minutes=15)
+
+    def __init__(self, engine: Engine, tickers: Iterable[str], data_types: List[str],
+                 cadences: Optional[Dict[str, timedelta]] = None, workers: int = 1,
+                 batch_rows: int = 5000, max_batch: int = 500, status_file: Optional[Path] = None,
+                 parquet: Optional[ParquetSink] = None, write_db: bool = True, derived: bool = False,
+                 history_chunk: int = 100, history_start: Optional[date] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        """
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            tickers (Iterable[str]): Universe to keep fresh; read once at startup
+            data_types (List[str]): Data types refreshed for every ticker
+            cadences (Optional[Dict[str, timedelta]]): Overrides of CADENCES per data type
+            workers (int): Number of fetch threads
+            batch_rows (int): Rows per table buffered by the writer before a write
+            max_batch (int): Most tickers taken from the queue per cycle
+            status_file (Optional[Path]): JSON file rewritten after every cycle
+            parquet (Optional[ParquetSink]): Also writes every batch to a Parquet dataset
+            write_db (bool): Write batches to the database
+            derived (bool): Recompute derived metrics of the quarters written by each cycle
+            history_chunk (int): Tickers per price_history download request
+            history_start (Optional[date]): First date of price_history for tickers without stored bars
+            scheduler (Optional[RequestScheduler]): Request scheduler reported in the status file
+        """
+        self.engine = engine
+        self.data_types = data_types
+        self.cadences = {**self.CADENCES, **(cadences or {})}
+        self.workers = workers
+        self.batch_rows = batch_rows
+        self.max_batch = max_batch
+        self.status_file = Path(status_file) if status_file else None
+        self.parquet = parquet
+        self.write_db = write_db
+        self.derived = derived
+        self.history_chunk = history_chunk
+        self.history_start = history_start
+        self.scheduler = scheduler
+
+        self.earnings: Dict[str, List[date]] = {}
+        self.totals = Counter()
+        self.last_cycle: Dict[str, Any] = {}
+        self.started_at = self._now()
+        self._stop = threading.Event()
+
+        # Everything is due at startup; the calendar goes first so the first
+        # statement refreshes already know the earnings dates
+        now = time.time()
+        self._queue: List[Tuple[float, str, str]] = []
+        track_earnings = any(dt in self.EARNINGS_TYPES for dt in data_types)
+        for ticker in dict.fromkeys(tickers):
+            if track_earnings and self.CALENDAR not in data_types:
+                self._queue.append((now - 1, ticker, self.CALENDAR))
+            self._queue.extend((now - 1 if data_type == self.CALENDAR else now, ticker, data_type)
+                               for data_type in data_types)
+        heapq.heapify(self._queue)
+
+    def run(self) -> None:
+        """Run cycles until stop() is called."""
+        logger.info("Serving %d units of %d data types", len(self._queue), len(self.data_types))
+        while not self._stop.is_set():
+            due = self._pop_due()
+            if due:
+                self._run_cycle(due)
+            self.write_status()
+            if not due and self._queue:
+                wait = max(0.0, self._queue[0][0] - time.time())
+                self._stop.wait(min(wait, 60.0))
+        logger.info("Stopped serving")
+
+    def stop(self) -> None:
+        """Ask the daemon to stop after its current cycle."""
+        self._stop.set()
+
+    def _pop_due(self) -> List[Tuple[str, str]]:
+        """Take due units for at most max_batch tickers."""
+        now = time.time()
+        tickers: Set[str] = set()
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            if self._queue[0][1] not in tickers and len(tickers) >= self.max_batch:
+                break
+            _, ticker, data_type = heapq.heappop(self._queue)
+            tickers.add(ticker)
+            due.append((ticker, data_type))
+        return due
+
+    def _run_cycle(self, due: List[Tuple[str, str]]) -> None:
+        started = time.monotonic()
+        outcomes = _UnitOutcomes()
+        cycle: Dict[str, Any] = {'units': len(due)}
+        try:
+            self._refresh(due, outcomes, cycle)
+            failed_units = len(outcomes.failed)
+        except Exception as e:
+            # A transient outage must not stop the daemon or lose the units taken from the queue
+            logger.error("Cycle of %d units failed: %s", len(due), e)
+            cycle['error'] = str(e)
+            self.totals['failed_cycles'] += 1
+            failed_units = len(due)
+
+        now = time.time()
+        for ticker, data_type in due:
+            failed = 'error' in cycle or (ticker, data_type) in outcomes.failed
+            heapq.heappush(self._queue, (self._next_due(ticker, data_type, now, failed), ticker, data_type))
+
+        cycle['failed_units'] = failed_units
+        cycle['seconds'] = round(time.monotonic() - started, 3)
+        cycle['finished_at'] = self._now().isoformat()
+        self.last_cycle = cycle
+        self.totals['cycles'] += 1
+        self.totals['units'] += len(due)
+        self.totals['failed_units'] += failed_units
+        logger.info("Cycle: %d units, %d failed, %ss", len(due), failed_units, cycle['seconds'])
+
+    def _refresh(self, due: List[Tuple[str, str]], outcomes: _UnitOutcomes, cycle: Dict[str, Any]) -> None:
+        """Fetch and write the due units, recording failed ones in ``outcomes``."""
+        by_type: Dict[str, List[str]] = {}
+        for ticker, data_type in due:
+            by_type.setdefault(data_type, []).append(ticker)
+
+        if self.CALENDAR in self.data_types and self.CALENDAR in by_type:
+            # Stored by the pipeline below, which reuses the memoized response
+            self._refresh_calendars(by_type[self.CALENDAR], outcomes, clear=False)
+        elif self.CALENDAR in by_type:
+            self._refresh_calendars(by_type.pop(self.CALENDAR), outcomes)
+
+        history_tickers = by_type.pop(PriceHistoryService.DATA_TYPE, [])
+        if by_type:
+            work: Dict[str, List[str]] = {}
+            for data_type, tickers in by_type.items():
+                for ticker in tickers:
+                    work.setdefault(ticker, []).append(data_type)
+
+            pipeline = IngestPipeline(self.engine, workers=self.workers, batch_rows=self.batch_rows,
+                                      journal=outcomes, parquet=self.parquet, write_db=self.write_db,
+                                      track_tables=DerivedMetricsService.SOURCE_TABLES if self.derived else ())
+            stats = pipeline.run(work.items())
+            cycle.update({key: stats[key] for key in ('tickers', 'inserted', 'updated', 'skipped')})
+            if self.derived and self.write_db and pipeline.touched:
+                cycle['derived'] = DerivedMetricsService.run(self.engine, pipeline.touched)['rows']
+
+        if history_tickers:
+            latest = DatabaseConnection.get_latest_report_dates(self.engine, [PriceHistoryService.TABLE_NAME])
+            history = PriceHistoryService.ingest(
+                self.engine, history_tickers, chunk_size=self.history_chunk, start=self.history_start,
+                latest=(latest or {}).get(PriceHistoryService.TABLE_NAME), journal=outcomes,
+                parquet=self.parquet, write_db=self.write_db)
+            cycle['bars_inserted'] = history['inserted']
+
+    def _refresh_calendars(self, tickers: List[str], outcomes: _UnitOutcomes, clear: bool = True) -> None:
+        def refresh(ticker: str) -> None:
+            try:
+                self.earnings[ticker] = YahooFinanceService.get_earnings_dates(yf.Ticker(ticker))
+            except Exception as e:
+                logger.warning("Error fetching calendar for %s: %s", ticker, e)
+                outcomes.mark_failed([ticker], self.CALENDAR, str(e))
+            finally:
+                if clear:
+                    YahooFinanceService.clear_cache(ticker)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='calendar') as executor:
+            list(executor.map(refresh, tickers))
+
+    def _next_due(self, ticker: str, data_type: str, now: float, failed: bool = False) -> float:
+        """Time at which a unit is next refreshed."""
+        if data_type == self.CALENDAR:
+            cadence = self.cadences.get(data_type, self.CALENDAR_CADENCE)
+        else:
+            cadence = self.cadences.get(data_type, self.DEFAULT_CADENCE)
+        if failed:
+            cadence = min(cadence, self.RETRY_DELAY)
+        due = now + cadence.total_seconds()
+        if data_type not in self.EARNINGS_TYPES:
+            return due
+
+        today = datetime.fromtimestamp(now, timezone.utc).date()
+        for earnings_date in self.earnings.get(ticker, []):
+            if earnings_date - timedelta(days=1) <= today <= earnings_date + self.EARNINGS_WINDOW:
+                return min(due, now + self.EARNINGS_CADENCE.total_seconds())
+            if today < earnings_date:
+                # Come back on the day after the next report at the latest
+                report = datetime.combine(earnings_date + timedelta(days=1), datetime.min.time(), timezone.utc)
+                return min(due, max(now, report.timestamp()))
+        return due
+
+    def status(self) -> Dict[str, Any]:
+        """Queue depth per data type, the latest cycle and totals."""
+        now = time.time()
+        per_type: Dict[str, Dict[str, Any]] = {}
+        for due, _, data_type in self._queue:
+            entry = per_type.setdefault(data_type, {'queued': 0, 'due': 0, 'next_due_at': due})
+            entry['queued'] += 1
+            entry['due'] += due <= now
+            entry['next_due_at'] = min(entry['next_due_at'], due)
+        for entry in per_type.values():
+            entry['next_due_at'] = datetime.fromtimestamp(entry['next_due_at'], timezone.utc).isoformat()
+
+        status = {
+            'started_at': self.started_at.isoformat(),
+            'updated_at': self._now().isoformat(),
+            'queue_depth': len(self._queue),
+            'due': sum(entry['due'] for entry in per_type.values()),
+            'data_types': per_type,
+            'last_cycle': self.last_cycle,
+            'totals': dict(self.totals),
+        }
+        if self.scheduler is not None:
+            status['requests'] = self.scheduler.summary()
+        return status
+
+    def write_status(self) -> None:
+        """Replace the status file with the current status."""
+        if self.status_file is None:
+            return
+        try:
+            self.status_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.status_file.with_name(f".{self.status_file.name}.tmp")
+            tmp_path.write_text(json.dumps(self.status(), indent=2, default=str))
+            os.replace(tmp_path, self.status_file)
+        except OSError as e:
+            logger.warning("Could not write status file %s: %s", self.status_file, e)
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
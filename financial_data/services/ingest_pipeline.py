@@ -0,0 +1,365 @@
+import logging
+import queue
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy.engine import Engine
+from services.data_processor import DataProcessor
+from services.event_data import EventData
+from services.yahoo_finance import YahooFinanceService
+from services.incremental import IncrementalPlanner
+from services.run_journal import RunJournal
+from services.parquet_sink import ParquetSink
+from services.sharding import WorkLeases
+from services.stock_metrics import StockMetrics, StockMetricsBuffer
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Single writer thread that batches frames per table before writing them.
+
+    Raw statement frames are transformed per batch with DataTransformer.transpose_many,
+    raw event feeds with EventData.to_frame, and ``.info`` dicts are extracted into a
+    columnar StockMetricsBuffer, so transform cost is paid once per batch rather than
+    once per ticker.
+    """
+
+    _STOP = object()
+
+    def __init__(self, engine: Engine, batch_rows: int = 5000, flush_interval: float = 5.0,
+                 queue_size: int = 64, planner: Optional[IncrementalPlanner] = None,
+                 journal: Optional[RunJournal] = None, parquet: Optional[ParquetSink] = None,
+                 write_db: bool = True, track_tables: Collection[str] = (),
+                 leases: Optional[WorkLeases] = None):
+        """
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            batch_rows (int): Buffered rows per table that trigger a write
+            flush_interval (float): Seconds without new frames after which buffers are written
+            queue_size (int): Maximum frames waiting for the writer before producers block
+            planner (Optional[IncrementalPlanner]): Drops rows that are already stored
+            journal (Optional[RunJournal]): Marks units done or failed as their batch is written
+            parquet (Optional[ParquetSink]): Also writes every batch to a Parquet dataset
+            write_db (bool): Write batches to the database
+            track_tables (Collection[str]): Tables whose written tickers are recorded in ``touched``
+            leases (Optional[WorkLeases]): Marks claimed units done or failed as their batch is written
+        """
+        self.engine = engine
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.planner = planner
+        self.journal = journal
+        self.parquet = parquet
+        self.write_db = write_db
+        self.track_tables = set(track_tables)
+        self.leases = leases
+        # Earliest report date written per ticker to the tracked tables
+        self.touched: Dict[str, date] = {}
+        self.stats = {'inserted': 0, 'updated': 0, 'skipped': 0, 'batches': 0, 'failed_batches': 0,
+                      'parquet_rows': 0}
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._buffers: Dict[str, List[pd.DataFrame]] = {}
+        self._raw_buffers: Dict[str, Dict[str, pd.DataFrame]] = {}
+        self._buffered_rows: Dict[str, int] = {}
+        self._units: Dict[str, List[str]] = {}
+        self._metrics_buffer = StockMetricsBuffer(batch_rows)
+        self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._thread.start()
+
+    def put(self, table_name: str, df: pd.DataFrame, ticker: Optional[str] = None) -> None:
+        """
+        Queue a frame for writing, blocking while the writer is saturated.
+
+        Args:
+            table_name (str): Target table
+            df (pd.DataFrame): Rows shaped for the table, or, when ``ticker`` is given,
+                a raw yfinance statement frame, event feed or ``.info`` dict
+            ticker (Optional[str]): Ticker of a raw frame or ``.info`` dict
+
+        Raises:
+            RuntimeError: If the writer thread has stopped, so producers do not block forever
+        """
+        self._enqueue((table_name, df, ticker))
+
+    def close(self) -> None:
+        """Write everything still buffered and stop the writer thread."""
+        if self._thread.is_alive():
+            self._enqueue(self._STOP)
+        self._thread.join()
+
+    def _enqueue(self, item: Any) -> None:
+        while True:
+            if not self._thread.is_alive():
+                raise RuntimeError("Batch writer thread is not running")
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        except Exception:
+            # put() raises from now on instead of blocking on a queue nobody drains
+            logger.exception("Batch writer stopped")
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_all()
+                continue
+
+            if item is self._STOP:
+                self._flush_all()
+                return
+
+            table_name, df, ticker = item
+            try:
+                self._buffer(table_name, df, ticker)
+            except Exception as e:
+                # One bad frame must not stop the writer; its unit fails on its own
+                logger.error("Error buffering %s rows%s: %s", table_name,
+                             f" of {ticker}" if ticker is not None else "", e)
+                self.stats['failed_batches'] += 1
+                if ticker is not None:
+                    self._bookkeep(table_name, [ticker], str(e))
+                continue
+            if self._buffered_rows[table_name] >= self.batch_rows:
+                self._flush(table_name)
+
+    def _buffer(self, table_name: str, df: Any, ticker: Optional[str]) -> None:
+        if ticker is None:
+            rows = len(df)
+            self._buffers.setdefault(table_name, []).append(df)
+        elif EventData.is_event_table(table_name):
+            # Event feeds have about one row per event
+            rows = len(df)
+            self._raw_buffers.setdefault(table_name, {})[ticker] = df
+        elif isinstance(df, dict):
+            rows = 1
+            self._metrics_buffer.append(ticker, df)
+        else:
+            # Raw statements have one column per report date
+            rows = len(df.columns)
+            self._raw_buffers.setdefault(table_name, {})[ticker] = df
+        self._buffered_rows[table_name] = self._buffered_rows.get(table_name, 0) + rows
+        if ticker is not None:
+            self._units.setdefault(table_name, []).append(ticker)
+
+    def _flush_all(self) -> None:
+        for table_name in list(self._buffered_rows):
+            self._flush(table_name)
+
+    def _flush(self, table_name: str) -> None:
+        frames = self._buffers.pop(table_name, [])
+        raw_frames = self._raw_buffers.pop(table_name, {})
+        self._buffered_rows.pop(table_name, None)
+        units = self._units.pop(table_name, [])
+
+        try:
+            if table_name == StockMetrics.TABLE_NAME and len(self._metrics_buffer):
+                try:
+                    frames.append(self._metrics_buffer.to_frame())
+                finally:
+                    self._metrics_buffer.clear()
+            if raw_frames:
+                frames.append(DataProcessor.transform_raw(self.engine, table_name, raw_frames))
+
+            if self.planner is not None:
+                frames = [self.planner.filter_new_rows(table_name, df) for df in frames]
+            if not any(len(df) for df in frames):
+                self._bookkeep(table_name, units)
+                return
+
+            counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+            if self.parquet is not None:
+                self.stats['parquet_rows'] += self.parquet.write(
+                    table_name, pd.concat([df for df in frames if len(df)], ignore_index=True))
+            if self.write_db:
+                counts = DataProcessor.write_frames_to_db(frames, self.engine, table_name,
+                                                          update=table_name in EventData.REVISED)
+            error = None if counts is not None else f"Write to {table_name} failed"
+        except Exception as e:
+            logger.error("Error writing batch to %s: %s", table_name, e)
+            counts = None
+            error = str(e)
+
+        self.stats['batches'] += 1
+        if counts is None:
+            self.stats['failed_batches'] += 1
+            self._bookkeep(table_name, units, error)
+            return
+        for key in ('inserted', 'updated', 'skipped'):
+            self.stats[key] += counts[key]
+        track = self.write_db and table_name in self.track_tables and (counts['inserted'] or counts['updated'])
+        self._bookkeep(table_name, units, frames=frames if track else None)
+
+    def _bookkeep(self, table_name: str, units: List[str], error: Optional[str] = None,
+                  frames: Optional[List[pd.DataFrame]] = None) -> None:
+        """Journal a flushed batch and record its written tickers, without ever stopping the writer."""
+        try:
+            self._journal_units(table_name, units, error)
+            if frames is not None:
+                self._track(frames)
+        except Exception as e:
+            logger.error("Error recording batch written to %s: %s", table_name, e)
+            self.stats['failed_batches'] += 1
+
+    def _track(self, frames: List[pd.DataFrame]) -> None:
+        written = pd.concat([df[['ticker', 'report_date']] for df in frames if len(df)], ignore_index=True)
+        for ticker, first in written.groupby('ticker')['report_date'].min().items():
+            if ticker not in self.touched or first < self.touched[ticker]:
+                self.touched[ticker] = first
+
+    def _journal_units(self, table_name: str, units: List[str], error: Optional[str] = None) -> None:
+        if not units:
+            return
+        data_type = YahooFinanceService.get_data_type(table_name)
+        for tracker in (self.journal, self.leases):
+            if tracker is None:
+                continue
+            if error is None:
+                tracker.mark_done(units, data_type)
+            else:
+                tracker.mark_failed(units, data_type, error)
+
+
+class IngestPipeline:
+    """Fetch tickers concurrently, feeding a single writer that transforms and writes in batches."""
+
+    def __init__(self, engine: Engine, workers: int = 1, max_in_flight: Optional[int] = None,
+                 batch_rows: int = 5000, planner: Optional[IncrementalPlanner] = None,
+                 journal: Optional[RunJournal] = None, parquet: Optional[ParquetSink] = None,
+                 write_db: bool = True, track_tables: Collection[str] = (),
+                 leases: Optional[WorkLeases] = None):
+        """
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            workers (int): Number of fetch threads
+            max_in_flight (Optional[int]): Tickers submitted but not yet finished,
+                defaults to twice the number of workers
+            batch_rows (int): Rows per table buffered by the writer before a write
+            planner (Optional[IncrementalPlanner]): Skips periods already stored
+            journal (Optional[RunJournal]): Checkpoints every (ticker, data_type) unit
+            parquet (Optional[ParquetSink]): Also writes every batch to a Parquet dataset
+            write_db (bool): Write batches to the database
+            track_tables (Collection[str]): Tables whose written tickers are recorded in ``touched``
+            leases (Optional[WorkLeases]): Releases units claimed from a distributed run
+        """
+        self.engine = engine
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers * 2
+        self.batch_rows = batch_rows
+        self.planner = planner
+        self.journal = journal
+        self.parquet = parquet
+        self.write_db = write_db
+        self.track_tables = track_tables
+        self.leases = leases
+        self.touched: Dict[str, date] = {}
+
+    def run(self, work: Iterable[Tuple[str, List[str]]]) -> Dict[str, Any]:
+        """
+        Process (ticker, data_types) units and return run statistics.
+
+        Args:
+            work (Iterable[Tuple[str, List[str]]]): Tickers with the data types to fetch
+
+        Returns:
+            Dict[str, Any]: Ticker, row and throughput counts for the run
+        """
+        started = time.monotonic()
+        stats = {'tickers': 0, 'failed_tickers': 0, 'up_to_date_tickers': 0}
+        writer = BatchWriter(self.engine, batch_rows=self.batch_rows, planner=self.planner,
+                             journal=self.journal, parquet=self.parquet, write_db=self.write_db,
+                             track_tables=self.track_tables, leases=self.leases)
+        writer.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest') as executor:
+                in_flight = set()
+                for ticker, data_types in work:
+                    if self.planner is not None:
+                        planned = self.planner.plan(ticker, data_types)
+                        if self.leases is not None:
+                            for data_type in data_types:
+                                if data_type not in planned:
+                                    self.leases.mark_done([ticker], data_type)
+                        data_types = planned
+                        if not data_types:
+                            stats['up_to_date_tickers'] += 1
+                            continue
+
+                    if self.journal is not None:
+                        self.journal.mark_pending(ticker, data_types)
+                    if len(in_flight) >= self.max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        self._collect(done, stats)
+                    in_flight.add(executor.submit(self._process, ticker, data_types, writer))
+
+                done, _ = wait(in_flight)
+                self._collect(done, stats)
+        finally:
+            writer.close()
+            if self.journal is not None:
+                self.journal.flush()
+            if self.leases is not None:
+                self.leases.flush()
+
+        elapsed = time.monotonic() - started
+        self.touched = writer.touched
+        stats.update(writer.stats)
+        if self.planner is not None:
+            stats.update(self.planner.stats)
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['tickers_per_second'] = round(stats['tickers'] / elapsed, 3) if elapsed > 0 else 0.0
+        return stats
+
+    def _process(self, ticker: str, data_types: List[str], writer: BatchWriter) -> bool:
+        """Fetch one ticker, isolating its failures from other workers."""
+        try:
+            fetched, failed = DataProcessor.fetch_ticker_data(ticker, data_types)
+            for table_name, df in fetched:
+                writer.put(table_name, df, ticker=ticker)
+
+            # Units with nothing to write are finished now; the rest when their batch is written
+            fetched_types = {YahooFinanceService.get_data_type(table_name) for table_name, _ in fetched}
+            for tracker in (self.journal, self.leases):
+                if tracker is None:
+                    continue
+                for data_type in data_types:
+                    if data_type in failed:
+                        tracker.mark_failed([ticker], data_type, failed[data_type])
+                    elif data_type not in fetched_types:
+                        tracker.mark_done([ticker], data_type)
+            return not failed
+        except Exception as e:
+            logger.error("Error processing ticker %s: %s", ticker, e)
+            Metrics.increment('pipeline', 'errors', ticker=ticker)
+            for tracker in (self.journal, self.leases):
+                if tracker is None:
+                    continue
+                for data_type in data_types:
+                    tracker.mark_failed([ticker], data_type, str(e))
+            return False
+        finally:
+            YahooFinanceService.clear_cache(ticker)
+
+    @staticmethod
+    def _collect(done, stats: Dict[str, Any]) -> None:
+        for future in done:
+            stats['tickers'] += 1
+            if not future.result():
+                stats['failed_tickers'] += 1
@@ -0,0 +1,320 @@
+import csv
+import io
+import logging
+import threading
+from datetime import date, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import pandas as pd
+import yfinance as yf
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from psycopg2 import Error as DBAPIError
+from utils.db_utils import DatabaseConnection
+from services.yahoo_finance import YahooFinanceService
+from services.request_scheduler import RequestScheduler
+from services.run_journal import RunJournal
+from services.parquet_sink import ParquetSink
+from services.sharding import WorkLeases
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PriceHistoryService:
+    """Bulk daily OHLCV download for many tickers per request, loaded with COPY."""
+
+    TABLE_NAME = 'price_history'
+    DATA_TYPE = 'price_history'
+
+    # yf.download field -> price_history column
+    FIELDS = {
+        'Open': 'open',
+        'High': 'high',
+        'Low': 'low',
+        'Close': 'close',
+        'Adj Close': 'adj_close',
+        'Volume': 'volume',
+    }
+
+    COLUMNS = ['ticker', 'report_date'] + list(FIELDS.values())
+
+    # History fetched for tickers without stored bars
+    DEFAULT_YEARS = 10
+
+    # Serializes yf.download calls, which report errors through a module global
+    _download_lock = threading.Lock()
+
+    @staticmethod
+    def ingest(engine: Engine, tickers: Iterable[str], chunk_size: int = 100,
+               start: Optional[date] = None, latest: Optional[Dict[str, date]] = None,
+               journal: Optional[RunJournal] = None, parquet: Optional[ParquetSink] = None,
+               write_db: bool = True, leases: Optional[WorkLeases] = None) -> Dict[str, Any]:
+        """
+        Download and store daily bars, one upstream request per chunk of tickers.
+
+        Only one chunk is held in memory at a time. Tickers of a chunk that share a
+        start date are downloaded together, so incremental runs need one request per
+        distinct start date rather than one per ticker.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            tickers (Iterable[str]): Tickers to load
+            chunk_size (int): Tickers per yf.download request
+            start (Optional[date]): First date for tickers without stored bars,
+                defaults to DEFAULT_YEARS ago
+            latest (Optional[Dict[str, date]]): Latest stored bar per ticker; loading
+                resumes the day after it
+            journal (Optional[RunJournal]): Checkpoints every ticker's price_history unit
+            parquet (Optional[ParquetSink]): Also writes the bars to a Parquet dataset
+            write_db (bool): Write the bars to the database
+            leases (Optional[WorkLeases]): Releases units claimed from a distributed run
+
+        Returns:
+            Dict[str, Any]: Counts of tickers, requests, and inserted/skipped rows
+        """
+        default_start = start or date.today() - timedelta(days=365 * PriceHistoryService.DEFAULT_YEARS)
+        latest = latest or {}
+        stats = {'tickers': 0, 'up_to_date_tickers': 0, 'requests': 0, 'failed_requests': 0,
+                 'failed_tickers': 0, 'inserted': 0, 'skipped': 0, 'parquet_rows': 0}
+
+        for chunk in PriceHistoryService._chunks(tickers, chunk_size):
+            stats['tickers'] += len(chunk)
+            for chunk_start, chunk_tickers in PriceHistoryService._group_by_start(
+                    chunk, default_start, latest).items():
+                if chunk_start > date.today():
+                    stats['up_to_date_tickers'] += len(chunk_tickers)
+                    if leases is not None:
+                        leases.mark_done(chunk_tickers, PriceHistoryService.DATA_TYPE)
+                    continue
+
+                stats['requests'] += 1
+                if journal is not None:
+                    for ticker in chunk_tickers:
+                        journal.mark_pending(ticker, [PriceHistoryService.DATA_TYPE])
+
+                downloaded = PriceHistoryService.download(chunk_tickers, chunk_start)
+                counts = None
+                if downloaded is not None:
+                    df, errors = downloaded
+                    try:
+                        if parquet is not None:
+                            stats['parquet_rows'] += parquet.write(PriceHistoryService.TABLE_NAME, df)
+                        counts = PriceHistoryService.write(engine, df) if write_db else {'inserted': 0, 'skipped': 0}
+                    except Exception as e:
+                        logger.error("Error writing price history: %s", e)
+                trackers = [tracker for tracker in (journal, leases) if tracker is not None]
+                if counts is None:
+                    stats['failed_requests'] += 1
+                    for tracker in trackers:
+                        tracker.mark_failed(chunk_tickers, PriceHistoryService.DATA_TYPE,
+                                            'Price history download or write failed')
+                    continue
+
+                stats['inserted'] += counts['inserted']
+                stats['skipped'] += counts['skipped']
+                done, missing = PriceHistoryService._outcome(chunk_tickers, df, errors, latest)
+                stats['failed_tickers'] += len(missing)
+                for tracker in trackers:
+                    tracker.mark_done(done, PriceHistoryService.DATA_TYPE)
+                    if missing:
+                        tracker.mark_failed(missing, PriceHistoryService.DATA_TYPE, 'No price history returned')
+
+        for tracker in (journal, leases):
+            if tracker is not None:
+                tracker.flush()
+        return stats
+
+    @staticmethod
+    def download(tickers: List[str], start: date) -> Optional[Tuple[pd.DataFrame, Set[str]]]:
+        """
+        Download daily bars for several tickers in one request.
+
+        Args:
+            tickers (List[str]): Tickers to download
+            start (date): First date to download
+
+        Returns:
+            Optional[Tuple[pd.DataFrame, Set[str]]]: Rows shaped for the price_history table and
+            the tickers yfinance reported errors for, or None on error
+        """
+        try:
+            with Metrics.timer('fetch', data_type=PriceHistoryService.DATA_TYPE):
+                data, errors = YahooFinanceService.schedule(
+                    lambda: PriceHistoryService._request(tickers, start), PriceHistoryService.DATA_TYPE)
+            Metrics.increment('fetch', 'upstream_calls', data_type=PriceHistoryService.DATA_TYPE)
+        except Exception as e:
+            logger.warning("Error downloading price history for %d tickers: %s", len(tickers), e)
+            Metrics.increment('fetch', 'errors', data_type=PriceHistoryService.DATA_TYPE)
+            return None
+
+        if errors:
+            logger.warning("No price history for %d of %d tickers: %s", len(errors), len(tickers),
+                           ', '.join(sorted(errors)))
+        with Metrics.timer('transform', data_type=PriceHistoryService.DATA_TYPE):
+            return PriceHistoryService.to_rows(data, tickers), errors
+
+    @staticmethod
+    def _request(tickers: List[str], start: date) -> Tuple[pd.DataFrame, Set[str]]:
+        """
+        One yf.download request, returning its frame and the tickers that failed.
+
+        yf.download logs per-ticker errors in yf.shared._ERRORS instead of raising
+        them; throttling and server errors among them are raised here so the
+        scheduler backs off and retries the chunk. That global is shared by every
+        download, so downloads run one at a time.
+        """
+        with PriceHistoryService._download_lock:
+            yf.shared._ERRORS = {}
+            data = yf.download(
+                tickers,
+                start=start.isoformat(),
+                group_by='ticker',
+                auto_adjust=False,
+                actions=False,
+                threads=True,
+                progress=False
+            )
+            errors = dict(yf.shared._ERRORS)
+        for ticker, error in errors.items():
+            if RequestScheduler.classify(RuntimeError(error)) is not None:
+                raise RuntimeError(f"{ticker}: {error}")
+        failed = {ticker.upper() for ticker in errors}
+        return data, {ticker for ticker in tickers if ticker.upper() in failed}
+
+    @staticmethod
+    def to_rows(data: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+        """
+        Reshape a yf.download frame (dates x (ticker, field)) into one row per ticker and date.
+
+        Args:
+            data (pd.DataFrame): Result of yf.download with group_by='ticker'
+            tickers (List[str]): Requested tickers, used when a single ticker comes back
+                without the ticker column level
+
+        Returns:
+            pd.DataFrame: Columns ticker, report_date and the OHLCV fields
+        """
+        if data is None or data.empty:
+            return pd.DataFrame(columns=PriceHistoryService.COLUMNS)
+
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({tickers[0]: data}, axis=1)
+
+        # Move the ticker level into the index; the field level stays as columns
+        rows = (data.stack(level=0)
+                .rename_axis(['report_date', 'ticker'])
+                .reset_index()
+                .rename(columns=PriceHistoryService.FIELDS))
+        rows = rows.dropna(subset=['close'])
+        rows['report_date'] = pd.to_datetime(rows['report_date']).dt.date
+        rows['volume'] = rows['volume'].round().astype('Int64')
+        return rows.reindex(columns=PriceHistoryService.COLUMNS)
+
+    @staticmethod
+    def write(engine: Engine, df: pd.DataFrame) -> Optional[Dict[str, int]]:
+        """
+        Load bars, skipping (ticker, report_date) pairs that are already stored.
+
+        On Postgres the rows are streamed with COPY into a temporary staging table
+        and moved into price_history with one INSERT ... ON CONFLICT DO NOTHING.
+        Other databases fall back to DatabaseConnection.upsert_dataframe.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            df (pd.DataFrame): Rows shaped for the price_history table
+
+        Returns:
+            Optional[Dict[str, int]]: Counts of inserted and skipped rows, or None on error
+        """
+        if df.empty:
+            return {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+        data_type = PriceHistoryService.DATA_TYPE
+        with Metrics.timer('write', data_type=data_type):
+            if engine.dialect.name == 'postgresql':
+                counts = PriceHistoryService._copy(engine, df)
+            else:
+                counts = DatabaseConnection.upsert_dataframe(engine, df, PriceHistoryService.TABLE_NAME)
+
+        if counts is None:
+            Metrics.increment('write', 'errors', data_type=data_type)
+            return None
+        Metrics.increment('write', 'rows_inserted', counts['inserted'], data_type=data_type)
+        Metrics.increment('write', 'rows_skipped', counts['skipped'], data_type=data_type)
+        return counts
+
+    @staticmethod
+    def _copy(engine: Engine, df: pd.DataFrame) -> Optional[Dict[str, int]]:
+        """COPY rows into a staging table and merge them into price_history."""
+        columns = ', '.join(PriceHistoryService.COLUMNS)
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep='', quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+
+        try:
+            with engine.begin() as conn:
+                cursor = conn.connection.cursor()
+                try:
+                    cursor.execute(
+                        "CREATE TEMPORARY TABLE price_history_staging "
+                        "(LIKE price_history INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    cursor.copy_expert(
+                        f"COPY price_history_staging ({columns}) FROM STDIN WITH (FORMAT csv)",
+                        buffer
+                    )
+                    cursor.execute(
+                        f"INSERT INTO price_history ({columns}) "
+                        f"SELECT {columns} FROM price_history_staging "
+                        f"ORDER BY ticker, report_date "
+                        f"ON CONFLICT (ticker, report_date) DO NOTHING"
+                    )
+                    inserted = cursor.rowcount
+                finally:
+                    cursor.close()
+                Metrics.increment('write', 'db_round_trips', 3)
+            if inserted:
+                DatabaseConnection.notify_write(PriceHistoryService.TABLE_NAME)
+            return {'inserted': inserted, 'updated': 0, 'skipped': len(df) - inserted}
+        except (SQLAlchemyError, DBAPIError) as e:
+            logger.error("Error copying into price_history: %s", e)
+            return None
+
+    @staticmethod
+    def _outcome(tickers: List[str], df: pd.DataFrame, errors: Set[str],
+                 latest: Dict[str, date]) -> Tuple[List[str], List[str]]:
+        """
+        Split a chunk into tickers that are done and tickers that failed.
+
+        yf.download returns all-NaN columns for tickers it could not fetch, which
+        leave no rows. A ticker without rows is done only when it already has stored
+        bars and no error was reported, i.e. there are no new bars yet.
+        """
+        fetched = set(df['ticker'])
+        done, missing = [], []
+        for ticker in tickers:
+            if ticker in fetched or (ticker in latest and ticker not in errors):
+                done.append(ticker)
+            else:
+                missing.append(ticker)
+        return done, missing
+
+    @staticmethod
+    def _chunks(tickers: Iterable[str], size: int) -> Iterator[List[str]]:
+        iterator = iter(tickers)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def _group_by_start(tickers: List[str], default_start: date,
+                        latest: Dict[str, date]) -> Dict[date, List[str]]:
+        groups: Dict[date, List[str]] = {}
+        for ticker in tickers:
+            last = latest.get(ticker)
+            start = last + timedelta(days=1) if last is not None else default_start
+            groups.setdefault(start, []).append(ticker)
+        return groups
@@ -0,0 +1,213 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RawStore:
+    """
+    Append-only landing store of raw yfinance responses.
+
+    Every upstream response is kept with its fetch time as one line of gzip-compressed
+    JSON Lines files. Layout: ``<root>/<data_type>/bucket=<NN>/date=<YYYY-MM-DD>/part-*.jsonl.gz``,
+    where the bucket is a stable hash of the ticker and the date is the UTC fetch date.
+    Lines are buffered per partition and written when a buffer reaches ``flush_bytes``,
+    every ``flush_interval`` seconds, and on close(). Files are written under a
+    dot-prefixed temporary name and renamed into place once complete.
+    """
+
+    def __init__(self, root: Path, buckets: int = 8, flush_bytes: int = 8 * 1024 * 1024,
+                 flush_interval: float = 60.0, compresslevel: int = 6):
+        """
+        Args:
+            root (Path): Store root directory
+            buckets (int): Ticker hash buckets per data type
+            flush_bytes (int): Uncompressed bytes buffered per partition before a file is written
+            flush_interval (float): Seconds after which every buffered line is written
+            compresslevel (int): gzip compression level
+        """
+        self.root = Path(root)
+        self.buckets = buckets
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+        self.stats = {'responses': 0, 'files': 0, 'bytes': 0}
+        self._buffers: Dict[Tuple[str, int, str], List[bytes]] = {}
+        self._buffered_bytes: Dict[Tuple[str, int, str], int] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def put(self, ticker: str, data_type: str, value: Any, fetched_at: Optional[datetime] = None) -> None:
+        """Buffer one response; empty responses are not kept."""
+        if value is None or (isinstance(value, (pd.DataFrame, pd.Series)) and value.empty) or (
+                isinstance(value, (dict, list)) and not value):
+            return
+
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        try:
+            line = json.dumps({'ticker': ticker, 'data_type': data_type, 'fetched_at': fetched_at.isoformat(),
+                               **RawStore.encode(value)}, default=RawStore._json_default)
+        except (TypeError, ValueError) as e:
+            logger.warning("Could not encode raw %s response of %s: %s", data_type, ticker, e)
+            return
+        data = line.encode() + b'\n'
+        partition = (data_type, zlib.crc32(ticker.encode()) % self.buckets, fetched_at.date().isoformat())
+
+        with self._lock:
+            self._buffers.setdefault(partition, []).append(data)
+            self._buffered_bytes[partition] = self._buffered_bytes.get(partition, 0) + len(data)
+            self.stats['responses'] += 1
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                batches = self._take_all()
+            elif self._buffered_bytes[partition] >= self.flush_bytes:
+                batches = [self._take(partition)]
+            else:
+                batches = []
+        # Compression and disk writes happen outside the lock, so other fetches are not held up
+        for batch in batches:
+            self._write(*batch)
+
+    def flush(self) -> None:
+        """Write every buffered line."""
+        with self._lock:
+            batches = self._take_all()
+        for batch in batches:
+            self._write(*batch)
+
+    def close(self) -> None:
+        """Write every buffered line; the store can still be used afterwards."""
+        self.flush()
+
+    def _take_all(self) -> List[Tuple[Tuple[str, int, str], str, List[bytes]]]:
+        self._last_flush = time.monotonic()
+        return [self._take(partition) for partition in list(self._buffers)]
+
+    def _take(self, partition: Tuple[str, int, str]) -> Tuple[Tuple[str, int, str], str, List[bytes]]:
+        """Pop a partition's lines with the name of their file, called with the lock held."""
+        self._buffered_bytes.pop(partition, None)
+        # Named when taken, so file names keep the order in which lines were buffered
+        name = f"part-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:12]}.jsonl.gz"
+        return partition, name, self._buffers.pop(partition, [])
+
+    def _write(self, partition: Tuple[str, int, str], name: str, lines: List[bytes]) -> None:
+        if not lines:
+            return
+
+        data_type, bucket, fetch_date = partition
+        directory = self.root / data_type / f"bucket={bucket:02d}" / f"date={fetch_date}"
+        final_path = directory / name
+        tmp_path = directory / f".{name}.tmp"
+        try:
+            with Metrics.timer('raw_store', data_type=data_type):
+                directory.mkdir(parents=True, exist_ok=True)
+                with gzip.open(tmp_path, 'wb', compresslevel=self.compresslevel) as f:
+                    f.write(b''.join(lines))
+                os.replace(tmp_path, final_path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.error("Could not write raw responses to %s: %s", directory, e)
+            Metrics.increment('raw_store', 'errors', data_type=data_type)
+            return
+
+        Metrics.increment('raw_store', 'responses', len(lines), data_type=data_type)
+        size = final_path.stat().st_size
+        with self._lock:
+            self.stats['files'] += 1
+            self.stats['bytes'] += size
+
+    @staticmethod
+    def partitions(root: Path, data_types: Optional[Iterable[str]] = None) -> List[Tuple[str, Path]]:
+        """(data_type, bucket directory) pairs of a store, optionally for some data types only."""
+        root = Path(root)
+        wanted = set(data_types) if data_types is not None else None
+        found = []
+        for type_dir in sorted(path for path in root.iterdir() if path.is_dir()) if root.is_dir() else []:
+            if wanted is not None and type_dir.name not in wanted:
+                continue
+            found.extend((type_dir.name, bucket_dir) for bucket_dir in sorted(type_dir.glob('bucket=*')))
+        return found
+
+    @staticmethod
+    def files(bucket_dir: Path, since: Optional[date] = None, until: Optional[date] = None) -> List[Tuple[date, Path]]:
+        """Files of a bucket in fetch order, with their fetch date, between ``since`` and ``until``."""
+        files = []
+        for date_dir in sorted(Path(bucket_dir).glob('date=*')):
+            fetch_date = date.fromisoformat(date_dir.name.split('=', 1)[1])
+            if (since is not None and fetch_date < since) or (until is not None and fetch_date > until):
+                continue
+            files.extend((fetch_date, path) for path in sorted(date_dir.glob('part-*.jsonl.gz')))
+        return files
+
+    @staticmethod
+    def read(path: Path) -> Iterator[Tuple[str, str, datetime, Any]]:
+        """(ticker, data_type, fetched_at, value) of every response in a file, in fetch order."""
+        with gzip.open(path, 'rt') as f:
+            for line in f:
+                record = json.loads(line)
+                yield (record['ticker'], record['data_type'], datetime.fromisoformat(record['fetched_at']),
+                       RawStore.decode(record))
+
+    @staticmethod
+    def encode(value: Any) -> Dict[str, Any]:
+        """JSON-ready form of a response: frames by index, columns and values, anything else as is."""
+        if isinstance(value, pd.DataFrame):
+            return {'frame': {
+                'index': RawStore._encode_labels(value.index),
+                'columns': RawStore._encode_labels(value.columns),
+                'data': value.astype(object).where(value.notna(), None).values.tolist(),
+            }}
+        return {'value': value}
+
+    @staticmethod
+    def decode(record: Dict[str, Any]) -> Any:
+        """Rebuild a response from its encoded form."""
+        if 'frame' not in record:
+            return record.get('value')
+        frame = record['frame']
+        return pd.DataFrame(frame['data'], index=RawStore._decode_labels(frame['index']),
+                            columns=RawStore._decode_labels(frame['columns']))
+
+    @staticmethod
+    def _encode_labels(index: pd.Index) -> Dict[str, Any]:
+        if isinstance(index, pd.DatetimeIndex):
+            # Wall-clock times plus the zone, so local dates survive the round trip
+            return {'dates': [ts.isoformat() if pd.notna(ts) else None for ts in index.tz_localize(None)],
+                    'tz': str(index.tz) if index.tz is not None else None, 'name': index.name}
+        return {'values': [label if label is None or isinstance(label, (str, int, float, bool))
+                           else RawStore._json_default(label) for label in index.tolist()],
+                'name': index.name}
+
+    @staticmethod
+    def _decode_labels(labels: Dict[str, Any]) -> pd.Index:
+        if 'dates' in labels:
+            index = pd.DatetimeIndex(pd.to_datetime(labels['dates']), name=labels.get('name'))
+            if labels.get('tz'):
+                index = index.tz_localize(labels['tz'], ambiguous=False, nonexistent='shift_forward')
+            return index
+        return pd.Index(labels['values'], name=labels.get('name'))
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        if value is pd.NaT or value is pd.NA:
+            return None
+        if isinstance(value, (datetime, date, pd.Timestamp)):
+            return value.isoformat()
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.astype(object).where(value.notna(), None).to_dict()
+        if isinstance(value, (set, tuple)):
+            return list(value)
+        raise TypeError(f"Cannot encode {type(value).__name__}")
@@ -0,0 +1,150 @@
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from utils.data_utils import DataTransformer
+from utils.db_utils import DatabaseConnection
+from services.data_processor import DataProcessor
+from services.yahoo_finance import YahooFinanceService
+from services.parquet_sink import ParquetSink
+from services.price_history import PriceHistoryService
+from services.raw_store import RawStore
+
+logger = logging.getLogger(__name__)
+
+
+class _ReplayTask(NamedTuple):
+    """One (data type, ticker bucket) of a raw store, replayed by one worker process."""
+    data_type: str
+    bucket_dir: Path
+    tickers: Optional[FrozenSet[str]]
+    since: Optional[date]
+    until: Optional[date]
+    write_db: bool
+    parquet_dir: Optional[Path]
+    parquet_buckets: int
+
+
+class ReplayService:
+    """
+    Re-run transform and write over the responses kept in a RawStore, without the network.
+
+    Every (data type, ticker bucket) partition of the store is replayed by one worker
+    process, file by file in fetch order, so a ticker's later responses are written
+    after its earlier ones. Rows are written as if freshly fetched, except that stored
+    rows are overwritten: statements where their row_hash changed, every other table
+    unconditionally.
+    """
+
+    @staticmethod
+    def run(root: Path, data_types: Optional[List[str]] = None, tickers: Optional[Iterable[str]] = None,
+            since: Optional[date] = None, until: Optional[date] = None, processes: Optional[int] = None,
+            write_db: bool = True, parquet_dir: Optional[Path] = None,
+            parquet_buckets: int = 8) -> Dict[str, int]:
+        """
+        Replay the raw responses of a store.
+
+        Args:
+            root (Path): RawStore root directory
+            data_types (Optional[List[str]]): Data types to replay, defaults to all in the store
+            tickers (Optional[Iterable[str]]): Tickers to replay, defaults to all
+            since (Optional[date]): First fetch date replayed
+            until (Optional[date]): Last fetch date replayed
+            processes (Optional[int]): Worker processes, defaults to the CPU count
+            write_db (bool): Write rows to the database
+            parquet_dir (Optional[Path]): Also write rows to the Parquet dataset at this root
+            parquet_buckets (int): Ticker hash buckets of the Parquet dataset
+
+        Returns:
+            Dict[str, int]: Counts of partitions, files, responses and rows replayed, rows
+            inserted, updated and skipped, and failed writes
+        """
+        selected = frozenset(tickers) if tickers is not None else None
+        tasks = [_ReplayTask(data_type, bucket_dir, selected, since, until, write_db, parquet_dir, parquet_buckets)
+                 for data_type, bucket_dir in RawStore.partitions(root, data_types)
+                 if ReplayService._replayable(data_type)]
+
+        totals = Counter(partitions=len(tasks))
+        if not tasks:
+            logger.warning("No raw responses to replay in %s", root)
+            return dict(totals)
+
+        logger.info("Replaying %d partitions of %s", len(tasks), root)
+        # Workers open their own connections; an engine inherited by fork is left to this process
+        with ProcessPoolExecutor(max_workers=processes, initializer=DatabaseConnection.reset_engine) as executor:
+            for counts in executor.map(ReplayService._replay_partition, tasks):
+                totals.update(counts)
+        return dict(totals)
+
+    @staticmethod
+    def _replayable(data_type: str) -> bool:
+        # Price history is downloaded for many tickers per request and never lands in the store
+        return (data_type != PriceHistoryService.DATA_TYPE
+                and YahooFinanceService.get_table_name(data_type) is not None)
+
+    @staticmethod
+    def _replay_partition(task: _ReplayTask) -> Dict[str, int]:
+        """Replay one partition in a worker process."""
+        counts = Counter()
+        table_name = YahooFinanceService.get_table_name(task.data_type)
+        # Table columns come from the database even when only Parquet is written
+        engine = DatabaseConnection.get_engine()
+        if engine is None:
+            logger.error("Could not connect to database to replay %s", task.bucket_dir)
+            counts['failed_writes'] += 1
+            return dict(counts)
+        parquet = ParquetSink(task.parquet_dir, buckets=task.parquet_buckets) if task.parquet_dir else None
+
+        try:
+            for fetch_date, path in RawStore.files(task.bucket_dir, task.since, task.until):
+                counts['files'] += 1
+                try:
+                    responses = [(ticker, value) for ticker, _, _, value in RawStore.read(path)
+                                 if task.tickers is None or ticker in task.tickers]
+                except (OSError, ValueError, EOFError) as e:
+                    logger.error("Skipping unreadable raw file %s: %s", path, e)
+                    counts['failed_files'] += 1
+                    continue
+                counts['responses'] += len(responses)
+
+                for raw in ReplayService._generations(responses):
+                    df = DataProcessor.transform_raw(engine, table_name, raw, as_of=fetch_date)
+                    if df.empty:
+                        continue
+                    counts['rows'] += len(df)
+                    if parquet is not None:
+                        parquet.write(table_name, df)
+                    if not task.write_db:
+                        continue
+                    # Hashed statement rows are rewritten only where they changed
+                    update = DataTransformer.HASH_COLUMN not in df.columns
+                    written = DataProcessor.write_to_db(df, engine, table_name, update=update)
+                    if written is None:
+                        counts['failed_writes'] += 1
+                        continue
+                    for key in ('inserted', 'updated', 'skipped'):
+                        counts[key] += written[key]
+        except Exception as e:
+            logger.error("Error replaying %s: %s", task.bucket_dir, e)
+            counts['failed_writes'] += 1
+        return dict(counts)
+
+    @staticmethod
+    def _generations(responses: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Split (ticker, response) pairs in fetch order into batches of one response per ticker.
+
+        A ticker fetched several times lands in consecutive batches, so its responses
+        are still written in fetch order.
+        """
+        generations: List[Dict[str, Any]] = []
+        for ticker, value in responses:
+            for generation in generations:
+                if ticker not in generation:
+                    generation[ticker] = value
+                    break
+            else:
+                generations.append({ticker: value})
+        return generations
@@ -0,0 +1,193 @@
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import pandas as pd
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Status codes and messages that mean the provider is throttling us
+THROTTLE_PATTERN = re.compile(r'\b429\b|too many requests|rate limit', re.IGNORECASE)
+SERVER_ERROR_PATTERN = re.compile(r'\b5\d\d\b.*(error|server|unavailable|gateway)|'
+                                  r'(error|server|unavailable|gateway).*\b5\d\d\b', re.IGNORECASE)
+
+
+class RequestScheduler:
+    """
+    Gate every upstream Yahoo request through a token bucket and a concurrency limit.
+
+    Throttling (429), server errors (5xx) and empty responses are retried with
+    exponential backoff and full jitter. The request rate adapts AIMD-style:
+    it grows additively while requests succeed and is cut multiplicatively
+    whenever the provider throttles, so runs settle just below its limit.
+    """
+
+    def __init__(self, max_rps: float = 5.0, max_concurrency: int = 4, max_retries: int = 4,
+                 empty_retries: int = 1, base_delay: float = 1.0, max_delay: float = 60.0,
+                 min_rps: float = 0.2, increase: float = 0.05, decrease: float = 0.5):
+        """
+        Args:
+            max_rps (float): Ceiling of the request rate; 0 disables rate limiting
+            max_concurrency (int): Requests in flight at once
+            max_retries (int): Retries after a throttled or failed request
+            empty_retries (int): Retries after an empty response, which Yahoo
+                also returns when it throttles silently
+            base_delay (float): First backoff in seconds, doubled per retry
+            max_delay (float): Longest backoff in seconds
+            min_rps (float): Floor of the adaptive request rate
+            increase (float): Requests per second added per second of successes
+            decrease (float): Factor applied to the rate when throttled
+        """
+        self.max_rps = max_rps
+        self.max_retries = max_retries
+        self.empty_retries = empty_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_rps = min(min_rps, max_rps) if max_rps else min_rps
+        self.increase = increase
+        self.decrease = decrease
+        self.rate = max_rps
+        self.stats = {'requests': 0, 'throttled': 0, 'server_errors': 0, 'empty_responses': 0,
+                      'retries': 0, 'failures': 0, 'wait_seconds': 0.0}
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._refilled_at = time.monotonic()
+        self._resume_at = 0.0
+
+    def call(self, func: Callable[[], Any], data_type: Optional[str] = None) -> Any:
+        """
+        Run one upstream request under the scheduler.
+
+        Args:
+            func (Callable[[], Any]): Performs the request; called again for every retry,
+                so it must not return a result cached by an earlier attempt
+            data_type (Optional[str]): Label for metrics
+
+        Returns:
+            Any: The response; empty if it stayed empty after ``empty_retries`` retries
+
+        Raises:
+            Exception: The last error once retries are exhausted, or any error that
+                is neither throttling nor a server error
+        """
+        attempt = 0
+        empty_attempts = 0
+        while True:
+            self._acquire()
+            try:
+                with self._semaphore:
+                    self._count('requests', data_type)
+                    value = func()
+            except Exception as e:
+                kind = self.classify(e)
+                if kind is None:
+                    raise
+                self._count(kind, data_type)
+                if kind == 'throttled':
+                    self._on_throttle()
+                if attempt >= self.max_retries:
+                    self._count('failures', data_type)
+                    raise
+                attempt += 1
+                self._backoff(attempt, throttled=kind == 'throttled', data_type=data_type)
+                continue
+
+            if self._is_empty(value) and empty_attempts < self.empty_retries:
+                self._count('empty_responses', data_type)
+                empty_attempts += 1
+                self._backoff(empty_attempts, throttled=False, data_type=data_type)
+                continue
+
+            self._on_success()
+            return value
+
+    @staticmethod
+    def classify(error: Exception) -> Optional[str]:
+        """Classify an error as 'throttled', 'server_errors', or None if it should not be retried."""
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+        if status == 429:
+            return 'throttled'
+        if isinstance(status, int) and 500 <= status < 600:
+            return 'server_errors'
+
+        message = f"{type(error).__name__}: {error}"
+        if 'RateLimit' in type(error).__name__ or THROTTLE_PATTERN.search(message):
+            return 'throttled'
+        if SERVER_ERROR_PATTERN.search(message):
+            return 'server_errors'
+        return None
+
+    def _acquire(self) -> None:
+        """Block until a global backoff is over and a token is available."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._resume_at - now
+                if delay <= 0 and self.max_rps:
+                    self._tokens = min(max(self.rate, 1.0),
+                                       self._tokens + (now - self._refilled_at) * self.rate)
+                    self._refilled_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                    else:
+                        delay = (1 - self._tokens) / self.rate
+                if delay <= 0:
+                    self.stats['wait_seconds'] += waited
+                    return
+            time.sleep(delay)
+            waited += delay
+
+    def _backoff(self, attempt: int, throttled: bool, data_type: Optional[str]) -> None:
+        """Sleep with full jitter; throttling also pauses every other request."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        self._count('retries', data_type)
+        if throttled:
+            with self._lock:
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        logger.debug("Retrying %s request in %.2fs (attempt %d)", data_type or 'upstream', delay, attempt)
+        time.sleep(delay)
+
+    def _on_success(self) -> None:
+        if not self.max_rps:
+            return
+        with self._lock:
+            # Additive increase of roughly ``increase`` requests per second, per second
+            self.rate = min(self.max_rps, self.rate + self.increase / max(self.rate, 1e-9))
+
+    def _on_throttle(self) -> None:
+        if not self.max_rps:
+            return
+        with self._lock:
+            self.rate = max(self.min_rps, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        logger.warning("Throttled by the provider, request rate lowered to %.2f/s", rate)
+
+    def _count(self, key: str, data_type: Optional[str]) -> None:
+        with self._lock:
+            self.stats[key] += 1
+        Metrics.increment('scheduler', key, data_type=data_type)
+
+    @staticmethod
+    def _is_empty(value: Any) -> bool:
+        if value is None:
+            return True
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.empty
+        if isinstance(value, (dict, list)):
+            return not value
+        return False
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters plus the current adaptive rate."""
+        with self._lock:
+            summary = dict(self.stats)
+            summary['wait_seconds'] = round(summary['wait_seconds'], 3)
+            summary['rate'] = round(self.rate, 3)
+        return summary
@@ -0,0 +1,152 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+import pandas as pd
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """On-disk cache of yfinance responses with per-data-type TTLs and LRU eviction."""
+
+    # Seconds a cached response stays fresh, per data type
+    DEFAULT_TTLS = {
+        'annual_income': 14 * DAY,
+        'annual_balance': 14 * DAY,
+        'annual_cashflow': 14 * DAY,
+        'quarterly_income': 2 * DAY,
+        'quarterly_balance': 2 * DAY,
+        'quarterly_cashflow': 2 * DAY,
+        'stock_metrics': 6 * HOUR,
+        'actions': DAY,
+        'calendar': DAY,
+        'recommendations': DAY,
+        'upgrades_downgrades': DAY,
+        'news': HOUR,
+    }
+
+    DEFAULT_TTL = DAY
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 1024 ** 3,
+                 ttls: Optional[Dict[str, int]] = None, refresh: bool = False):
+        """
+        Args:
+            cache_dir (Path): Directory holding one pickle per ticker and data type
+            max_bytes (int): Size cap; least recently used entries are evicted beyond it
+            ttls (Optional[Dict[str, int]]): Overrides for DEFAULT_TTLS
+            refresh (bool): Ignore existing entries but still store fresh responses
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.refresh = refresh
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def get(self, ticker: str, data_type: str) -> Any:
+        """Get a fresh cached response, or None on a miss."""
+        if self.refresh:
+            return None
+
+        path = self._path(ticker, data_type)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            self._count('misses')
+            return None
+
+        if time.time() - entry['fetched_at'] > self.ttls.get(data_type, self.DEFAULT_TTL):
+            self._count('expired')
+            return None
+
+        # The modification time doubles as the last access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry['value']
+
+    def put(self, ticker: str, data_type: str, value: Any) -> None:
+        """Store a response; empty responses are not cached."""
+        if value is None or (isinstance(value, (pd.DataFrame, pd.Series)) and value.empty) or (
+                isinstance(value, (dict, list)) and not value):
+            return
+
+        path = self._path(ticker, data_type)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            previous = path.stat().st_size if path.exists() else 0
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'fetched_at': time.time(), 'value': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            written = path.stat().st_size
+        except OSError as e:
+            logger.warning("Could not write cache entry %s: %s", path, e)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += written - previous
+            over_limit = self._size > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache is below 90% of its cap."""
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob('*/*.pkl'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(entry[1] for entry in entries)
+            target = self.max_bytes * 0.9
+            for _, entry_size, path in sorted(entries, key=lambda entry: entry[0]):
+                if size <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                size -= entry_size
+                self.stats['evicted'] += 1
+            self._size = size
+
+    def _path(self, ticker: str, data_type: str) -> Path:
+        safe_ticker = ticker.replace('/', '_').replace('\\', '_')
+        return self.cache_dir / data_type / f"{safe_ticker}.pkl"
+
+    def _scan_size(self) -> int:
+        size = 0
+        for path in self.cache_dir.glob('*/*.pkl'):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                # Evicted by another process since the directory was listed
+                continue
+        return size
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
@@ -0,0 +1,228 @@
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RunJournal:
+    """
+    Checkpoint of an ingestion run: one row per (ticker, data_type) unit.
+
+    A unit is marked pending when it is handed to a worker, and done or failed
+    once its rows are written or its fetch gave up. Marks are buffered and
+    written in batches, so the journal costs a few statements per thousand units.
+    A resumed run skips done units and failed units that used up their attempts.
+    """
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            run_id VARCHAR(64) PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL,
+            arguments TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ingest_journal (
+            run_id VARCHAR(64) NOT NULL,
+            ticker VARCHAR(20) NOT NULL,
+            data_type VARCHAR(50) NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (run_id, ticker, data_type)
+        )
+        """,
+    ]
+
+    # Pending marks count an attempt; done and failed marks keep the count
+    MARK = text("""
+        INSERT INTO ingest_journal (run_id, ticker, data_type, status, attempts, error, started_at, updated_at)
+        VALUES (:run_id, :ticker, :data_type, :status, :attempts, :error, :started_at, :updated_at)
+        ON CONFLICT (run_id, ticker, data_type) DO UPDATE SET
+            status = excluded.status,
+            attempts = ingest_journal.attempts + excluded.attempts,
+            error = excluded.error,
+            started_at = COALESCE(excluded.started_at, ingest_journal.started_at),
+            updated_at = excluded.updated_at
+    """)
+
+    def __init__(self, engine: Engine, run_id: str, max_attempts: int = 3, flush_every: int = 500):
+        """
+        Args:
+            engine (Engine): Database holding the journal tables
+            run_id (str): Identifier of the run
+            max_attempts (int): Attempts after which a failed unit is not retried on resume
+            flush_every (int): Buffered marks that trigger a write
+        """
+        self.engine = engine
+        self.run_id = run_id
+        self.max_attempts = max_attempts
+        self.flush_every = flush_every
+        self._marks: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def open(location: str, engine: Optional[Engine] = None) -> Engine:
+        """
+        Get the engine for a journal location and create the journal tables.
+
+        Args:
+            location (str): Path of a local SQLite file, or 'db' for the target database
+            engine (Optional[Engine]): Target database engine, used with 'db'
+
+        Returns:
+            Engine: Engine holding the journal tables
+        """
+        if location == 'db':
+            if engine is None:
+                raise ValueError("The database journal needs a database engine")
+            journal_engine = engine
+        else:
+            path = Path(location).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            journal_engine = create_engine(f"sqlite:///{path}")
+
+        with journal_engine.begin() as conn:
+            for statement in RunJournal.SCHEMA:
+                conn.execute(text(statement))
+        return journal_engine
+
+    @staticmethod
+    def start(engine: Engine, arguments: Dict[str, Any], max_attempts: int = 3) -> 'RunJournal':
+        """Register a new run with the arguments needed to resume it."""
+        run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO ingest_runs (run_id, created_at, arguments) VALUES (:run_id, :created_at, :arguments)"),
+                {'run_id': run_id, 'created_at': RunJournal._now(), 'arguments': json.dumps(arguments)}
+            )
+        return RunJournal(engine, run_id, max_attempts=max_attempts)
+
+    @staticmethod
+    def resume(engine: Engine, run_id: str, max_attempts: int = 3) -> Tuple['RunJournal', Dict[str, Any]]:
+        """
+        Reopen an earlier run.
+
+        Returns:
+            Tuple[RunJournal, Dict[str, Any]]: The journal and the arguments the run started with
+
+        Raises:
+            ValueError: If the run is not in the journal
+        """
+        with engine.connect() as conn:
+            arguments = conn.execute(
+                text("SELECT arguments FROM ingest_runs WHERE run_id = :run_id"), {'run_id': run_id}
+            ).scalar()
+        if arguments is None:
+            raise ValueError(f"Run {run_id} is not in the journal")
+        return RunJournal(engine, run_id, max_attempts=max_attempts), json.loads(arguments)
+
+    def remaining(self, work: Iterable[Tuple[str, List[str]]], chunk_size: int = 500) -> Iterable[Tuple[str, List[str]]]:
+        """
+        Filter (ticker, data_types) work down to units that still need to run.
+
+        Statuses are looked up for chunks of tickers, so memory does not grow with
+        the number of tickers.
+        """
+        chunk: List[Tuple[str, List[str]]] = []
+        for item in work:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield from self._remaining_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._remaining_chunk(chunk)
+
+    def _remaining_chunk(self, chunk: List[Tuple[str, List[str]]]) -> Iterable[Tuple[str, List[str]]]:
+        # A plain IN list keeps the query portable between SQLite and Postgres
+        tickers = list(dict.fromkeys(ticker for ticker, _ in chunk))
+        params = {f"t{index}": ticker for index, ticker in enumerate(tickers)}
+        query = text(
+            "SELECT ticker, data_type, status, attempts FROM ingest_journal "
+            f"WHERE run_id = :run_id AND ticker IN ({', '.join(':' + name for name in params)})"
+        )
+        with self._write_lock, self.engine.connect() as conn:
+            rows = conn.execute(query, {'run_id': self.run_id, **params}).all()
+        finished = {(ticker, data_type) for ticker, data_type, status, attempts in rows
+                    if status == DONE or (status == FAILED and attempts >= self.max_attempts)}
+
+        for ticker, data_types in chunk:
+            left = [dt for dt in data_types if (ticker, dt) not in finished]
+            if left:
+                yield ticker, left
+
+    def mark_pending(self, ticker: str, data_types: List[str]) -> None:
+        """Record that units were handed to a worker."""
+        now = self._now()
+        self._add([self._mark(ticker, dt, PENDING, attempts=1, started_at=now, updated_at=now)
+                   for dt in data_types])
+
+    def mark_done(self, tickers: Iterable[str], data_type: str) -> None:
+        """Record that the units' rows are written, or that there was nothing to write."""
+        now = self._now()
+        self._add([self._mark(ticker, data_type, DONE, updated_at=now) for ticker in tickers])
+
+    def mark_failed(self, tickers: Iterable[str], data_type: str, error: str) -> None:
+        """Record that units failed and may be retried on resume."""
+        now = self._now()
+        self._add([self._mark(ticker, data_type, FAILED, error=error[:1000], updated_at=now)
+                   for ticker in tickers])
+
+    def flush(self) -> None:
+        """Write buffered marks."""
+        # Held across taking and writing the buffer, so marks are written in order
+        with self._write_lock:
+            with self._lock:
+                marks, self._marks = self._marks, []
+            if not marks:
+                return
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(self.MARK, marks)
+            except SQLAlchemyError as e:
+                logger.error("Error writing run journal: %s", e)
+
+    def counts(self) -> Dict[str, int]:
+        """Units per status for this run."""
+        self.flush()
+        with self._write_lock, self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT status, COUNT(*) FROM ingest_journal WHERE run_id = :run_id GROUP BY status"),
+                {'run_id': self.run_id}
+            ).all()
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def _add(self, marks: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._marks.extend(marks)
+            full = len(self._marks) >= self.flush_every
+        if full:
+            self.flush()
+
+    def _mark(self, ticker: str, data_type: str, status: str, attempts: int = 0,
+              error: Optional[str] = None, started_at: Optional[datetime] = None,
+              updated_at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {'run_id': self.run_id, 'ticker': ticker, 'data_type': data_type, 'status': status,
+                'attempts': attempts, 'error': error, 'started_at': started_at, 'updated_at': updated_at}
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,261 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import column, table, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Shard:
+    """Stable hash-based assignment of tickers to one of N shards."""
+
+    def __init__(self, index: int, count: int):
+        """
+        Args:
+            index (int): Shard of this process, from 0 to count - 1
+            count (int): Number of shards
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}")
+        self.index = index
+        self.count = count
+
+    @staticmethod
+    def parse(value: str) -> 'Shard':
+        """Parse 'i/N', e.g. '0/4' for the first of four shards."""
+        try:
+            index, count = (int(part) for part in value.split('/'))
+        except ValueError:
+            raise ValueError(f"Shard must look like i/N, got {value!r}")
+        return Shard(index, count)
+
+    @staticmethod
+    def of(ticker: str, count: int) -> int:
+        """Shard a ticker belongs to; the same on every host and Python version."""
+        return zlib.crc32(ticker.encode()) % count
+
+    def owns(self, ticker: str) -> bool:
+        return Shard.of(ticker, self.count) == self.index
+
+    def assigned(self, tickers: Iterable[str], steal: bool = False) -> Iterator[str]:
+        """
+        Yield the tickers of this shard, then, when stealing, those of the other shards.
+
+        Other shards are visited starting with the next one, so stealing nodes spread
+        over different shards. ``tickers`` is iterated once per shard visited.
+        """
+        yield from (ticker for ticker in tickers if self.owns(ticker))
+        if steal:
+            for offset in range(1, self.count):
+                other = (self.index + offset) % self.count
+                yield from (ticker for ticker in tickers if Shard.of(ticker, self.count) == other)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+class WorkLeases:
+    """
+    Claims of (ticker, data_type) units shared by every process of a distributed run.
+
+    A unit is fetched only by the process holding its lease. A claim succeeds when
+    the unit is unclaimed, its lease expired (its owner died or gave up), or this
+    process already holds it; done units are never claimed again. Claims are made
+    for chunks of units with one INSERT ... ON CONFLICT DO UPDATE ... WHERE
+    statement, which Postgres applies atomically per row. While units are claimed, a
+    heartbeat thread extends their leases every third of the TTL, so units that wait
+    long for their batch to be written are not taken over by other processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ingest_leases (
+            lease_group VARCHAR(64) NOT NULL,
+            ticker VARCHAR(20) NOT NULL,
+            data_type VARCHAR(50) NOT NULL,
+            owner VARCHAR(128) NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (lease_group, ticker, data_type)
+        )
+    """
+
+    MARK = text("""
+        UPDATE ingest_leases
+        SET status = :status, expires_at = :expires_at, updated_at = :updated_at
+        WHERE lease_group = :lease_group AND ticker = :ticker AND data_type = :data_type AND owner = :owner
+    """)
+
+    RENEW = text("""
+        UPDATE ingest_leases
+        SET expires_at = :expires_at, updated_at = :updated_at
+        WHERE lease_group = :lease_group AND owner = :owner AND status = :status
+    """)
+
+    def __init__(self, engine: Engine, group: str, ttl: float = 900.0, owner: Optional[str] = None,
+                 flush_every: int = 200):
+        """
+        Args:
+            engine (Engine): Database shared by all processes of the run
+            group (str): Name of the distributed run, the same on every process
+            ttl (float): Seconds a claim is held before other processes may take it over
+            owner (Optional[str]): Identifier of this process, defaults to host, pid and a random suffix
+            flush_every (int): Buffered done/failed marks that trigger a write
+        """
+        self.engine = engine
+        self.group = group
+        self.ttl = timedelta(seconds=ttl)
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.flush_every = flush_every
+        self.stats = {'claimed': 0, 'contended': 0}
+        self._marks: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @staticmethod
+    def open(engine: Engine, group: str, ttl: float = 900.0) -> 'WorkLeases':
+        """Create the lease table if needed and join a lease group."""
+        with engine.begin() as conn:
+            conn.execute(text(WorkLeases.SCHEMA))
+        return WorkLeases(engine, group, ttl=ttl)
+
+    def claimed(self, work: Iterable[Tuple[str, List[str]]],
+                chunk_size: int = 50) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Filter (ticker, data_types) work down to units this process claimed.
+
+        Units are claimed a chunk at a time as the work is consumed, so few leases
+        are held ahead of the workers.
+        """
+        self._start_heartbeat()
+        iterator = iter(work)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            # A unit may appear only once per claim statement, or Postgres rejects the whole chunk
+            units = sorted({(ticker, dt) for ticker, data_types in chunk for dt in data_types})
+            won = self._claim(units)
+            self.stats['claimed'] += len(won)
+            self.stats['contended'] += len(units) - len(won)
+            Metrics.increment('leases', 'claimed', len(won))
+            Metrics.increment('leases', 'contended', len(units) - len(won))
+
+            for ticker, data_types in chunk:
+                mine = [dt for dt in data_types if (ticker, dt) in won]
+                if mine:
+                    yield ticker, mine
+
+    def _claim(self, units: List[Tuple[str, str]]) -> set:
+        if not units:
+            return set()
+        now = self._now()
+        is_postgres = self.engine.dialect.name == 'postgresql'
+        insert = postgresql.insert if is_postgres else sqlite.insert
+        leases = table('ingest_leases', *[column(name) for name in (
+            'lease_group', 'ticker', 'data_type', 'owner', 'status', 'expires_at', 'updated_at')])
+
+        stmt = insert(leases)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['lease_group', 'ticker', 'data_type'],
+            set_={name: stmt.excluded[name] for name in ('owner', 'status', 'expires_at', 'updated_at')},
+            # Done units stay done; live claims of other processes are left alone
+            where=(leases.c.status != DONE) & (
+                (leases.c.expires_at < stmt.excluded.updated_at) | (leases.c.owner == stmt.excluded.owner))
+        ).returning(leases.c.ticker, leases.c.data_type)
+
+        # Units are sorted, so concurrent claimers lock rows in the same order
+        rows = [{'lease_group': self.group, 'ticker': ticker, 'data_type': data_type, 'owner': self.owner,
+                 'status': CLAIMED, 'expires_at': now + self.ttl, 'updated_at': now}
+                for ticker, data_type in units]
+        try:
+            with self.engine.begin() as conn:
+                return {(ticker, data_type) for ticker, data_type in conn.execute(stmt, rows)}
+        except SQLAlchemyError as e:
+            logger.error("Error claiming leases: %s", e)
+            return set()
+
+    def mark_done(self, tickers: Iterable[str], data_type: str) -> None:
+        """Record that units are written, so no process claims them again."""
+        now = self._now()
+        self._add([self._mark(ticker, data_type, DONE, now + self.ttl, now) for ticker in tickers])
+
+    def mark_failed(self, tickers: Iterable[str], data_type: str, error: str = '') -> None:
+        """Release units that failed, so another process may take them over."""
+        now = self._now()
+        self._add([self._mark(ticker, data_type, FAILED, now, now) for ticker in tickers])
+
+    def flush(self) -> None:
+        """Write buffered marks."""
+        with self._lock:
+            marks, self._marks = self._marks, []
+        if not marks:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.MARK, marks)
+        except SQLAlchemyError as e:
+            logger.error("Error updating leases: %s", e)
+
+    def renew(self) -> None:
+        """Extend the leases of every unit this process holds."""
+        now = self._now()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.RENEW, {'lease_group': self.group, 'owner': self.owner, 'status': CLAIMED,
+                                          'expires_at': now + self.ttl, 'updated_at': now})
+        except SQLAlchemyError as e:
+            logger.error("Error renewing leases: %s", e)
+
+    def close(self) -> None:
+        """Write buffered marks and stop renewing leases."""
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self.flush()
+
+    def _start_heartbeat(self) -> None:
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._stopped.clear()
+            self._heartbeat = threading.Thread(target=self._renew_until_closed, name='lease-heartbeat',
+                                               daemon=True)
+            self._heartbeat.start()
+
+    def _renew_until_closed(self) -> None:
+        interval = self.ttl.total_seconds() / 3
+        while not self._stopped.wait(interval):
+            self.renew()
+
+    def _add(self, marks: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._marks.extend(marks)
+            full = len(self._marks) >= self.flush_every
+        if full:
+            self.flush()
+
+    def _mark(self, ticker: str, data_type: str, status: str, expires_at: datetime,
+              updated_at: datetime) -> Dict[str, Any]:
+        return {'lease_group': self.group, 'ticker': ticker, 'data_type': data_type, 'owner': self.owner,
+                'status': status, 'expires_at': expires_at, 'updated_at': updated_at}
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,219 @@
+import math
+from datetime import date, datetime
+from numbers import Real
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class StockMetrics:
+    """Declarative mapping of yfinance ``.info`` keys to stock_metrics columns."""
+
+    TABLE_NAME = 'stock_metrics'
+
+    # (stock_metrics column, .info key, dtype). float64 backs NUMERIC columns,
+    # int64/int32 back BIGINT/INTEGER columns and object holds text.
+    FIELDS: List[Tuple[str, str, str]] = [
+        ('company_name', 'longName', 'object'),
+        ('exchange', 'exchange', 'object'),
+        ('currency', 'financialCurrency', 'object'),
+        ('current_price', 'currentPrice', 'float64'),
+        ('previous_close', 'previousClose', 'float64'),
+        ('open_price', 'open', 'float64'),
+        ('day_low', 'dayLow', 'float64'),
+        ('day_high', 'dayHigh', 'float64'),
+        ('regular_market_previous_close', 'regularMarketPreviousClose', 'float64'),
+        ('regular_market_open', 'regularMarketOpen', 'float64'),
+        ('regular_market_day_low', 'regularMarketDayLow', 'float64'),
+        ('regular_market_day_high', 'regularMarketDayHigh', 'float64'),
+        ('dividend_rate', 'dividendRate', 'float64'),
+        ('dividend_yield', 'dividendYield', 'float64'),
+        ('ex_dividend_date', 'exDividendDate', 'int64'),
+        ('payout_ratio', 'payoutRatio', 'float64'),
+        ('five_year_avg_dividend_yield', 'fiveYearAvgDividendYield', 'float64'),
+        ('beta', 'beta', 'float64'),
+        ('trailing_pe', 'trailingPE', 'float64'),
+        ('forward_pe', 'forwardPE', 'float64'),
+        ('volume', 'volume', 'int64'),
+        ('regular_market_volume', 'regularMarketVolume', 'int64'),
+        ('average_volume', 'averageVolume', 'int64'),
+        ('average_volume_10days', 'averageVolume10days', 'int64'),
+        ('average_daily_volume_10day', 'averageDailyVolume10Day', 'int64'),
+        ('bid', 'bid', 'float64'),
+        ('ask', 'ask', 'float64'),
+        ('bid_size', 'bidSize', 'int32'),
+        ('ask_size', 'askSize', 'int32'),
+        ('market_cap', 'marketCap', 'int64'),
+        ('fifty_two_week_low', 'fiftyTwoWeekLow', 'float64'),
+        ('fifty_two_week_high', 'fiftyTwoWeekHigh', 'float64'),
+        ('price_to_sales_trailing_12months', 'priceToSalesTrailing12Months', 'float64'),
+        ('fifty_day_average', 'fiftyDayAverage', 'float64'),
+        ('two_hundred_day_average', 'twoHundredDayAverage', 'float64'),
+        ('trailing_annual_dividend_rate', 'trailingAnnualDividendRate', 'float64'),
+        ('trailing_annual_dividend_yield', 'trailingAnnualDividendYield', 'float64'),
+        ('enterprise_value', 'enterpriseValue', 'int64'),
+        ('profit_margins', 'profitMargins', 'float64'),
+        ('float_shares', 'floatShares', 'int64'),
+        ('shares_outstanding', 'sharesOutstanding', 'int64'),
+        ('shares_short', 'sharesShort', 'int64'),
+        ('shares_short_prior_month', 'sharesShortPriorMonth', 'int64'),
+        ('shares_short_previous_month_date', 'sharesShortPreviousMonthDate', 'int64'),
+        ('date_short_interest', 'dateShortInterest', 'int64'),
+        ('shares_percent_shares_out', 'sharesPercentSharesOut', 'float64'),
+        ('held_percent_insiders', 'heldPercentInsiders', 'float64'),
+        ('held_percent_institutions', 'heldPercentInstitutions', 'float64'),
+        ('short_ratio', 'shortRatio', 'float64'),
+        ('short_percent_of_float', 'shortPercentOfFloat', 'float64'),
+        ('book_value', 'bookValue', 'float64'),
+        ('price_to_book', 'priceToBook', 'float64'),
+        ('earnings_quarterly_growth', 'earningsQuarterlyGrowth', 'float64'),
+        ('net_income_to_common', 'netIncomeToCommon', 'int64'),
+        ('trailing_eps', 'trailingEps', 'float64'),
+        ('forward_eps', 'forwardEps', 'float64'),
+        ('peg_ratio', 'pegRatio', 'float64'),
+        ('last_split_factor', 'lastSplitFactor', 'object'),
+        ('last_split_date', 'lastSplitDate', 'int64'),
+        ('enterprise_to_revenue', 'enterpriseToRevenue', 'float64'),
+        ('enterprise_to_ebitda', 'enterpriseToEbitda', 'float64'),
+        ('last_dividend_value', 'lastDividendValue', 'float64'),
+        ('last_dividend_date', 'lastDividendDate', 'int64'),
+        ('target_high_price', 'targetHighPrice', 'float64'),
+        ('target_low_price', 'targetLowPrice', 'float64'),
+        ('target_mean_price', 'targetMeanPrice', 'float64'),
+        ('target_median_price', 'targetMedianPrice', 'float64'),
+        ('recommendation_mean', 'recommendationMean', 'float64'),
+        ('recommendation_key', 'recommendationKey', 'object'),
+        ('number_of_analyst_opinions', 'numberOfAnalystOpinions', 'int32'),
+        ('total_cash', 'totalCash', 'int64'),
+        ('total_cash_per_share', 'totalCashPerShare', 'float64'),
+        ('ebitda', 'ebitda', 'int64'),
+        ('total_debt', 'totalDebt', 'int64'),
+        ('quick_ratio', 'quickRatio', 'float64'),
+        ('current_ratio', 'currentRatio', 'float64'),
+        ('debt_to_equity', 'debtToEquity', 'float64'),
+        ('revenue_per_share', 'revenuePerShare', 'float64'),
+        ('return_on_assets', 'returnOnAssets', 'float64'),
+        ('return_on_equity', 'returnOnEquity', 'float64'),
+        ('free_cashflow', 'freeCashflow', 'int64'),
+        ('operating_cashflow', 'operatingCashflow', 'int64'),
+        ('earnings_growth', 'earningsGrowth', 'float64'),
+        ('revenue_growth', 'revenueGrowth', 'float64'),
+        ('gross_margins', 'grossMargins', 'float64'),
+        ('ebitda_margins', 'ebitdaMargins', 'float64'),
+        ('operating_margins', 'operatingMargins', 'float64'),
+        ('trailing_peg_ratio', 'trailingPegRatio', 'float64'),
+    ]
+
+    COLUMNS = ['ticker', 'report_date'] + [column for column, _, _ in FIELDS]
+
+    @staticmethod
+    def to_frame(infos: Iterable[Tuple[str, Dict[str, Any]]],
+                 report_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Build stock_metrics rows from (ticker, ``.info``) pairs.
+
+        Args:
+            infos (Iterable[Tuple[str, Dict[str, Any]]]): Ticker and its ``.info`` dict
+            report_date (Optional[date]): Snapshot date, defaults to today
+
+        Returns:
+            pd.DataFrame: One row per ticker with the dtypes of FIELDS
+        """
+        infos = list(infos)
+        buffer = StockMetricsBuffer(max(len(infos), 1))
+        for ticker, info in infos:
+            buffer.append(ticker, info, report_date)
+        return buffer.to_frame()
+
+
+class StockMetricsBuffer:
+    """
+    Preallocated column arrays accumulating stock_metrics rows.
+
+    Each ``.info`` dict is written straight into NumPy arrays, one per column,
+    so a batch of thousands of tickers becomes a DataFrame without building a
+    frame or a dict per row. Integer columns keep a separate null mask.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity (int): Rows held before the buffer has to be flushed
+        """
+        self.capacity = capacity
+        self._allocate()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def is_full(self) -> bool:
+        return self._size >= self.capacity
+
+    def append(self, ticker: str, info: Dict[str, Any], report_date: Optional[date] = None) -> None:
+        """
+        Extract one ticker's ``.info`` into the next row.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            info (Dict[str, Any]): yfinance ``.info`` dict
+            report_date (Optional[date]): Snapshot date, defaults to today
+        """
+        if self.is_full():
+            raise OverflowError(f"Stock metrics buffer is full ({self.capacity} rows)")
+
+        row = self._size
+        self._tickers[row] = ticker
+        self._dates[row] = report_date or datetime.now().date()
+        for column, key, dtype in StockMetrics.FIELDS:
+            value = info.get(key)
+            if dtype == 'object':
+                if value is not None:
+                    self._arrays[column][row] = str(value)
+            elif isinstance(value, Real) and not isinstance(value, bool) and math.isfinite(value):
+                # NaN and infinities keep the column's null sentinel
+                if dtype == 'float64':
+                    self._arrays[column][row] = value
+                elif StockMetricsBuffer._fits(value, dtype):
+                    # Integer columns: values out of range stay masked, anything else is truncated
+                    self._arrays[column][row] = int(value)
+                    self._masks[column][row] = False
+        self._size += 1
+
+    @staticmethod
+    def _fits(value: Real, dtype: str) -> bool:
+        limits = np.iinfo(dtype)
+        return limits.min <= int(value) <= limits.max
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rows appended so far as a stock_metrics DataFrame."""
+        size = self._size
+        columns: Dict[str, Any] = {
+            'ticker': self._tickers[:size],
+            'report_date': self._dates[:size],
+        }
+        for column, _, dtype in StockMetrics.FIELDS:
+            if dtype in ('int64', 'int32'):
+                columns[column] = pd.arrays.IntegerArray(self._arrays[column][:size], self._masks[column][:size])
+            else:
+                columns[column] = self._arrays[column][:size]
+        return pd.DataFrame(columns, columns=StockMetrics.COLUMNS)
+
+    def clear(self) -> None:
+        """Start a new batch; frames returned by to_frame keep the old arrays."""
+        self._allocate()
+
+    def _allocate(self) -> None:
+        capacity = self.capacity
+        self._size = 0
+        self._tickers = np.empty(capacity, dtype=object)
+        self._dates = np.empty(capacity, dtype=object)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        for column, _, dtype in StockMetrics.FIELDS:
+            if dtype == 'float64':
+                self._arrays[column] = np.full(capacity, np.nan)
+            elif dtype == 'object':
+                self._arrays[column] = np.full(capacity, None, dtype=object)
+            else:
+                self._arrays[column] = np.zeros(capacity, dtype=dtype)
+                self._masks[column] = np.ones(capacity, dtype=bool)
@@ -1,170 +1,208 @@
+import logging
+import threading
 import yfinance as yf
 import pandas as pd
-from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import date
+from typing import Optional, Dict, Any, Callable, List, Tuple
+from services.response_cache import ResponseCache
+from services.raw_store import RawStore
+from services.request_scheduler import RequestScheduler
+from services.stock_metrics import StockMetrics
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
 
 
 class YahooFinanceService:
     """Service for interacting with Yahoo Finance API."""
     
+    # Data type -> yfinance Ticker property. Properties are only resolved
+    # when the corresponding data type is requested.
+    DATA_ATTRIBUTES = {
+        'annual_income': 'financials',
+        'quarterly_income': 'quarterly_financials',
+        'annual_balance': 'balance_sheet',
+        'quarterly_balance': 'quarterly_balance_sheet',
+        'annual_cashflow': 'cashflow',
+        'quarterly_cashflow': 'quarterly_cashflow',
+        'actions': 'actions',
+        'calendar': 'calendar',
+        'recommendations': 'recommendations',
+        'upgrades_downgrades': 'upgrades_downgrades',
+        'news': 'news',
+        'stock_metrics': 'info',
+    }
+
+    # Data type -> database table
+    TABLE_NAMES = {
+        'annual_income': 'annual_income_statements',
+        'quarterly_income': 'quarterly_income_statements',
+        'annual_balance': 'annual_balance_sheet',
+        'quarterly_balance': 'quarterly_balance_sheet',
+        'annual_cashflow': 'annual_cash_flow',
+        'quarterly_cashflow': 'quarterly_cash_flow',
+        'actions': 'stock_actions',
+        'calendar': 'earnings_calendar',
+        'recommendations': 'analyst_recommendations',
+        'upgrades_downgrades': 'upgrades_downgrades',
+        'news': 'company_news',
+        'stock_metrics': 'stock_metrics',
+        'price_history': 'price_history',
+    }
+
+    # (ticker, data type) -> resolved value, shared by every caller in the run
+    _memo: Dict[Tuple[str, str], Any] = {}
+    _memo_lock = threading.Lock()
+
+    # Optional on-disk cache consulted before any upstream request
+    _response_cache: Optional[ResponseCache] = None
+
+    # Optional rate limiter and retry policy for every upstream request
+    _scheduler: Optional[RequestScheduler] = None
+
+    # Optional landing store keeping every upstream response for replays
+    _raw_store: Optional[RawStore] = None
+
     @staticmethod
     def get_company_data(ticker_obj: yf.Ticker, data_type: str) -> Optional[pd.DataFrame]:
         """Fetch specific financial data type from yfinance Ticker object."""
-        data_mapping = {
-            'annual_income': ticker_obj.financials,
-            'quarterly_income': ticker_obj.quarterly_financials,
-            'annual_balance': ticker_obj.balance_sheet,
-            'quarterly_balance': ticker_obj.quarterly_balance_sheet,
-            'annual_cashflow': ticker_obj.cashflow,
-            'quarterly_cashflow': ticker_obj.quarterly_cashflow,
-            'actions': ticker_obj.actions,
-            'calendar': ticker_obj.calendar,
-            'recommendations': ticker_obj.recommendations,
-            'upgrades_downgrades': ticker_obj.upgrades_downgrades,
-            'news': pd.DataFrame(ticker_obj.news),
-            'stock_metrics': YahooFinanceService._get_stock_metrics(ticker_obj)
-        }
-        
         try:
-            data = data_mapping.get(data_type)
-            if data is not None and not data.empty:
-                return data
-            else:
-                print(f"No data available for {data_type}")
-                return None
+            return YahooFinanceService.fetch_company_data(ticker_obj, data_type)
         except Exception as e:
-            print(f"Error fetching {data_type} data: {e}")
+            logger.warning("Error fetching %s data for %s: %s", data_type, ticker_obj.ticker, e)
+            Metrics.increment('fetch', 'errors', ticker=ticker_obj.ticker, data_type=data_type)
             return None
 
     @staticmethod
-    def get_table_name(data_type: str) -> Optional[str]:
-        """Map data type to corresponding database table name."""
-        table_mapping = {
-            'annual_income': 'annual_income_statements',
-            'quarterly_income': 'quarterly_income_statements',
-            'annual_balance': 'annual_balance_sheet',
-            'quarterly_balance': 'quarterly_balance_sheet',
-            'annual_cashflow': 'annual_cash_flow',
-            'quarterly_cashflow': 'quarterly_cash_flow',
-            'actions': 'stock_actions',
-            'calendar': 'earnings_calendar',
-            'recommendations': 'analyst_recommendations',
-            'upgrades_downgrades': 'upgrades_downgrades',
-            'news': 'company_news',
-            'stock_metrics': 'stock_metrics'
-        }
-        return table_mapping.get(data_type)
-    
+    def fetch_company_data(ticker_obj: yf.Ticker, data_type: str) -> Optional[pd.DataFrame]:
+        """
+        Like get_company_data, but fetch errors propagate to the caller.
+
+        Statements and event feeds come back as the raw yfinance frame, except the
+        ``calendar`` data type, which is the raw ``.calendar`` dict.
+        """
+        if data_type == 'stock_metrics':
+            info = YahooFinanceService.get_info(ticker_obj)
+            data = StockMetrics.to_frame([(ticker_obj.ticker, info)]) if info else None
+        elif data_type in YahooFinanceService.DATA_ATTRIBUTES:
+            data = YahooFinanceService._resolve(ticker_obj, data_type)
+            if data_type == 'news':
+                data = pd.DataFrame(data)
+        else:
+            data = None
+
+        # The calendar comes as a dict of fields rather than a frame
+        if data is not None and (len(data) if isinstance(data, dict) else not data.empty):
+            return data
+        logger.debug("No %s data available for %s", data_type, ticker_obj.ticker)
+        return None
+
+    @staticmethod
+    def get_info(ticker_obj: yf.Ticker) -> Dict[str, Any]:
+        """Get the memoized ``.info`` dict for a ticker."""
+        return YahooFinanceService._resolve(ticker_obj, 'stock_metrics') or {}
+
+    @staticmethod
+    def get_earnings_dates(ticker_obj: yf.Ticker) -> List[date]:
+        """Get the upcoming earnings dates from the memoized ``.calendar``."""
+        calendar = YahooFinanceService._resolve(ticker_obj, 'calendar')
+        if isinstance(calendar, pd.DataFrame):
+            # Older yfinance versions return a frame with one row per field
+            calendar = {label: list(row.dropna()) for label, row in calendar.iterrows()}
+        dates = calendar.get('Earnings Date') if isinstance(calendar, dict) else None
+        if dates is None:
+            return []
+        if not isinstance(dates, (list, tuple)):
+            dates = [dates]
+        parsed = pd.to_datetime(pd.Series(list(dates)), errors='coerce').dropna()
+        return sorted({ts.date() for ts in parsed})
+
+    @staticmethod
+    def configure_cache(cache: Optional[ResponseCache]) -> None:
+        """Install (or remove, with None) the on-disk response cache."""
+        YahooFinanceService._response_cache = cache
+
+    @staticmethod
+    def configure_raw_store(store: Optional[RawStore]) -> None:
+        """Install (or remove, with None) the store landing every upstream response."""
+        YahooFinanceService._raw_store = store
+
+    @staticmethod
+    def configure_scheduler(scheduler: Optional[RequestScheduler]) -> None:
+        """Install (or remove, with None) the scheduler gating upstream requests."""
+        YahooFinanceService._scheduler = scheduler
+
+    @staticmethod
+    def schedule(request: Callable[[], Any], data_type: Optional[str] = None) -> Any:
+        """Run an upstream request through the configured scheduler, if any."""
+        scheduler = YahooFinanceService._scheduler
+        if scheduler is None:
+            return request()
+        return scheduler.call(request, data_type=data_type)
+
+    @staticmethod
+    def clear_cache(ticker: Optional[str] = None) -> None:
+        """Drop memoized properties for one ticker, or for all tickers."""
+        with YahooFinanceService._memo_lock:
+            if ticker is None:
+                YahooFinanceService._memo.clear()
+                return
+            for key in [key for key in YahooFinanceService._memo if key[0] == ticker]:
+                del YahooFinanceService._memo[key]
+
+    @staticmethod
+    def _resolve(ticker_obj: yf.Ticker, data_type: str) -> Any:
+        """Resolve the Ticker property behind a data type at most once per ticker."""
+        key = (ticker_obj.ticker, data_type)
+        with YahooFinanceService._memo_lock:
+            if key in YahooFinanceService._memo:
+                return YahooFinanceService._memo[key]
+
+        cache = YahooFinanceService._response_cache
+        value = cache.get(ticker_obj.ticker, data_type) if cache is not None else None
+        if value is None:
+            with Metrics.timer('fetch', ticker=ticker_obj.ticker, data_type=data_type):
+                value = YahooFinanceService.schedule(
+                    YahooFinanceService._request(ticker_obj, data_type), data_type)
+            Metrics.increment('fetch', 'upstream_calls', ticker=ticker_obj.ticker, data_type=data_type)
+            if cache is not None:
+                cache.put(ticker_obj.ticker, data_type, value)
+            if YahooFinanceService._raw_store is not None:
+                YahooFinanceService._raw_store.put(ticker_obj.ticker, data_type, value)
+        else:
+            Metrics.increment('fetch', 'cache_hits', ticker=ticker_obj.ticker, data_type=data_type)
+
+        with YahooFinanceService._memo_lock:
+            YahooFinanceService._memo[key] = value
+        return value
+
     @staticmethod
-    def _get_stock_metrics(ticker_obj: yf.Ticker) -> pd.DataFrame:
+    def _request(ticker_obj: yf.Ticker, data_type: str) -> Callable[[], Any]:
         """
-        Extract stock metrics from ticker object and format as DataFrame.
-        
-        Args:
-            ticker_obj: yfinance Ticker object
-            
-        Returns:
-            pd.DataFrame: DataFrame containing stock metrics
+        Build the upstream request of a data type for the scheduler.
+
+        A Ticker keeps every property it resolved, including the empty result of a
+        failed request, so each retry reads the property from a fresh Ticker.
         """
-        try:
-            info = ticker_obj.info
-            if not info:
-                return pd.DataFrame()
-
-            metrics = {
-                'report_date': datetime.now().date(), 
-                'symbol': info.get('symbol'),
-                'company_name': info.get('longName'),
-                'exchange': info.get('exchange'),
-                'currency': info.get('financialCurrency'),
-                'current_price': info.get('currentPrice'),
-                'previous_close': info.get('previousClose'),
-                'open': info.get('open'),
-                'day_low': info.get('dayLow'),
-                'day_high': info.get('dayHigh'),
-                'regular_market_previous_close': info.get('regularMarketPreviousClose'),
-                'regular_market_open': info.get('regularMarketOpen'),
-                'regular_market_day_low': info.get('regularMarketDayLow'),
-                'regular_market_day_high': info.get('regularMarketDayHigh'),
-                'dividend_rate': info.get('dividendRate'),
-                'dividend_yield': info.get('dividendYield'),
-                'ex_dividend_date': info.get('exDividendDate'),
-                'payout_ratio': info.get('payoutRatio'),
-                'five_year_avg_dividend_yield': info.get('fiveYearAvgDividendYield'),
-                'beta': info.get('beta'),
-                'trailing_pe': info.get('trailingPE'),
-                'forward_pe': info.get('forwardPE'),
-                'volume': info.get('volume'),
-                'regular_market_volume': info.get('regularMarketVolume'),
-                'average_volume': info.get('averageVolume'),
-                'average_volume_10days': info.get('averageVolume10days'),
-                'average_daily_volume_10day': info.get('averageDailyVolume10Day'),
-                'bid': info.get('bid'),
-                'ask': info.get('ask'),
-                'bid_size': info.get('bidSize'),
-                'ask_size': info.get('askSize'),
-                'market_cap': info.get('marketCap'),
-                'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-                'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-                'price_to_sales_trailing_12months': info.get('priceToSalesTrailing12Months'),
-                'fifty_day_average': info.get('fiftyDayAverage'),
-                'two_hundred_day_average': info.get('twoHundredDayAverage'),
-                'trailing_annual_dividend_rate': info.get('trailingAnnualDividendRate'),
-                'trailing_annual_dividend_yield': info.get('trailingAnnualDividendYield'),
-                'enterprise_value': info.get('enterpriseValue'),
-                'profit_margins': info.get('profitMargins'),
-                'float_shares': info.get('floatShares'),
-                'shares_outstanding': info.get('sharesOutstanding'),
-                'shares_short': info.get('sharesShort'),
-                'shares_short_prior_month': info.get('sharesShortPriorMonth'),
-                'shares_short_previous_month_date': info.get('sharesShortPreviousMonthDate'),
-                'date_short_interest': info.get('dateShortInterest'),
-                'shares_percent_shares_out': info.get('sharesPercentSharesOut'),
-                'held_percent_insiders': info.get('heldPercentInsiders'),
-                'held_percent_institutions': info.get('heldPercentInstitutions'),
-                'short_ratio': info.get('shortRatio'),
-                'short_percent_of_float': info.get('shortPercentOfFloat'),
-                'book_value': info.get('bookValue'),
-                'price_to_book': info.get('priceToBook'),
-                'earnings_quarterly_growth': info.get('earningsQuarterlyGrowth'),
-                'net_income_to_common': info.get('netIncomeToCommon'),
-                'trailing_eps': info.get('trailingEps'),
-                'forward_eps': info.get('forwardEps'),
-                'peg_ratio': info.get('pegRatio'),
-                'last_split_factor': info.get('lastSplitFactor'),
-                'last_split_date': info.get('lastSplitDate'),
-                'enterprise_to_revenue': info.get('enterpriseToRevenue'),
-                'enterprise_to_ebitda': info.get('enterpriseToEbitda'),
-                'last_dividend_value': info.get('lastDividendValue'),
-                'last_dividend_date': info.get('lastDividendDate'),
-                'target_high_price': info.get('targetHighPrice'),
-                'target_low_price': info.get('targetLowPrice'),
-                'target_mean_price': info.get('targetMeanPrice'),
-                'target_median_price': info.get('targetMedianPrice'),
-                'recommendation_mean': info.get('recommendationMean'),
-                'recommendation_key': info.get('recommendationKey'),
-                'number_of_analyst_opinions': info.get('numberOfAnalystOpinions'),
-                'total_cash': info.get('totalCash'),
-                'total_cash_per_share': info.get('totalCashPerShare'),
-                'ebitda': info.get('ebitda'),
-                'total_debt': info.get('totalDebt'),
-                'quick_ratio': info.get('quickRatio'),
-                'current_ratio': info.get('currentRatio'),
-                'debt_to_equity': info.get('debtToEquity'),
-                'revenue_per_share': info.get('revenuePerShare'),
-                'return_on_assets': info.get('returnOnAssets'),
-                'return_on_equity': info.get('returnOnEquity'),
-                'free_cashflow': info.get('freeCashflow'),
-                'operating_cashflow': info.get('operatingCashflow'),
-                'earnings_growth': info.get('earningsGrowth'),
-                'revenue_growth': info.get('revenueGrowth'),
-                'gross_margins': info.get('grossMargins'),
-                'ebitda_margins': info.get('ebitdaMargins'),
-                'operating_margins': info.get('operatingMargins'),
-                'trailing_peg_ratio': info.get('trailingPegRatio')
-            }
-            return pd.DataFrame([metrics])
+        attribute = YahooFinanceService.DATA_ATTRIBUTES[data_type]
+        attempts = [ticker_obj]
 
-        except Exception as e:
-            print(f"Error extracting stock metrics: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+        def request() -> Any:
+            target = attempts.pop() if attempts else yf.Ticker(ticker_obj.ticker)
+            return getattr(target, attribute)
+
+        return request
+
+    @staticmethod
+    def get_data_type(table_name: str) -> Optional[str]:
+        """Map a database table name back to the data type stored in it."""
+        for data_type, name in YahooFinanceService.TABLE_NAMES.items():
+            if name == table_name:
+                return data_type
+        return None
+
+    @staticmethod
+    def get_table_name(data_type: str) -> Optional[str]:
+        """Map data type to corresponding database table name."""
+        return YahooFinanceService.TABLE_NAMES.get(data_type)
+    
@@ -0,0 +1,207 @@
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from utils.db_utils import DatabaseConnection
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DataReader:
+    """
+    Bulk reads of stored tables as one DataFrame, with an in-process LRU cache.
+
+    Only the requested columns are selected, and ticker and date filters are
+    pushed into the SQL. On Postgres the result is streamed with
+    ``COPY (...) TO STDOUT``, which avoids building a Python row object per row.
+    Cached results are dropped when this process writes to their table, and
+    expire after ``ttl`` seconds to pick up writes from other processes.
+    """
+
+    max_entries = 128
+    max_bytes = 256 * 1024 ** 2
+    ttl = 300.0
+
+    _cache: 'OrderedDict[Hashable, Tuple[float, pd.DataFrame]]' = OrderedDict()
+    _cache_bytes = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def read(engine: Engine, table_name: str, tickers: Optional[Iterable[str]] = None,
+             start: Optional[date] = None, end: Optional[date] = None,
+             columns: Optional[List[str]] = None, use_cache: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Read rows of many tickers and a date range from one table.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            table_name (str): Table keyed by ticker and report_date
+            tickers (Optional[Iterable[str]]): Tickers to read, all when None
+            start (Optional[date]): First report date, inclusive
+            end (Optional[date]): Last report date, inclusive
+            columns (Optional[List[str]]): Value columns to read, all when None;
+                ticker and report_date are always included
+            use_cache (bool): Serve and store the result in the LRU cache
+
+        Returns:
+            Optional[pd.DataFrame]: Rows ordered by ticker and report_date, or None on error
+
+        Raises:
+            ValueError: If the table or a column does not exist
+        """
+        table_columns = DatabaseConnection.get_table_columns(engine, table_name)
+        if not table_columns:
+            raise ValueError(f"Unknown table {table_name}")
+
+        selected = DataReader._projection(table_name, table_columns, columns)
+        ticker_list = sorted(set(tickers)) if tickers is not None else None
+        key = (str(engine.url), table_name, tuple(ticker_list) if ticker_list is not None else None,
+               start, end, tuple(selected))
+
+        if use_cache:
+            cached = DataReader._get(key)
+            if cached is not None:
+                Metrics.increment('read', 'cache_hits', data_type=table_name)
+                return cached
+
+        if ticker_list is not None and not ticker_list:
+            return pd.DataFrame(columns=selected)
+
+        query, params = DataReader._query(table_name, selected, ticker_list, start, end)
+        try:
+            with Metrics.timer('read', data_type=table_name):
+                Metrics.increment('read', 'db_round_trips', data_type=table_name)
+                if engine.dialect.name == 'postgresql':
+                    df = DataReader._copy(engine, query, params)
+                else:
+                    df = DataReader._select(engine, query, params)
+        except (SQLAlchemyError, DBAPIError) as e:
+            logger.error("Error reading %s: %s", table_name, e)
+            Metrics.increment('read', 'errors', data_type=table_name)
+            return None
+        df = DataReader._typed(df)
+        Metrics.increment('read', 'rows', len(df), data_type=table_name)
+        logger.debug("Read %d rows of %d columns from %s", len(df), len(selected), table_name)
+
+        if use_cache:
+            DataReader._put(key, df)
+        return df.copy()
+
+    @staticmethod
+    def invalidate(table_name: Optional[str] = None) -> None:
+        """Drop cached results of one table, or of every table."""
+        with DataReader._lock:
+            for key in [key for key in DataReader._cache if table_name is None or key[1] == table_name]:
+                DataReader._evict(key)
+
+    @staticmethod
+    def _projection(table_name: str, table_columns: List[str], columns: Optional[List[str]]) -> List[str]:
+        if columns is None:
+            return [col for col in table_columns if col not in ('id', 'row_hash')]
+        unknown = [col for col in columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table_name}: {unknown}")
+        keys = [col for col in DatabaseConnection.key_columns(table_name) if col in table_columns]
+        return keys + [col for col in dict.fromkeys(columns) if col not in keys]
+
+    @staticmethod
+    def _query(table_name: str, selected: List[str], tickers: Optional[List[str]],
+               start: Optional[date], end: Optional[date]) -> Tuple[str, Dict[str, Any]]:
+        # Table and column names were checked against the catalog by the caller
+        conditions = []
+        params: Dict[str, Any] = {}
+        if tickers is not None:
+            names = [f"t{index}" for index in range(len(tickers))]
+            conditions.append(f"ticker IN ({', '.join(':' + name for name in names)})")
+            params.update(zip(names, tickers))
+        if start is not None:
+            conditions.append("report_date >= :start")
+            params['start'] = start
+        if end is not None:
+            conditions.append("report_date <= :end")
+            params['end'] = end
+
+        query = f"SELECT {', '.join(selected)} FROM {table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return query + " ORDER BY ticker, report_date", params
+
+    @staticmethod
+    def _copy(engine: Engine, query: str, params: Dict[str, Any]) -> pd.DataFrame:
+        """Stream the result as CSV with COPY ... TO STDOUT and parse it in one pass."""
+        buffer = io.StringIO()
+        with engine.connect() as conn:
+            # COPY does not accept bind parameters, so the compiler renders them as escaped literals
+            compiled = text(query).bindparams(**params).compile(
+                dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY ({compiled}) TO STDOUT WITH (FORMAT csv, HEADER)", buffer)
+            finally:
+                cursor.close()
+        buffer.seek(0)
+        # Only empty fields are NULL: tickers like "NA" and text like "None" or "null" are values
+        return pd.read_csv(buffer, keep_default_na=False, na_values=[''], dtype={'ticker': str})
+
+    @staticmethod
+    def _select(engine: Engine, query: str, params: Dict[str, Any]) -> pd.DataFrame:
+        with engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    @staticmethod
+    def _typed(df: pd.DataFrame) -> pd.DataFrame:
+        """Match the dtypes the writer uses: date report dates and float values."""
+        if 'report_date' in df.columns:
+            df['report_date'] = pd.to_datetime(df['report_date']).dt.date
+        for col in df.columns:
+            if df[col].dtype == object and col not in ('ticker', 'report_date'):
+                converted = pd.to_numeric(df[col], errors='coerce')
+                # Keep text columns (company_name, ...) as they are
+                if converted.notna().sum() == df[col].notna().sum():
+                    df[col] = converted
+        return df
+
+    @staticmethod
+    def _get(key: Hashable) -> Optional[pd.DataFrame]:
+        with DataReader._lock:
+            entry = DataReader._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, df = entry
+            if time.monotonic() - stored_at > DataReader.ttl:
+                DataReader._evict(key)
+                return None
+            DataReader._cache.move_to_end(key)
+            return df.copy()
+
+    @staticmethod
+    def _put(key: Hashable, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > DataReader.max_bytes:
+            return
+        with DataReader._lock:
+            if key in DataReader._cache:
+                DataReader._evict(key)
+            DataReader._cache[key] = (time.monotonic(), df)
+            DataReader._cache_bytes += size
+            while (len(DataReader._cache) > DataReader.max_entries
+                   or DataReader._cache_bytes > DataReader.max_bytes):
+                DataReader._evict(next(iter(DataReader._cache)))
+
+    @staticmethod
+    def _evict(key: Hashable) -> None:
+        """Remove one entry; the caller holds the lock."""
+        _, df = DataReader._cache.pop(key)
+        DataReader._cache_bytes -= int(df.memory_usage(index=True, deep=True).sum())
+
+
+DatabaseConnection.add_write_listener(DataReader.invalidate)
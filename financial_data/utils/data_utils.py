@@ -1,36 +1,136 @@
+import logging
+import numpy as np
 import pandas as pd
-from typing import List
+from pandas.util import hash_array, hash_pandas_object
+from functools import lru_cache
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
 
 class DataTransformer:
     """Data transformation utilities."""
-    
+
+    KEY_COLUMNS = ['ticker', 'report_date']
+
+    # Content hash of a row's values, present in tables that track restatements
+    HASH_COLUMN = 'row_hash'
+
     @staticmethod
     def transpose_data(ticker: str, df: pd.DataFrame, table_columns: List[str]) -> pd.DataFrame:
-        """Transpose the metrics to column names, and report date to row names."""
-        df_transposed = (df.transpose()
-                        .reset_index()
-                        .rename(columns={'index': 'report_date'})
-                        .assign(ticker=ticker))
-        
-        df_transposed.columns = (df_transposed.columns
-                               .str.strip()
-                               .str.replace(' ', '_')
-                               .str.replace(',', '')
-                               .str.replace('&', 'and')
-                               .str.lower())
-        
-        df_transposed['report_date'] = pd.to_datetime(df_transposed['report_date']).dt.date
-        
+        """
+        Transpose the metrics to column names, and report date to row names.
+
+        Same result as transpose_many for one ticker, without the cost of stacking.
+        """
+        dtypes = DataTransformer.column_dtypes(table_columns)
+        if df is None or df.empty:
+            return pd.DataFrame(columns=table_columns).astype(dtypes)
+
+        raw = DataTransformer._normalized(df)
+        value_columns = [col for col in table_columns if dtypes[col] == 'float64']
+        # Align line items while they are still rows, then transpose one float block
+        values = pd.DataFrame(raw.reindex(value_columns).to_numpy(dtype='float64', na_value=np.nan).T,
+                              columns=value_columns)
+        result = pd.concat([pd.DataFrame({'ticker': ticker,
+                                          'report_date': pd.to_datetime(raw.columns).date}), values], axis=1)
+        if DataTransformer.HASH_COLUMN in dtypes:
+            result[DataTransformer.HASH_COLUMN] = DataTransformer.row_hashes(values)
+        return result[table_columns]
+
+    @staticmethod
+    def transpose_many(frames: Dict[str, pd.DataFrame], table_columns: List[str]) -> pd.DataFrame:
+        """
+        Transpose raw statement frames of many tickers into one frame aligned to a table.
+
+        Each raw frame has yfinance line items as rows and report dates as columns.
+        All frames are stacked with a single concat and aligned to ``table_columns``
+        with a single reindex.
+
+        Args:
+            frames (Dict[str, pd.DataFrame]): Raw statement frame per ticker
+            table_columns (List[str]): Column names of the target table
+
+        Returns:
+            pd.DataFrame: One row per ticker and report date, typed per ``column_dtypes``,
+            with ``row_hash`` filled in when the table has that column
+        """
+        tickers = [ticker for ticker, df in frames.items() if df is not None and not df.empty]
+        dtypes = DataTransformer.column_dtypes(table_columns)
+        if not tickers:
+            return pd.DataFrame(columns=table_columns).astype(dtypes)
+
+        transposed = [DataTransformer._normalized(frames[ticker]).transpose() for ticker in tickers]
+        df_combined = (pd.concat(transposed, keys=tickers, names=DataTransformer.KEY_COLUMNS, sort=False)
+                       .reset_index())
+
+        df_combined['report_date'] = pd.to_datetime(df_combined['report_date']).dt.date
+
         # Handle invalid and missing columns
-        invalid_columns = [col for col in df_transposed.columns if col not in table_columns]
+        table_column_set = set(table_columns)
+        invalid_columns = [col for col in df_combined.columns if col not in table_column_set]
         if invalid_columns:
-            print(f"Dropping invalid columns: {invalid_columns}")
-            df_transposed = df_transposed.drop(columns=invalid_columns)
-        
-        missing_columns = [col for col in table_columns if col not in df_transposed.columns]
+            logger.debug("Dropping invalid columns: %s", invalid_columns)
+
+        missing_columns = [col for col in table_columns if col not in df_combined.columns]
         if missing_columns:
-            print(f"Adding missing columns: {missing_columns}")
-            for col in missing_columns:
-                df_transposed[col] = None
-        
-        return df_transposed[table_columns]
\ No newline at end of file
+            logger.debug("Adding missing columns: %s", missing_columns)
+
+        # Cast all value columns as one float block; a per-column astype dominates the cost
+        value_columns = [col for col in table_columns if dtypes[col] == 'float64']
+        values = df_combined.reindex(columns=value_columns).astype('float64')
+        result = pd.concat([df_combined.reindex(columns=DataTransformer.KEY_COLUMNS), values], axis=1)
+        if DataTransformer.HASH_COLUMN in table_column_set:
+            result[DataTransformer.HASH_COLUMN] = DataTransformer.row_hashes(values)
+        return result[table_columns]
+
+    @staticmethod
+    def _normalized(df: pd.DataFrame) -> pd.DataFrame:
+        """Raw frame with normalized line items; labels that normalize alike keep their first values."""
+        df = df.rename(index=DataTransformer.normalize_label)
+        if df.index.has_duplicates:
+            df = df.groupby(level=0, sort=False).first()
+        return df
+
+    @staticmethod
+    def row_hashes(values: pd.DataFrame) -> pd.Series:
+        """
+        Hash the values of every row, vectorized across the frame.
+
+        Values are rounded first, so float noise between fetches does not count as a
+        change. The hash only depends on the values in column order, not on the index.
+        Equal to ``hash_pandas_object(values.round(6), index=False)``, with every column
+        hashed in one call rather than one Series per column.
+        """
+        if len(values.columns) == 0:
+            return hash_pandas_object(values, index=False).map('{:016x}'.format).set_axis(values.index)
+        # Column-major, so each column's hashes are one contiguous row of ``hashed``
+        columns = np.ascontiguousarray(values.round(6).to_numpy(dtype='float64').T)
+        hashed = hash_array(columns.ravel()).reshape(columns.shape)
+
+        # Combine the column hashes like pandas' combine_hash_arrays (CPython's tuple hash)
+        count = len(hashed)
+        mult = np.uint64(1000003)
+        out = np.full(hashed.shape[1], 0x345678, dtype=np.uint64)
+        for index, column_hash in enumerate(hashed):
+            out ^= column_hash
+            out *= mult
+            mult += np.uint64(82520 + 2 * (count - index))
+        out += np.uint64(97531)
+        return pd.Series(out, index=values.index).map('{:016x}'.format)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def normalize_label(label) -> str:
+        """Map a raw yfinance row label such as 'Selling General & Administration' to a column name."""
+        return (str(label)
+                .strip()
+                .replace(' ', '_')
+                .replace(',', '')
+                .replace('&', 'and')
+                .lower())
+
+    @staticmethod
+    def column_dtypes(table_columns: List[str]) -> Dict[str, str]:
+        """Dtype layout of a statement table: object keys and row hash, float64 values."""
+        text_columns = DataTransformer.KEY_COLUMNS + [DataTransformer.HASH_COLUMN]
+        return {col: 'object' if col in text_columns else 'float64' for col in table_columns}
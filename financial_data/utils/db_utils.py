@@ -1,59 +1,463 @@
-from sqlalchemy import create_engine, text
+import logging
+import threading
+from datetime import date, datetime, timezone
+import pandas as pd
+from sqlalchemy import create_engine, event, inspect, text, table, column, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.engine import Engine
-from typing import List, Optional
+from sqlalchemy.pool import QueuePool
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from config.database import DatabaseConfig
+from utils.schema_cache import SchemaCache
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
 
 class DatabaseConnection:
     """Database connection utilities."""
-    
+
+    KEY_COLUMNS = ['ticker', 'report_date']
+
+    # Tables whose (ticker, report_date) uniqueness is a named constraint
+    # rather than the primary key
+    CONFLICT_CONSTRAINTS = {
+        'stock_metrics': 'stock_metrics_unique_record',
+    }
+
+    # Event tables whose rows are identified by other columns than (ticker, report_date)
+    TABLE_KEYS = {
+        'upgrades_downgrades': ['ticker', 'report_date', 'firm', 'action'],
+        'company_news': ['ticker', 'uuid'],
+    }
+
+    # Process-wide engine shared by every reader and writer
+    _engine: Optional[Engine] = None
+    _engine_lock = threading.Lock()
+    _connections_opened = 0
+
+    # History table name -> whether it exists, looked up once per process
+    _history_tables: Dict[str, bool] = {}
+
+    # Stands for a key with no stored row when comparing row hashes
+    _MISSING = object()
+
+    # (ticker, report_date) keys bound per statement that selects rows by key
+    KEY_CHUNK = 500
+
+    # Callbacks told which table was written, e.g. to drop cached reads
+    _write_listeners: List[Callable[[str], None]] = []
+
     @staticmethod
     def connect_to_db() -> Optional[Engine]:
-        """Create database connection."""
+        """Create a pooled database engine."""
         try:
             db_params = DatabaseConfig.get_db_params()
             connection_string = DatabaseConfig.create_connection_string(db_params)
-            engine = create_engine(connection_string)
+            engine = create_engine(
+                connection_string,
+                poolclass=QueuePool,
+                **DatabaseConfig.get_pool_params()
+            )
+            event.listen(engine, 'connect', DatabaseConnection._on_connect)
             return engine
         except SQLAlchemyError as e:
-            print(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             return None
 
+    @staticmethod
+    def get_engine() -> Optional[Engine]:
+        """Get the process-wide engine, creating it on first use."""
+        with DatabaseConnection._engine_lock:
+            if DatabaseConnection._engine is None:
+                DatabaseConnection._engine = DatabaseConnection.connect_to_db()
+            return DatabaseConnection._engine
+
+    @staticmethod
+    def dispose_engine() -> None:
+        """Close all pooled connections of the process-wide engine."""
+        with DatabaseConnection._engine_lock:
+            if DatabaseConnection._engine is not None:
+                DatabaseConnection._engine.dispose()
+                DatabaseConnection._engine = None
+
+    @staticmethod
+    def reset_engine() -> None:
+        """Forget an engine inherited from a parent process, leaving its connections to the parent."""
+        with DatabaseConnection._engine_lock:
+            if DatabaseConnection._engine is not None:
+                DatabaseConnection._engine.dispose(close=False)
+                DatabaseConnection._engine = None
+
+    @staticmethod
+    def connections_opened() -> int:
+        """Number of new DBAPI connections opened by engines in this process."""
+        return DatabaseConnection._connections_opened
+
+    @staticmethod
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        """Pool 'connect' event hook counting physical connections."""
+        with DatabaseConnection._engine_lock:
+            DatabaseConnection._connections_opened += 1
+
+    @staticmethod
+    def add_write_listener(listener: Callable[[str], None]) -> None:
+        """Register a callback run with the table name after rows are written to it."""
+        if listener not in DatabaseConnection._write_listeners:
+            DatabaseConnection._write_listeners.append(listener)
+
+    @staticmethod
+    def notify_write(table_name: str) -> None:
+        """Run the write listeners for a table that received new or changed rows."""
+        for listener in DatabaseConnection._write_listeners:
+            listener(table_name)
+
+    @staticmethod
+    def key_columns(table_name: str) -> List[str]:
+        """Columns identifying a row of a table."""
+        return DatabaseConnection.TABLE_KEYS.get(table_name, DatabaseConnection.KEY_COLUMNS)
+
     @staticmethod
     def get_table_columns(engine: Engine, table_name: str) -> Optional[List[str]]:
-        """Get column names from database table."""
+        """Get column names from database table, served from the schema cache when possible."""
+        columns = SchemaCache.get(table_name)
+        if columns is not None:
+            return columns
+
+        loaded = DatabaseConnection.load_table_columns(engine, [table_name])
+        if loaded is None:
+            return None
+        return loaded.get(table_name, [])
+
+    @staticmethod
+    def load_table_columns(engine: Engine, table_names: List[str]) -> Optional[Dict[str, List[str]]]:
+        """
+        Load column names for several tables with a single catalog query.
+
+        Tables already in the schema cache are not queried again.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            table_names (List[str]): Tables to load
+
+        Returns:
+            Optional[Dict[str, List[str]]]: Column names per existing table, or None on error
+        """
+        columns = {}
+        missing = []
+        for table_name in dict.fromkeys(table_names):
+            cached = SchemaCache.get(table_name)
+            if cached is None:
+                missing.append(table_name)
+            else:
+                columns[table_name] = cached
+
+        Metrics.increment('metadata', 'cache_hits', len(columns))
+        if not missing:
+            return columns
+
         try:
             query = text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = :table_name 
-                ORDER BY ordinal_position;
+                SELECT table_name, column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                AND table_name = ANY(:table_names)
+                ORDER BY table_name, ordinal_position;
             """)
-            
-            with engine.connect() as conn:
-                result = conn.execute(query, {"table_name": table_name})
-                columns = [row[0] for row in result]
-                return columns
+
+            loaded: Dict[str, List[str]] = {}
+            with Metrics.timer('metadata'), engine.connect() as conn:
+                Metrics.increment('metadata', 'db_round_trips')
+                for table_name, column_name in conn.execute(query, {"table_names": missing}):
+                    loaded.setdefault(table_name, []).append(column_name)
         except SQLAlchemyError as e:
-            print(f"Error getting table columns: {e}")
+            logger.error("Error getting table columns: %s", e)
             return None
 
+        if loaded:
+            SchemaCache.update(loaded)
+        columns.update(loaded)
+        return columns
+
+    @staticmethod
+    def invalidate_table_columns(table_name: Optional[str] = None) -> None:
+        """Drop cached column names after a schema change."""
+        SchemaCache.invalidate(table_name)
+
     @staticmethod
-    def check_duplicate_record(engine: Engine, ticker: str, report_date: str, table: str) -> bool:
-        """Check if record already exists in database."""
+    def get_latest_report_dates(engine: Engine, table_names: List[str]) -> Optional[Dict[str, Dict[str, date]]]:
+        """
+        Get the latest stored report_date per ticker for several tables in one query.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            table_names (List[str]): Tables keyed by (ticker, report_date)
+
+        Returns:
+            Optional[Dict[str, Dict[str, date]]]: Latest report date per ticker for each
+            existing table, or None on error
+        """
+        columns = DatabaseConnection.load_table_columns(engine, table_names)
+        if columns is None:
+            return None
+
+        # Only tables confirmed by the catalog are interpolated into the query
+        existing = [name for name in dict.fromkeys(table_names)
+                    if 'report_date' in columns.get(name, [])]
+        latest: Dict[str, Dict[str, date]] = {name: {} for name in existing}
+        if not existing:
+            return latest
+
+        query = text(" UNION ALL ".join(
+            f"SELECT '{name}' AS table_name, ticker, MAX(report_date) AS latest "
+            f"FROM {name} GROUP BY ticker"
+            for name in existing
+        ))
+
+        try:
+            with Metrics.timer('metadata'), engine.connect() as conn:
+                Metrics.increment('metadata', 'db_round_trips')
+                for table_name, ticker, latest_date in conn.execute(query):
+                    # SQLite returns aggregated dates as ISO strings
+                    if isinstance(latest_date, str):
+                        latest_date = date.fromisoformat(latest_date)
+                    latest[table_name][ticker] = latest_date
+            return latest
+        except SQLAlchemyError as e:
+            logger.error("Error getting latest report dates: %s", e)
+            return None
+
+    @staticmethod
+    def upsert_dataframe(engine: Engine, df: pd.DataFrame, table_name: str,
+                         update: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Write a DataFrame with set-based INSERT ... ON CONFLICT statements.
+
+        All rows are sent as multi-row VALUES pages inside a single transaction.
+        Rows whose key (see ``key_columns``) already exists are skipped, or
+        overwritten when ``update`` is set.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            df (pd.DataFrame): Rows to write, columns named after the table columns
+            table_name (str): Target table
+            update (bool): Update existing rows instead of skipping them
+
+        Returns:
+            Optional[Dict[str, int]]: Counts of inserted, updated and skipped rows,
+            or None if the write failed
+        """
+        if df.empty:
+            return {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+        df = df.drop_duplicates(subset=DatabaseConnection.key_columns(table_name), keep='last')
+        stmt = DatabaseConnection._upsert_statement(engine, table_name, list(df.columns),
+                                                    'all' if update else None)
+        try:
+            with engine.begin() as conn:
+                counts = DatabaseConnection._execute_upsert(conn, stmt, df)
+            if counts['inserted'] or counts['updated']:
+                DatabaseConnection.notify_write(table_name)
+            return counts
+        except SQLAlchemyError as e:
+            logger.error("Error upserting into %s: %s", table_name, e)
+            return None
+
+    @staticmethod
+    def upsert_changed(engine: Engine, df: pd.DataFrame, table_name: str) -> Optional[Dict[str, int]]:
+        """
+        Write rows that carry a row_hash, updating existing rows only when their hash changed.
+
+        Stored hashes of the batch's keys are read with one query per KEY_CHUNK keys and
+        compared in memory; unchanged rows are not sent at all. New and changed rows go through one
+        INSERT ... ON CONFLICT DO UPDATE ... WHERE row_hash IS DISTINCT FROM, which
+        also guards against concurrent writers. If a ``<table>_history`` table exists,
+        the stored versions of changed rows are copied into it first.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            df (pd.DataFrame): Rows to write, including the row_hash column
+            table_name (str): Target table
+
+        Returns:
+            Optional[Dict[str, int]]: Counts of inserted, updated and skipped rows,
+            or None if the write failed
+        """
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        if df.empty:
+            return counts
+
+        df = df.drop_duplicates(subset=DatabaseConnection.KEY_COLUMNS, keep='last')
+        # Keys are (ticker, datetime.date) on both sides, whatever the frame or driver returns
+        keys = list(zip(df['ticker'], pd.to_datetime(df['report_date']).dt.date))
+        stored = DatabaseConnection.get_row_hashes(engine, table_name, keys)
+        if stored is None:
+            return None
+
+        previous = [stored.get(key, DatabaseConnection._MISSING) for key in keys]
+        is_new = pd.Series([value is DatabaseConnection._MISSING for value in previous], index=df.index)
+        is_changed = ~is_new & (pd.Series(previous, index=df.index) != df['row_hash'])
+        changed = df[is_new | is_changed]
+        counts['skipped'] = len(df) - len(changed)
+        if changed.empty:
+            return counts
+
+        history = DatabaseConnection._history_table(engine, table_name)
+        stmt = DatabaseConnection._upsert_statement(engine, table_name, list(changed.columns), 'changed')
+        try:
+            with engine.begin() as conn:
+                if history is not None and is_changed.any():
+                    DatabaseConnection._copy_to_history(conn, table_name, history, df[is_changed])
+                written = DatabaseConnection._execute_upsert(conn, stmt, changed)
+        except SQLAlchemyError as e:
+            logger.error("Error upserting into %s: %s", table_name, e)
+            return None
+
+        counts['inserted'] = written['inserted']
+        counts['updated'] = written['updated']
+        counts['skipped'] += written['skipped']
+        if engine.dialect.name != 'postgresql':
+            # rowcount does not tell inserts from updates; new keys were all inserted
+            counts['inserted'] = min(written['inserted'], int(is_new.sum()))
+            counts['updated'] = written['inserted'] - counts['inserted']
+        if counts['inserted'] or counts['updated']:
+            DatabaseConnection.notify_write(table_name)
+        Metrics.increment('write', 'rows_unchanged', counts['skipped'])
+        return counts
+
+    @staticmethod
+    def get_row_hashes(engine: Engine, table_name: str,
+                       keys: List[Tuple[str, date]]) -> Optional[Dict[Tuple[str, date], Optional[str]]]:
+        """Stored row_hash per (ticker, report_date) for the stored rows among some keys."""
+        hashes: Dict[Tuple[str, date], Optional[str]] = {}
         try:
-            query = text(f"""
-                SELECT EXISTS (
-                    SELECT 1
-                    FROM {table}
-                    WHERE ticker = :ticker
-                    AND report_date = :report_date
-                )
-            """)
-            
             with engine.connect() as conn:
-                result = conn.execute(query, {"ticker": ticker, "report_date": report_date})
-                return result.scalar()
+                for start in range(0, len(keys), DatabaseConnection.KEY_CHUNK):
+                    condition, params = DatabaseConnection._keys_condition(
+                        keys[start:start + DatabaseConnection.KEY_CHUNK])
+                    Metrics.increment('write', 'db_round_trips')
+                    rows = conn.execute(
+                        text(f"SELECT ticker, report_date, row_hash FROM {table_name} WHERE {condition}"), params)
+                    for ticker, report_date, row_hash in rows:
+                        hashes[(ticker, DatabaseConnection._as_date(report_date))] = row_hash
+            return hashes
+        except SQLAlchemyError as e:
+            logger.error("Error reading row hashes of %s: %s", table_name, e)
+            return None
+
+    @staticmethod
+    def _upsert_statement(engine: Engine, table_name: str, columns: List[str], update: Optional[str]):
+        """
+        Build the INSERT ... ON CONFLICT statement of a table.
+
+        ``update`` is None to skip existing rows, 'all' to overwrite them, or 'changed'
+        to overwrite only those whose row_hash differs.
+        """
+        key_columns = DatabaseConnection.key_columns(table_name)
+
+        # SQLite stands in for Postgres in the offline benchmarks
+        is_postgres = engine.dialect.name == 'postgresql'
+        insert = postgresql.insert if is_postgres else sqlite.insert
+        target = table(table_name, *[column(name) for name in columns],
+                       schema='public' if is_postgres else None)
+
+        if is_postgres and table_name in DatabaseConnection.CONFLICT_CONSTRAINTS:
+            conflict = {'constraint': DatabaseConnection.CONFLICT_CONSTRAINTS[table_name]}
+        else:
+            conflict = {'index_elements': key_columns}
+
+        # One statement executed with every row; SQLAlchemy pages it into
+        # multi-row VALUES lists ("insertmanyvalues") and compiles it only once
+        stmt = insert(target)
+        if update is None:
+            stmt = stmt.on_conflict_do_nothing(**conflict)
+        else:
+            if update == 'changed':
+                conflict['where'] = target.c.row_hash.is_distinct_from(stmt.excluded.row_hash)
+            stmt = stmt.on_conflict_do_update(
+                set_={name: stmt.excluded[name] for name in columns if name not in key_columns},
+                **conflict
+            )
+
+        if is_postgres:
+            # xmax is 0 only for freshly inserted row versions
+            stmt = stmt.returning(literal_column('(xmax = 0)').label('inserted'))
+        return stmt
+
+    @staticmethod
+    def _execute_upsert(conn, stmt, df: pd.DataFrame) -> Dict[str, int]:
+        """Execute an upsert statement with every row of a frame and count the outcome."""
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        values = df.astype(object).where(pd.notna(df), None)
+        for name in df.columns[[pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]]:
+            # Drivers bind datetime, not pandas Timestamp
+            values[name] = pd.Series(df[name].dt.to_pydatetime(), index=df.index, dtype=object).where(df[name].notna(), None)
+        records = values.to_dict('records')
+        Metrics.increment('write', 'db_round_trips')
+        if conn.dialect.name == 'postgresql':
+            flags = conn.execute(stmt, records).scalars().all()
+            inserted = sum(1 for flag in flags if flag)
+            counts['inserted'] = inserted
+            counts['updated'] = len(flags) - inserted
+            counts['skipped'] = len(records) - len(flags)
+        else:
+            written = conn.execute(stmt, records).rowcount
+            counts['inserted'] = written
+            counts['skipped'] = len(records) - written
+        return counts
+
+    @staticmethod
+    def _history_table(engine: Engine, table_name: str) -> Optional[str]:
+        """Name of the table's history table, if one was created."""
+        history = f"{table_name}_history"
+        with DatabaseConnection._engine_lock:
+            if history in DatabaseConnection._history_tables:
+                return history if DatabaseConnection._history_tables[history] else None
+        try:
+            exists = inspect(engine).has_table(history)
         except SQLAlchemyError as e:
-            print(f"Error checking for duplicate record: {e}")
-            return False
\ No newline at end of file
+            logger.error("Error looking up %s: %s", history, e)
+            return None
+        with DatabaseConnection._engine_lock:
+            DatabaseConnection._history_tables[history] = exists
+        return history if exists else None
+
+    @staticmethod
+    def _copy_to_history(conn, table_name: str, history: str, df: pd.DataFrame) -> None:
+        """Copy the stored versions of rows about to change into the history table."""
+        columns = ', '.join(DatabaseConnection.get_table_columns(conn.engine, table_name))
+        keys = list(zip(df['ticker'], pd.to_datetime(df['report_date']).dt.date))
+        superseded_at = DatabaseConnection._now()
+        for start in range(0, len(keys), DatabaseConnection.KEY_CHUNK):
+            condition, params = DatabaseConnection._keys_condition(keys[start:start + DatabaseConnection.KEY_CHUNK])
+            Metrics.increment('write', 'db_round_trips')
+            conn.execute(
+                text(f"INSERT INTO {history} ({columns}, superseded_at) "
+                     f"SELECT {columns}, :superseded_at FROM {table_name} WHERE {condition}"),
+                {**params, 'superseded_at': superseded_at}
+            )
+        Metrics.increment('write', 'rows_superseded', len(df))
+
+    @staticmethod
+    def _as_date(value: Any) -> date:
+        """A report_date as returned by the driver (date, datetime or ISO text) as a date."""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return pd.Timestamp(value).date()
+
+    @staticmethod
+    def _keys_condition(keys: List[Tuple[str, date]]) -> Tuple[str, Dict[str, Any]]:
+        """``(ticker, report_date) IN (VALUES ...)`` condition and its bind parameters."""
+        params: Dict[str, Any] = {}
+        values = []
+        for index, (ticker, report_date) in enumerate(keys):
+            params[f"t{index}"] = ticker
+            params[f"d{index}"] = report_date
+            values.append(f"(:t{index}, :d{index})")
+        return f"(ticker, report_date) IN (VALUES {', '.join(values)})", params
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# (stage, metric, ticker, data_type)
+MetricKey = Tuple[str, str, Optional[str], Optional[str]]
+
+
+class Metrics:
+    """
+    Process-wide stage timings and counters, labelled by ticker and data type.
+
+    Every stage (fetch, transform, metadata, write) records ``calls`` and
+    ``seconds`` through ``timer``; anything else (upstream calls, rows written,
+    round trips, errors) is a counter recorded with ``increment``.
+    """
+
+    PROMETHEUS_PREFIX = 'financial_data'
+
+    _values: Dict[MetricKey, float] = defaultdict(float)
+    _max_seconds: Dict[Tuple[str, Optional[str]], float] = defaultdict(float)
+    _lock = threading.Lock()
+
+    # Keep ticker labels; turned off for large universes, where one set of
+    # counters per ticker would grow memory with the number of tickers
+    _per_ticker = True
+
+    @staticmethod
+    def configure(per_ticker: bool = True) -> None:
+        """Choose whether values are also kept per ticker or only per stage and data type."""
+        Metrics._per_ticker = per_ticker
+
+    @staticmethod
+    @contextmanager
+    def timer(stage: str, ticker: Optional[str] = None, data_type: Optional[str] = None) -> Iterator[None]:
+        """Time a block as one call of ``stage``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if not Metrics._per_ticker:
+                ticker = None
+            with Metrics._lock:
+                Metrics._values[(stage, 'calls', ticker, data_type)] += 1
+                Metrics._values[(stage, 'seconds', ticker, data_type)] += elapsed
+                max_key = (stage, data_type)
+                Metrics._max_seconds[max_key] = max(Metrics._max_seconds[max_key], elapsed)
+
+    @staticmethod
+    def increment(stage: str, metric: str, value: float = 1, ticker: Optional[str] = None,
+                  data_type: Optional[str] = None) -> None:
+        """Add ``value`` to a counter such as ('write', 'rows_inserted')."""
+        if not Metrics._per_ticker:
+            ticker = None
+        with Metrics._lock:
+            Metrics._values[(stage, metric, ticker, data_type)] += value
+
+    @staticmethod
+    def reset() -> None:
+        """Forget everything recorded so far."""
+        with Metrics._lock:
+            Metrics._values.clear()
+            Metrics._max_seconds.clear()
+
+    @staticmethod
+    def summary(top: int = 10) -> Dict[str, Any]:
+        """
+        Aggregate recorded values per stage, per data type and per ticker.
+
+        Args:
+            top (int): Number of slowest tickers to list
+
+        Returns:
+            Dict[str, Any]: JSON-serializable run summary
+        """
+        with Metrics._lock:
+            values = dict(Metrics._values)
+            max_seconds = dict(Metrics._max_seconds)
+
+        stages: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        by_data_type: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        by_ticker: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+        for (stage, metric, ticker, data_type), value in values.items():
+            stages[stage][metric] += value
+            if data_type is not None:
+                by_data_type[data_type][f"{stage}_{metric}"] += value
+            if ticker is not None:
+                by_ticker[ticker][f"{stage}_{metric}"] += value
+
+        for (stage, data_type), value in max_seconds.items():
+            stages[stage]['max_seconds'] = max(stages[stage].get('max_seconds', 0.0), value)
+            if data_type is not None:
+                by_data_type[data_type][f"{stage}_max_seconds"] = value
+
+        def total_seconds(item):
+            return sum(value for key, value in item[1].items() if key.endswith('_seconds'))
+
+        slowest = sorted(by_ticker.items(), key=total_seconds, reverse=True)[:top]
+        return {
+            'stages': Metrics._rounded(stages),
+            'by_data_type': Metrics._rounded(by_data_type),
+            'slowest_tickers': [{'ticker': ticker, 'seconds': round(total_seconds((ticker, data)), 4)}
+                                for ticker, data in slowest],
+            'by_ticker': Metrics._rounded(by_ticker),
+        }
+
+    @staticmethod
+    def to_prometheus() -> str:
+        """
+        Render stage and data type aggregates in the Prometheus text format.
+
+        Per-ticker values are left out to keep label cardinality bounded.
+        """
+        with Metrics._lock:
+            values = dict(Metrics._values)
+
+        aggregated: Dict[Tuple[str, str, Optional[str]], float] = defaultdict(float)
+        for (stage, metric, _, data_type), value in values.items():
+            aggregated[(stage, metric, data_type)] += value
+
+        lines = []
+        for metric in sorted({key[1] for key in aggregated}):
+            name = f"{Metrics.PROMETHEUS_PREFIX}_{metric}_total"
+            lines.append(f"# TYPE {name} counter")
+            for (stage, key_metric, data_type), value in sorted(aggregated.items(), key=str):
+                if key_metric != metric:
+                    continue
+                labels = f'stage="{stage}"'
+                if data_type is not None:
+                    labels += f',data_type="{data_type}"'
+                lines.append(f"{name}{{{labels}}} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def write(path: Path, fmt: str = 'json') -> None:
+        """Write the summary to ``path`` as JSON or Prometheus text."""
+        content = Metrics.to_prometheus() if fmt == 'prometheus' else json.dumps(Metrics.summary(), indent=2)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        tmp_path.write_text(content)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def _rounded(groups: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        return {name: {metric: round(value, 4) for metric, value in sorted(group.items())}
+                for name, group in sorted(groups.items())}
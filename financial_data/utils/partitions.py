@@ -0,0 +1,108 @@
+import logging
+import threading
+from datetime import date
+from typing import Dict, Iterable, Optional, Set
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionManager:
+    """
+    Create report_date range partitions ahead of the writer.
+
+    Only tables converted by database/partitioned_tables.sql are handled; for
+    other tables and other databases every call is a no-op. Partitions known to
+    exist are remembered per process, so steady-state writes cost no extra query.
+    """
+
+    # Partition step per table, matching database/partitioned_tables.sql
+    STEPS = {
+        'annual_income_statements': 'year',
+        'quarterly_income_statements': 'year',
+        'annual_balance_sheet': 'year',
+        'quarterly_balance_sheet': 'year',
+        'annual_cash_flow': 'year',
+        'quarterly_cash_flow': 'year',
+        'stock_metrics': 'month',
+    }
+
+    # Periods created beyond the newest date written
+    AHEAD = {'month': 3, 'year': 1}
+
+    _partitioned: Optional[Set[str]] = None
+    _ensured: Dict[str, Set[date]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def prepare(engine: Engine, table_names: Iterable[str]) -> None:
+        """Create the partitions for the current period and those ahead of it."""
+        for table_name in table_names:
+            PartitionManager.ensure(engine, table_name, [date.today()])
+
+    @staticmethod
+    def ensure(engine: Engine, table_name: str, dates: Iterable[date]) -> None:
+        """
+        Make sure partitions exist for the periods of ``dates`` and the ones ahead.
+
+        Args:
+            engine (Engine): SQLAlchemy database engine
+            table_name (str): Table about to be written
+            dates (Iterable[date]): Report dates of the rows about to be written
+        """
+        step = PartitionManager.STEPS.get(table_name)
+        if step is None or engine.dialect.name != 'postgresql':
+            return
+        if table_name not in PartitionManager._partitioned_tables(engine):
+            return
+
+        dates = pd.to_datetime(pd.Series(list(dates)), errors='coerce').dropna()
+        if dates.empty:
+            return
+        last = dates.max() + pd.DateOffset(**{f"{step}s": PartitionManager.AHEAD[step]})
+        periods = pd.period_range(dates.min(), last, freq='M' if step == 'month' else 'Y')
+        starts = {period.start_time.date() for period in periods}
+
+        with PartitionManager._lock:
+            missing = starts - PartitionManager._ensured.setdefault(table_name, set())
+            if not missing:
+                return
+            try:
+                with Metrics.timer('partitions'), engine.begin() as conn:
+                    Metrics.increment('partitions', 'db_round_trips')
+                    created = conn.execute(
+                        text("SELECT ensure_report_date_partitions(:parent, :step, :from_date, :to_date)"),
+                        {'parent': table_name, 'step': step, 'from_date': min(missing), 'to_date': max(missing)}
+                    ).scalar()
+            except SQLAlchemyError as e:
+                # Rows of missing periods still land in the default partition
+                logger.error("Error creating partitions of %s: %s", table_name, e)
+                return
+            PartitionManager._ensured[table_name].update(missing)
+
+        if created:
+            Metrics.increment('partitions', 'created', created)
+            logger.info("Created %d partitions of %s", created, table_name)
+
+    @staticmethod
+    def _partitioned_tables(engine: Engine) -> Set[str]:
+        with PartitionManager._lock:
+            if PartitionManager._partitioned is not None:
+                return PartitionManager._partitioned
+            try:
+                with engine.connect() as conn:
+                    rows = conn.execute(text("""
+                        SELECT c.relname
+                        FROM pg_partitioned_table p
+                        JOIN pg_class c ON c.oid = p.partrelid
+                        WHERE c.relname = ANY(:table_names)
+                    """), {'table_names': list(PartitionManager.STEPS)}).scalars().all()
+            except SQLAlchemyError as e:
+                logger.error("Error listing partitioned tables: %s", e)
+                return set()
+            PartitionManager._partitioned = set(rows)
+            return PartitionManager._partitioned
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+from config.database import DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCache:
+    """Table column metadata cached per process and optionally in a local file."""
+
+    _columns: Dict[str, List[str]] = {}
+    _lock = threading.Lock()
+    _file_loaded = False
+
+    @staticmethod
+    def get(table_name: str) -> Optional[List[str]]:
+        """Get cached column names for a table, or None if the table is not cached."""
+        SchemaCache._load_file()
+        with SchemaCache._lock:
+            columns = SchemaCache._columns.get(table_name)
+            return list(columns) if columns is not None else None
+
+    @staticmethod
+    def update(columns: Dict[str, List[str]]) -> None:
+        """Cache column names for one or more tables and persist them if configured."""
+        with SchemaCache._lock:
+            SchemaCache._columns.update({name: list(cols) for name, cols in columns.items()})
+        SchemaCache._save_file()
+
+    @staticmethod
+    def invalidate(table_name: Optional[str] = None) -> None:
+        """Forget cached columns for one table, or for all tables including the cache file."""
+        with SchemaCache._lock:
+            if table_name is None:
+                SchemaCache._columns.clear()
+            else:
+                SchemaCache._columns.pop(table_name, None)
+
+        if table_name is None:
+            path = DatabaseConfig.get_schema_cache_path()
+            if path is not None and path.exists():
+                path.unlink()
+        else:
+            SchemaCache._save_file()
+
+    @staticmethod
+    def schema_hash() -> str:
+        """
+        Hash identifying the schema the cache file was built from.
+
+        Combines the target database with the name and contents of every DDL file
+        under database/, so the file is ignored after a schema change or migration
+        or when pointed at another database.
+        """
+        db_params = DatabaseConfig.get_db_params()
+        digest = hashlib.sha256()
+        digest.update(f"{db_params['host']}:{db_params['port']}/{db_params['database']}".encode())
+        for schema_file in sorted(DatabaseConfig.get_schema_file().parent.glob('*.sql')):
+            digest.update(schema_file.name.encode())
+            digest.update(schema_file.read_bytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _load_file() -> None:
+        """Read the cache file once per process if it matches the current schema hash."""
+        with SchemaCache._lock:
+            if SchemaCache._file_loaded:
+                return
+            SchemaCache._file_loaded = True
+
+        path = DatabaseConfig.get_schema_cache_path()
+        if path is None or not path.exists():
+            return
+
+        try:
+            payload = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable schema cache %s: %s", path, e)
+            return
+
+        if payload.get('schema_hash') != SchemaCache.schema_hash():
+            return
+
+        with SchemaCache._lock:
+            for name, cols in payload.get('tables', {}).items():
+                SchemaCache._columns.setdefault(name, cols)
+
+    @staticmethod
+    def _save_file() -> None:
+        path = DatabaseConfig.get_schema_cache_path()
+        if path is None:
+            return
+
+        with SchemaCache._lock:
+            payload = {'schema_hash': SchemaCache.schema_hash(), 'tables': dict(SchemaCache._columns)}
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            tmp_path.write_text(json.dumps(payload, indent=2))
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning("Could not write schema cache %s: %s", path, e)
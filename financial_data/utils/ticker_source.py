@@ -0,0 +1,63 @@
+import csv
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator, Optional, Union
+
+
+class TickerSource:
+    """
+    Lazily read ticker symbols from a text or CSV file, or from stdin with '-'.
+
+    Symbols are yielded one at a time, so a universe of any size is never held in
+    memory. The source can be iterated more than once: files are re-read, and stdin
+    is spooled to a temporary file during the first pass.
+    """
+
+    # First CSV column names treated as a header row
+    HEADER_NAMES = {'ticker', 'tickers', 'symbol', 'symbols'}
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path (Union[str, Path]): File with one ticker per line, or a CSV whose
+                first column holds tickers; '-' reads stdin
+        """
+        self.path = str(path)
+        self._spool: Optional[IO[str]] = None
+        self._spooled = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self.path != '-':
+            with open(self.path, newline='') as f:
+                yield from self._parse(f)
+        elif self._spooled:
+            self._spool.seek(0)
+            yield from self._parse(self._spool)
+        else:
+            yield from self._parse(self._tee_stdin())
+
+    def _tee_stdin(self) -> Iterator[str]:
+        """Yield stdin lines while copying them to a spool for later passes."""
+        self._spool = tempfile.TemporaryFile('w+', newline='')
+        for line in sys.stdin:
+            self._spool.write(line)
+            yield line
+        self._spool.flush()
+        self._spooled = True
+
+    def _parse(self, lines) -> Iterator[str]:
+        for row_number, row in enumerate(csv.reader(lines)):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            ticker = row[0].strip()
+            if row_number == 0 and ticker.lower() in self.HEADER_NAMES:
+                continue
+            yield ticker
+
+    def close(self) -> None:
+        """Delete the stdin spool, if any."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            self._spooled = False